@@ -1,6 +1,14 @@
-import anthropic
 import json
-client = anthropic.Anthropic()
+
+import typer
+
+from bulk import BulkExtractor, Checkpoint, read_items
+from claude_client import get_client
+from registry import ToolInputError, compile_schema, schema_problems
+
+client = get_client()
+CLAUDE_MODEL = "claude-3-5-sonnet-20240620"
+app = typer.Typer()
 
 
 tools = [
@@ -85,36 +93,109 @@ tools = [
 
 ]
 
-def get_sentiment(tweet: str):
-    system_prompt = """
+# Task name -> (tool the model is made to call, system prompt)
+TASKS = {
+    "sentiment": (
+        "print_sentiment_scores",
+        """
     Identify the sentiment of the text and print the sentiment scores - you must use the print_sentiment_scores tool to print the sentiment scores.
+    """,
+    ),
+    "entities": (
+        "print_entities",
+        """
+    Extract the entities from the text and print them - you must use the print_entities tool to print the entities.
+    """,
+    ),
+    "translate": (
+        "translate",
+        """
+    Translate the text from English into other languages. Use the translate tool.
+    """,
+    ),
+}
+
+VALIDATORS = {tool["name"]: compile_schema(tool["input_schema"]) for tool in tools}
+
+def tool_named(name):
+    return next(tool for tool in tools if tool["name"] == name)
+
+def fused_tool(task_names):
+    """One tool whose input holds the input of every task's tool, keyed by tool name."""
+    parts = [tool_named(TASKS[task][0]) for task in task_names]
+    return {
+        "name": "record_" + "_".join(task_names),
+        "description": "Records every analysis of the text at once",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                tool["name"]: {**tool["input_schema"], "description": tool["description"]} for tool in parts
+            },
+            "required": [tool["name"] for tool in parts]
+        }
+    }
+
+def fused_system_prompt(task_names):
+    fields = "\n".join(f"    - {TASKS[task][0]}: {tool_named(TASKS[task][0])['description']}" for task in task_names)
+    return f"""
+    Analyse the text in several ways at once and record every result with the {fused_tool(task_names)['name']} tool, filling in each of its fields:
+{fields}
     """
-    response = client.messages.create(
-        model="claude-3-5-sonnet-20240620",
+
+def split_fused(response, task_names):
+    """
+    Per-task tool inputs from a fused response, each validated against its own tool's schema.
+
+    Raises ToolInputError listing every missing or malformed part.
+    """
+    tool_input = next((c.input for c in response.content if c.type == "tool_use"), None)
+    if not isinstance(tool_input, dict):
+        raise ToolInputError("no tool_use in the response")
+    results = {}
+    problems = []
+    for task in task_names:
+        tool_name = TASKS[task][0]
+        part = tool_input.get(tool_name)
+        if VALIDATORS[tool_name](part):
+            results[task] = part
+        elif part is None:
+            problems.append(f"input.{tool_name} is required")
+        else:
+            problems += schema_problems(tool_named(tool_name)["input_schema"], part, f"input.{tool_name}")
+    if problems:
+        raise ToolInputError("; ".join(problems))
+    return results
+
+def extract(task: str, text: str):
+    tool_name, system_prompt = TASKS[task]
+    return client.messages.create(
+        model=CLAUDE_MODEL,
         system=system_prompt,
         tools=tools,
-        tool_choice={"type": "tool", "name": "print_sentiment_scores"},
+        tool_choice={"type": "tool", "name": tool_name},
         max_tokens=1000,
         temperature=0.5,
         messages=[
             {
                 "role": "user",
-                "content": tweet
+                "content": text
             }
         ]
     )
-    print(response)
 
-def extract_entities(text: str):
-    system_prompt = """
-    Extract the entities from the text and print them - you must use the print_entities tool to print the entities.
+def extract_fused(text: str, task_names=tuple(TASKS)):
     """
+    Run several tasks on one text in a single forced call.
+
+    Returns (task -> tool input, response).
+    """
+    tool = fused_tool(task_names)
     response = client.messages.create(
-        model="claude-3-5-sonnet-20240620",
-        system=system_prompt,
-        tools=tools,
-        tool_choice={"type": "tool", "name": "print_entities"},
-        max_tokens=1000,
+        model=CLAUDE_MODEL,
+        system=fused_system_prompt(task_names),
+        tools=[tool],
+        tool_choice={"type": "tool", "name": tool["name"]},
+        max_tokens=1000 * len(task_names),
         temperature=0.5,
         messages=[
             {
@@ -123,26 +204,28 @@ def extract_entities(text: str):
             }
         ]
     )
+    return split_fused(response, task_names), response
+
+def task_list(tasks: str):
+    names = [task.strip() for task in tasks.split(",") if task.strip()]
+    unknown = [task for task in names if task not in TASKS]
+    if unknown or not names:
+        raise typer.BadParameter(f"tasks must be a comma-separated subset of {', '.join(TASKS)}")
+    return names
+
+@app.command()
+def get_sentiment(tweet: str):
+    response = extract("sentiment", tweet)
     print(response)
 
+@app.command()
+def extract_entities(text: str):
+    response = extract("entities", text)
+    print(response)
+
+@app.command()
 def translate(english_text: str):
-    system_prompt = """
-    Translate the text from English into other languages. Use the translate tool.
-    """
-    response = client.messages.create(
-        model="claude-3-5-sonnet-20240620",
-        system=system_prompt,
-        tools=tools,
-        tool_choice={"type": "tool", "name": "translate"},
-        max_tokens=1000,
-        temperature=0.5,
-        messages=[
-            {
-                "role": "user",
-                "content": english_text
-            }
-        ]
-    )
+    response = extract("translate", english_text)
     print(response)
     for c in response.content:
         if c.type == "tool_use" and c.name=="translate":
@@ -152,6 +235,68 @@ def translate(english_text: str):
                 print(c.input)
             break
 
-# get_sentiment("I'm a HUGE hater of pickles. I actually despise pickles. They are garbage")
-# extract_entities("John works at Google in New York. He met with Sarah, the CEO of Acme Inc., last week in San Francisco.")
-translate("how much does this cost?")
\ No newline at end of file
+@app.command()
+def extract_all(text: str, tasks: str = ",".join(TASKS)):
+    """
+    Sentiment, entities and/or a translation of one text from a single call.
+    """
+    results, response = extract_fused(text, task_list(tasks))
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(response.usage)
+
+@app.command()
+def bulk(
+    input_path: str,
+    output_path: str,
+    task: str = typer.Option("sentiment", help="A task, or several comma-separated to run them fused in one call"),
+    mode: str = typer.Option("auto", help="auto (batches, realtime for what they miss), batch or realtime"),
+    text_field: str = "text",
+    id_field: str = "id",
+    batch_size: int = 1000,
+    max_pending: int = 4,
+    poll_interval: float = 30.0,
+    concurrency: int = 32,
+):
+    """
+    Run one task over every record of a .jsonl or .csv file, resuming where a previous run stopped.
+    """
+    task_names = task_list(task)
+    if len(task_names) == 1:
+        tool_name, system_prompt = TASKS[task_names[0]]
+        tool = tool_named(tool_name)
+    else:
+        tool, system_prompt = fused_tool(task_names), fused_system_prompt(task_names)
+    extractor = BulkExtractor(
+        client,
+        tool,
+        system_prompt,
+        CLAUDE_MODEL,
+        mode=mode,
+        batch_size=batch_size,
+        max_pending=max_pending,
+        poll_interval=poll_interval,
+        concurrency=concurrency,
+        on_progress=lambda extractor: typer.echo(f"{extractor.stats['written']} written, {len(checkpoint.batches)} batches pending"),
+        max_tokens=1000 * len(task_names),
+        temperature=0.5,
+    )
+    checkpoint = Checkpoint(output_path)
+    try:
+        stats = extractor.run(read_items(input_path, text_field, id_field), checkpoint)
+    finally:
+        checkpoint.close()
+    batch_cost, realtime_cost = extractor.cost()
+    typer.echo(
+        f"{stats['written']} written ({stats['batch']} from {stats['batches']} batches, {stats['realtime']} realtime, "
+        f"{stats['errors']} errors); estimated cost ${batch_cost + realtime_cost:.4f}"
+    )
+    if stats["deferred"]:
+        typer.echo(f"{stats['deferred']} rows failed transiently; run again to retry them")
+
+# python 3_structured_outputs.py get-sentiment "I'm a HUGE hater of pickles. I actually despise pickles. They are garbage"
+# python 3_structured_outputs.py extract-entities "John works at Google in New York. He met with Sarah, the CEO of Acme Inc., last week in San Francisco."
+# python 3_structured_outputs.py translate "how much does this cost?"
+# python 3_structured_outputs.py extract-all "John from Acme Inc. loved the demo in Paris." --tasks sentiment,entities
+# python 3_structured_outputs.py bulk tweets.jsonl sentiment.jsonl --task sentiment
+if __name__ == '__main__':
+    app()
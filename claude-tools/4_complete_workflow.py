@@ -1,45 +1,47 @@
-import wikipedia
-from anthropic import Anthropic
 import typer
+import os
 import re
 
-def get_article(search_term):
-    results = wikipedia.search(search_term)
-    first_result = results[0]
-    page = wikipedia.page(first_result, auto_suggest=False)
-    return page.content
+from agent import ToolExecutor, run_agent
+from claude_client import get_client
+from conversation import Conversation
+from passages import format_passages
+from registry import ToolRegistry
+from wiki import get_client as get_wiki_client
 
-article_search_tool = {
-    "name": "get_article",
-    "description": "A tool to retrieve an up to date Wikipedia article.",
-    "input_schema": {
-        "type": "object",
-        "properties": {
-            "search_term": {
-                "type": "string",
-                "description": "The search term to find a wikipedia article by title"
-            },
-        },
-        "required": ["search_term"]
-    }
-}
+# Tokens of article text returned per get_article call; 0 returns whole articles
+ARTICLE_TOKEN_BUDGET = int(os.getenv("ARTICLE_TOKEN_BUDGET", "1500"))
+# Estimated history tokens past which older get_article results are compacted
+ANSWER_TOKEN_BUDGET = 12000
 
-client = Anthropic()
+registry = ToolRegistry()
+
+@registry.tool(timeout=20)
+def get_article(search_term: str, question: str = "", cursor: int = 0):
+    """
+    A tool to retrieve the passages of an up to date Wikipedia article that are most relevant to a question.
+
+    Args:
+        search_term: The search term to find a wikipedia article by title
+        question: What you want to find out from the article; passages are ranked by relevance to it
+        cursor: Continue from this passage, as given by a previous result that had more passages available
+    """
+    article = get_wiki_client().get_article(search_term)
+    if article["title"] is None:
+        raise LookupError(f"No Wikipedia article found for {search_term}")
+    if not ARTICLE_TOKEN_BUDGET:
+        return article["content"]
+    return format_passages(article, question or search_term, ARTICLE_TOKEN_BUDGET, cursor)
+
+client = get_client()
 CLAUDE_MODEL = "claude-3-7-sonnet-20250219"
 
-def _call_get_article(tool_use):
-    search_term = tool_use.input["search_term"]
-    wiki_result = get_article(search_term)
-    return {
-        "role": "user",
-        "content": [
-            {
-                "type": "tool_result",
-                "tool_use_id": tool_use.id,
-                "content": wiki_result
-            }
-        ]
-    }
+executor = ToolExecutor(registry)
+
+def _announce_tool_uses(response):
+    for c in response.content:
+        if c.type == "tool_use" and c.name == "get_article":
+            typer.echo(typer.style(f"Claude wants to get an article about {c.input['search_term']}", fg=typer.colors.GREEN))
 
 def _extract_answer(content):
     for c in content:
@@ -50,10 +52,10 @@ def _extract_answer(content):
                 return match.group(1)
     return None
 
-def answer_question(question):
+def answer_question(question, on_response=_announce_tool_uses):
     system_prompt = """
     You will be asked a question by the user. 
-    If answering the question requires data you were not trained on, you can use the get_article tool to get the contents of a recent wikipedia article about the topic. 
+    If answering the question requires data you were not trained on, you can use the get_article tool to get the most relevant passages of a recent wikipedia article about the topic. 
     If you can answer the question without needing to get more information, please do so. 
     Only call the tool when needed. 
     """
@@ -61,29 +63,22 @@ def answer_question(question):
     Answer the following question <question>{question}</question>
     When you can answer the question, keep your answer as short as possible and enclose it in <answer> tags
     """
-    messages = [{"role": "user", "content": prompt}]
+    conversation = Conversation(token_budget=ANSWER_TOKEN_BUDGET)
+    conversation.add_user(prompt)
     typer.echo(typer.style(f"User: {question}", fg=typer.colors.BLUE))
 
-    while True:
-        response = client.messages.create(
-            model=CLAUDE_MODEL,
-            system=system_prompt, 
-            messages=messages,
-            max_tokens=1000,
-            tools=[article_search_tool]
-        )
-        messages.append({"role": "assistant", "content": response.content})
-    
-        if(response.stop_reason == "tool_use"):
-            for c in response.content:
-                if c.type == "tool_use" and c.name == "get_article":
-                    typer.echo(typer.style(f"Claude wants to get an article about {c.input['search_term']}", fg=typer.colors.GREEN))
-                    tool_response = _call_get_article(c)
-                    messages.append(tool_response)
-        else:
-            answer = _extract_answer(response.content)
-            typer.echo(typer.style(f"Final answer: {answer}", fg=typer.colors.MAGENTA))
-            break
+    response = run_agent(
+        client,
+        executor,
+        conversation,
+        on_response=on_response,
+        model=CLAUDE_MODEL,
+        system=system_prompt,
+        max_tokens=1000,
+    )
+    answer = _extract_answer(response.content)
+    typer.echo(typer.style(f"Final answer: {answer}", fg=typer.colors.MAGENTA))
+    return answer
 
 app = typer.Typer()
 
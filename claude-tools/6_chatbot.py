@@ -1,145 +1,195 @@
 from fake_db import FakeDatabase
 import typer
-    
-import anthropic
+
+import asyncio
+import itertools
 import json
+import time
+from typing import Literal
+
+from agent import ToolExecutor, run_agent_async
+from claude_client import ClaudePool, get_async_client
+from conversation import Conversation
+from registry import ToolRegistry
 
-tool_get_order_by_id = {
-    "name": "get_order_by_id",
-    "description": "Retrieves the details of a specific order based on the order ID. Returns the order ID, product name, quantity, price, and order status.",
-    "input_schema": {
-        "type": "object",
-        "properties": {
-            "order_id": {
-                "type": "string",
-                "description": "The unique identifier for the order."
-            }
-        },
-        "required": ["order_id"]
-    }
-}
-
-tool_get_user = {
-    "name": "get_user",
-    "description": "Looks up a user by email, phone, or username.",
-    "input_schema": {
-        "type": "object",
-        "properties": {
-            "key": {
-                "type": "string",
-                "enum": ["email", "phone", "username"],
-                "description": "The attribute to search for a user by (email, phone, or username)."
-            },
-            "value": {
-                "type": "string",
-                "description": "The value to match for the specified attribute."
-            }
-        },
-        "required": ["key", "value"]
-    }
-}
-
-tool_get_customer_orders = {
-    "name": "get_customer_orders",
-    "description": "Retrieves the list of orders belonging to a user based on a user's customer id.",
-    "input_schema": {
-        "type": "object",
-        "properties": {
-            "customer_id": {
-                "type": "string",
-                "description": "The customer_id belonging to the user"
-            }
-        },
-        "required": ["customer_id"]
-    }
-}
-
-tool_cancel_order = {
-    "name": "cancel_order",
-    "description": "Cancels an order based on a provided order_id.  Only orders that are 'processing' can be cancelled",
-    "input_schema": {
-        "type": "object",
-        "properties": {
-            "order_id": {
-                "type": "string",
-                "description": "The order_id pertaining to a particular order"
-            }
-        },
-        "required": ["order_id"]
-    }
-}
-
-tools = [tool_get_order_by_id, tool_get_user, tool_get_customer_orders, tool_cancel_order]
-client = anthropic.Client()
 CLAUDE_MODEL = "claude-3-7-sonnet-20250219"
+# Estimated history tokens past which old tool results and turns are compacted
+CHAT_TOKEN_BUDGET = 20000
+DEFAULT_PORT = 8300
+SYSTEM_PROMPT = """
+    You are a customer support agent for TechNova.
+    """
+GREETING = "TechNova Support: What would you like help with?"
 app = typer.Typer()
 db = FakeDatabase()
+registry = ToolRegistry()
 
-def process_tool_call(tool_use):
-    tool_name = tool_use.name
-    tool_input = tool_use.input
-    if tool_name == "get_user":
-        content = db.get_user(tool_input["key"], tool_input["value"])
-    elif tool_name == "get_order_by_id":
-        content = db.get_order_by_id(tool_input["order_id"])
-    elif tool_name == "get_customer_orders":
-        content = db.get_customer_orders(tool_input["customer_id"])
-    elif tool_name == "cancel_order":
-        content = db.cancel_order(tool_input["order_id"])
-    
-    try:
-        content = json.dumps(content)
-    except:
-        content = str(content)
-
-    return {
-        "role": "user",
-        "content": [
-            {
-                "type": "tool_result",
-                "tool_use_id": tool_use.id,
-                "content": content
-            }
-        ]
-    }
+@registry.tool
+def get_order_by_id(order_id: str):
+    """
+    Retrieves the details of a specific order based on the order ID. Returns the order ID, product name, quantity, price, and order status.
+
+    Args:
+        order_id: The unique identifier for the order.
+    """
+    return db.get_order_by_id(order_id)
+
+@registry.tool
+def get_user(key: Literal["email", "phone", "username"], value: str):
+    """
+    Looks up a user by email, phone, or username.
+
+    Args:
+        key: The attribute to search for a user by (email, phone, or username).
+        value: The value to match for the specified attribute.
+    """
+    return db.get_user(key, value)
+
+@registry.tool
+def get_customer_orders(customer_id: str):
+    """
+    Retrieves the list of orders belonging to a user based on a user's customer id.
+
+    Args:
+        customer_id: The customer_id belonging to the user
+    """
+    return db.get_customer_orders(customer_id)
+
+@registry.tool
+def cancel_order(order_id: str):
+    """
+    Cancels an order based on a provided order_id.  Only orders that are 'processing' can be cancelled
+
+    Args:
+        order_id: The order_id pertaining to a particular order
+    """
+    return db.cancel_order(order_id)
+
+executor = ToolExecutor(registry)
+
+def _echo_response(response):
+    typer.echo(typer.style(f"Assistant: {response.content}", fg=typer.colors.RED))
+
+def _echo_tool_results(tool_uses, results):
+    for result in results:
+        typer.echo(typer.style(f"Tool Use: {result['content']}", fg=typer.colors.BLUE))
 
 def _extract_answer(content):
     return content[-1].text
 
-@app.command()
-def chat():
-    # typer.echo(typer.style("Interactive mode - Type 'exit' to quit", fg=typer.colors.YELLOW))
-    system_prompt = """
-    You are a customer support agent for TechNova.
+class SupportService:
     """
-    assistant_message = "TechNova Support: What would you like help with?"
-    messages = []
-    while True:
-        q = input(assistant_message+"\n"+"===\n")
-        if q.lower() == 'exit':
-            break
-        typer.echo(typer.style(f"User: {q}", fg=typer.colors.YELLOW))
-        messages.append({"role": "user", "content": q})
-        while True:
-            response = client.messages.create(
+    Chat sessions that share one database and tool executor.
+
+    Every session has its own Conversation. Turns of one session run one
+    at a time; turns of different sessions run concurrently, and the
+    database's compare-and-set keeps their order changes consistent.
+    """
+
+    def __init__(self, client, on_response=None, on_tool_results=None):
+        self.client = client
+        self.on_response = on_response
+        self.on_tool_results = on_tool_results
+        self.sessions = {}
+        self._ids = itertools.count(1)
+
+    def open_session(self):
+        session_id = f"s{next(self._ids)}"
+        self.sessions[session_id] = (Conversation(token_budget=CHAT_TOKEN_BUDGET), asyncio.Lock())
+        return session_id
+
+    def close_session(self, session_id):
+        """Forget a session and return its Conversation."""
+        return self.sessions.pop(session_id)[0]
+
+    async def reply(self, session_id, message):
+        conversation, lock = self.sessions[session_id]
+        async with lock:
+            conversation.add_user(message)
+            response = await run_agent_async(
+                self.client,
+                executor,
+                conversation,
+                on_response=self.on_response,
+                on_tool_results=self.on_tool_results,
                 model=CLAUDE_MODEL,
-                system=system_prompt, 
-                messages=messages,
+                system=SYSTEM_PROMPT,
                 max_tokens=1000,
-                tools=tools
             )
-            messages.append({"role": "assistant", "content": response.content})
-            typer.echo(typer.style(f"Assistant: {response.content}", fg=typer.colors.RED))
-        
-            if(response.stop_reason == "tool_use"):
-                for c in response.content:
-                    if c.type == "tool_use":
-                        tool_response = process_tool_call(c)
-                        typer.echo(typer.style(f"Tool Use: {tool_response['content'][0]['content']}", fg=typer.colors.BLUE))
-                        messages.append(tool_response)
-            else:
-                assistant_message = _extract_answer(response.content)
+        return _extract_answer(response.content)
+
+async def _send(writer, body):
+    writer.write(json.dumps(body).encode("utf-8") + b"\n")
+    await writer.drain()
+
+async def handle_connection(service, reader, writer):
+    """
+    Serve one session over one connection, as newline-delimited JSON.
+
+    The server greets with {"session", "reply"}; each {"message": ...} line
+    is answered with {"reply", "turn_ms"} or {"error"}.
+    """
+    session_id = service.open_session()
+    try:
+        await _send(writer, {"session": session_id, "reply": GREETING})
+        while True:
+            line = await reader.readline()
+            if not line:
                 break
+            try:
+                message = json.loads(line)["message"]
+            except (ValueError, KeyError, TypeError):
+                await _send(writer, {"error": 'Expected a line like {"message": "..."}'})
+                continue
+            started = time.perf_counter()
+            try:
+                reply = await service.reply(session_id, message)
+            except Exception as e:
+                await _send(writer, {"error": str(e)})
+                continue
+            await _send(writer, {"reply": reply, "turn_ms": 1000 * (time.perf_counter() - started)})
+    except ConnectionError:
+        pass
+    finally:
+        service.close_session(session_id)
+        writer.close()
+
+async def start_server(service, host="127.0.0.1", port=DEFAULT_PORT):
+    """Start serving sessions; port 0 picks a free one."""
+    return await asyncio.start_server(lambda reader, writer: handle_connection(service, reader, writer), host, port)
+
+def _make_client(mock, mock_latency):
+    if mock:
+        from mock_claude import MockAsyncAnthropic
+
+        return ClaudePool(MockAsyncAnthropic(latency=mock_latency)).async_client
+    return get_async_client()
+
+async def _chat(client):
+    service = SupportService(client, on_response=_echo_response, on_tool_results=_echo_tool_results)
+    session_id = service.open_session()
+    assistant_message = GREETING
+    while True:
+        q = await asyncio.to_thread(input, assistant_message+"\n"+"===\n")
+        if q.lower() == 'exit':
+            typer.echo(service.close_session(session_id).format_usage())
+            break
+        typer.echo(typer.style(f"User: {q}", fg=typer.colors.YELLOW))
+        assistant_message = await service.reply(session_id, q)
+
+async def _serve(client, host, port):
+    server = await start_server(SupportService(client), host, port)
+    typer.echo(f"TechNova support sessions on {host}:{server.sockets[0].getsockname()[1]}")
+    async with server:
+        await server.serve_forever()
+
+@app.command()
+def chat(mock: bool = False, mock_latency: float = 0.0):
+    asyncio.run(_chat(_make_client(mock, mock_latency)))
+
+@app.command()
+def serve(host: str = "127.0.0.1", port: int = DEFAULT_PORT, mock: bool = False, mock_latency: float = 0.5):
+    asyncio.run(_serve(_make_client(mock, mock_latency), host, port))
 
 if __name__ == '__main__':
-    app()
\ No newline at end of file
+    app()
@@ -0,0 +1,165 @@
+"""
+Shared tool-use loop for the Claude scripts in this directory.
+
+Tools live on a ToolRegistry (see registry.py), which the ToolExecutor
+dispatches through. When Claude asks for several tools in one turn, they
+run concurrently (async tools on the event loop, plain functions on a
+thread pool), each under its own timeout, and all of their tool_result
+blocks go back in one user message. A turn with several tool calls therefore takes as long as its
+slowest tool rather than the sum of all of them.
+
+    registry = ToolRegistry()
+
+    @registry.tool(timeout=10)
+    def get_article(search_term: str):
+        ...
+
+    executor = ToolExecutor(registry)
+    response = run_agent(client, executor, messages, model=..., system=...)
+"""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from conversation import Conversation
+from registry import ToolInputError, ToolRegistry, UnknownToolError
+
+DEFAULT_TOOL_TIMEOUT = 30.0
+MAX_TOOL_THREADS = 16
+
+
+def format_tool_content(result):
+    """Tool results go to Claude as text; anything else is sent as JSON."""
+    if isinstance(result, str):
+        return result
+    try:
+        return json.dumps(result)
+    except (TypeError, ValueError):
+        return str(result)
+
+
+class ToolExecutor:
+    """Runs the tool_use blocks of one assistant turn concurrently."""
+
+    def __init__(self, registry=None, default_timeout=DEFAULT_TOOL_TIMEOUT, max_threads=MAX_TOOL_THREADS):
+        self.registry = registry or ToolRegistry()
+        self.default_timeout = default_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="tool")
+
+    @property
+    def definitions(self):
+        return self.registry.definitions
+
+    def register(self, function, definition=None, timeout=None):
+        """Register a tool on the registry; ``function`` may be async."""
+        return self.registry.register(function, definition, timeout)
+
+    async def _run_tool(self, tool_use):
+        try:
+            tool = self.registry.get(tool_use.name)
+        except UnknownToolError:
+            return tool_use.id, f"Error: unknown tool {tool_use.name}", True
+        timeout = tool.timeout or self.default_timeout
+        try:
+            if tool.is_async:
+                call = tool.call_async(tool_use.input)
+            else:
+                loop = asyncio.get_running_loop()
+                call = loop.run_in_executor(self._pool, tool, tool_use.input)
+            result = await asyncio.wait_for(call, timeout)
+        except asyncio.TimeoutError:
+            # A timed-out thread cannot be killed; its result is discarded
+            tool.stats.record_timeout()
+            return tool_use.id, f"Error: {tool_use.name} timed out after {timeout:g}s", True
+        except ToolInputError as e:
+            return tool_use.id, f"Error: invalid input for {tool_use.name}: {e}", True
+        except Exception as e:
+            return tool_use.id, f"Error: {tool_use.name} failed: {e}", True
+        return tool_use.id, format_tool_content(result), False
+
+    async def execute_async(self, tool_uses):
+        """Run all ``tool_uses`` at once and return their tool_result blocks, in order."""
+        results = await asyncio.gather(*(self._run_tool(tool_use) for tool_use in tool_uses))
+        blocks = []
+        for tool_use_id, content, is_error in results:
+            block = {"type": "tool_result", "tool_use_id": tool_use_id, "content": content}
+            if is_error:
+                block["is_error"] = True
+            blocks.append(block)
+        return blocks
+
+    def execute(self, tool_uses):
+        """Blocking version of ``execute_async`` for synchronous callers."""
+        return asyncio.run(self.execute_async(tool_uses))
+
+
+def print_tool_results(tool_uses, results):
+    """``on_tool_results`` hook that prints each call and its result."""
+    for tool_use, result in zip(tool_uses, results):
+        print(f"Called tool: {tool_use.name} with input: {tool_use.input}")
+        print(f"Tool result: {result['content']}")
+
+
+def as_conversation(messages):
+    """Plain message lists are sent as they are: no caching and no compaction."""
+    if isinstance(messages, Conversation):
+        return messages
+    return Conversation(messages, cache=False)
+
+
+def tool_uses_of(response):
+    return [block for block in response.content if block.type == "tool_use"]
+
+
+def run_agent(client, executor, messages, on_response=None, on_tool_results=None, max_turns=None, **create_kwargs):
+    """
+    Call Claude until it stops asking for tools, executing each turn's tools concurrently.
+
+    ``messages`` is a list of messages or a Conversation (see
+    conversation.py), which adds prompt caching, compaction and token
+    tracking; either is extended in place with every assistant turn and the
+    matching user message of tool results. ``create_kwargs`` (model,
+    system, max_tokens, ...) are passed to ``client.messages.create``; the
+    tools come from the executor. ``on_response(response)`` and
+    ``on_tool_results(tool_uses, results)`` are called after every API
+    call and tool execution, for logging. Returns the last response.
+    """
+    conversation = as_conversation(messages)
+    turns = 0
+    while True:
+        response = client.messages.create(**conversation.request(executor.definitions, **create_kwargs))
+        conversation.add_response(response)
+        if on_response:
+            on_response(response)
+        tool_uses = tool_uses_of(response)
+        turns += 1
+        if response.stop_reason != "tool_use" or not tool_uses:
+            return response
+        if max_turns is not None and turns >= max_turns:
+            return response
+        results = executor.execute(tool_uses)
+        if on_tool_results:
+            on_tool_results(tool_uses, results)
+        conversation.add_tool_results(results)
+
+
+async def run_agent_async(client, executor, messages, on_response=None, on_tool_results=None, max_turns=None, **create_kwargs):
+    """``run_agent`` for an ``anthropic.AsyncAnthropic`` client."""
+    conversation = as_conversation(messages)
+    turns = 0
+    while True:
+        response = await client.messages.create(**conversation.request(executor.definitions, **create_kwargs))
+        conversation.add_response(response)
+        if on_response:
+            on_response(response)
+        tool_uses = tool_uses_of(response)
+        turns += 1
+        if response.stop_reason != "tool_use" or not tool_uses:
+            return response
+        if max_turns is not None and turns >= max_turns:
+            return response
+        results = await executor.execute_async(tool_uses)
+        if on_tool_results:
+            on_tool_results(tool_uses, results)
+        conversation.add_tool_results(results)
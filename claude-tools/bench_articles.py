@@ -0,0 +1,101 @@
+"""
+Report what passage selection saves on a fixed set of questions.
+
+For every question in article_questions.json the article is fetched once
+and get_article's result is built two ways: the whole article, as before,
+and the passages selected for the question within ``--budget`` tokens.
+The report gives both sizes, the share of tokens saved, the time selection
+took and whether the expected answer survived selection. Because a
+tool_result stays in ``messages``, its tokens are paid again on every later
+turn; ``--turns`` shows that cumulative cost.
+
+With ``--live`` each question is also answered end to end through
+4_complete_workflow with whole articles and with selected passages,
+reporting wall time, input tokens over all API calls and correctness.
+That needs ANTHROPIC_API_KEY; the offline part does not.
+
+    python bench_articles.py [--fixtures builtin] [--budget 1500] [--turns 5] [--live]
+"""
+
+import importlib
+import json
+import time
+
+import typer
+
+from passages import estimate_tokens, format_passages
+from wiki import WikipediaClient, get_client, set_client
+from wiki_fixture_server import WikiFixtureServer
+
+QUESTIONS_PATH = "article_questions.json"
+
+app = typer.Typer()
+
+def answer_live(workflow, questions, budget):
+    """Answer every question through the workflow; return (seconds, input tokens, correct) per question."""
+    workflow.ARTICLE_TOKEN_BUDGET = budget
+    results = []
+    for item in questions:
+        input_tokens = []
+        started = time.perf_counter()
+        answer = workflow.answer_question(
+            item["question"], on_response=lambda response: input_tokens.append(response.usage.input_tokens)
+        )
+        elapsed = time.perf_counter() - started
+        results.append((elapsed, sum(input_tokens), item["expected"].lower() in (answer or "").lower()))
+    return results
+
+@app.command()
+def main(
+    questions_path: str = QUESTIONS_PATH,
+    budget: int = 1500,
+    turns: int = 5,
+    fixtures: str = typer.Option("", help="'builtin' or a JSON file of {title: content} to serve locally instead of Wikipedia"),
+    live: bool = False,
+):
+    with open(questions_path) as f:
+        questions = json.load(f)
+    if fixtures:
+        articles = None
+        if fixtures != "builtin":
+            with open(fixtures) as f:
+                articles = json.load(f)
+        server = WikiFixtureServer(articles).start()
+        client = WikipediaClient(server.api_url)
+        set_client(client)
+    else:
+        client = get_client()
+
+    full_total = selected_total = found = 0
+    typer.echo(f"{'question':<52}{'article':>9}{'selected':>10}{'saved':>8}{'ms':>7}  answer kept")
+    for item in questions:
+        article = client.get_article(item["search_term"])
+        full = estimate_tokens(article["content"])
+        started = time.perf_counter()
+        text = format_passages(article, item["question"], budget)
+        elapsed_ms = 1000 * (time.perf_counter() - started)
+        selected = estimate_tokens(text)
+        kept = item["expected"] in text
+        full_total += full
+        selected_total += selected
+        found += kept
+        typer.echo(
+            f"{item['question'][:50]:<52}{full:>9}{selected:>10}{1 - selected / full:>8.0%}{elapsed_ms:>7.1f}  "
+            f"{'yes' if kept else 'NO'}"
+        )
+    typer.echo("")
+    typer.echo(f"tool_result tokens: {full_total} whole articles, {selected_total} selected ({1 - selected_total / full_total:.0%} saved)")
+    typer.echo(f"re-sent over {turns} later turns: {full_total * turns} vs {selected_total * turns}")
+    typer.echo(f"expected answer kept in {found}/{len(questions)} selections")
+
+    if live:
+        workflow = importlib.import_module("4_complete_workflow")
+        for label, mode_budget in (("whole articles", 0), (f"selected ({budget})", budget)):
+            results = answer_live(workflow, questions, mode_budget)
+            seconds = sum(result[0] for result in results) / len(results)
+            tokens = sum(result[1] for result in results)
+            correct = sum(result[2] for result in results)
+            typer.echo(f"{label:<20} mean {seconds:6.2f}s  input tokens {tokens:>8}  correct {correct}/{len(results)}")
+
+if __name__ == '__main__':
+    app()
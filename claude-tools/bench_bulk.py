@@ -0,0 +1,144 @@
+"""
+Check bulk extraction against the mock Messages server: throughput, cost and resume.
+
+``--items`` synthetic tweets are scored for sentiment through
+3_structured_outputs' task definitions three ways, each into a fresh
+output file:
+
+    realtime        concurrent realtime calls only
+    batch           Message Batches, realtime for what they miss
+    batch, resumed  as above, but the run is killed after its second batch
+                    is submitted and then started again
+
+The mock server answers realtime calls after ``--latency`` seconds, ends
+batches ``--batch-latency`` seconds after creation and fails
+``--overloaded`` of all requests. Reported per run: items/sec, batches
+created, requests the server answered one by one and in batches, and the
+estimated cost per 1k items. Every output is then checked to hold each
+input row exactly once with a valid result, and the resumed run to have
+created no more batches than the uninterrupted one.
+
+    python bench_bulk.py --items 5000 --batch-size 500 --latency 0.5 --batch-latency 2
+"""
+
+import importlib
+import json
+import os
+import tempfile
+import time
+
+import typer
+
+from bulk import BulkExtractor, Checkpoint, read_items
+from claude_client import ClaudePool
+from mock_claude_server import MockClaudeServer
+
+structured = importlib.import_module("3_structured_outputs")
+
+WORDS = ("love", "hate", "pickles", "weather", "phone", "battery", "support", "delivery", "great", "awful")
+
+class Killed(Exception):
+    """Stands in for the process dying mid-run."""
+
+def write_tweets(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            text = " ".join(WORDS[(i * 7 + j * 3) % len(WORDS)] for j in range(12))
+            f.write(json.dumps({"id": f"t{i}", "text": f"Tweet {i}: {text}"}) + "\n")
+
+def check_output(path, count):
+    """Problems with an output file: rows missing, repeated or without a valid result."""
+    rows = []
+    errors = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            rows.append(record["row"])
+            errors += "error" in record
+    problems = []
+    if len(rows) != len(set(rows)):
+        problems.append(f"{len(rows) - len(set(rows))} rows written twice")
+    if set(rows) != set(range(count)):
+        problems.append(f"{count - len(set(rows))} rows missing")
+    if errors:
+        problems.append(f"{errors} rows without a valid result")
+    return problems
+
+app = typer.Typer()
+
+@app.command()
+def main(
+    items: int = 5000,
+    batch_size: int = 500,
+    max_pending: int = 4,
+    concurrency: int = 32,
+    latency: float = 0.5,
+    batch_latency: float = 2.0,
+    overloaded: float = 0.02,
+):
+    server = MockClaudeServer(latency=latency, batch_latency=batch_latency, overloaded=overloaded).start()
+    pool = ClaudePool(base_url=server.base_url, api_key="mock", max_concurrency=concurrency, backoff=0.05)
+    tool_name, system_prompt = structured.TASKS["sentiment"]
+    tool = structured.tool_named(tool_name)
+
+    def extractor(mode, on_progress=None):
+        return BulkExtractor(
+            pool.client, tool, system_prompt, structured.CLAUDE_MODEL, mode=mode, batch_size=batch_size,
+            max_pending=max_pending, poll_interval=min(1.0, batch_latency / 4), concurrency=concurrency,
+            on_progress=on_progress,
+        )
+
+    def kill_after_second_batch(run):
+        if run.stats["batches"] == 2:
+            raise Killed()
+
+    failed = False
+    typer.echo(f"{items} items, batches of {batch_size}, {latency:g}s realtime, {batch_latency:g}s per batch, {overloaded:.0%} overloaded")
+    typer.echo(f"{'run':<16}{'items/s':>9}{'batches':>9}{'realtime':>10}{'in batches':>12}{'$ per 1k':>10}  check")
+    with tempfile.TemporaryDirectory() as directory:
+        tweets = os.path.join(directory, "tweets.jsonl")
+        write_tweets(tweets, items)
+        batches_uninterrupted = None
+        for label, mode, interrupt in (
+            ("realtime", "realtime", False),
+            ("batch", "auto", False),
+            ("batch, resumed", "auto", True),
+        ):
+            output = os.path.join(directory, f"{label}.jsonl")
+            before = (len(server.batches), server.messages, server.batch_messages)
+            runs = []
+            started = time.perf_counter()
+            if interrupt:
+                runs.append(extractor(mode, kill_after_second_batch))
+                checkpoint = Checkpoint(output)
+                try:
+                    runs[-1].run(read_items(tweets), checkpoint)
+                except Killed:
+                    pass
+                finally:
+                    checkpoint.close()
+            runs.append(extractor(mode))
+            checkpoint = Checkpoint(output)
+            try:
+                runs[-1].run(read_items(tweets), checkpoint)
+            finally:
+                checkpoint.close()
+            elapsed = time.perf_counter() - started
+            batches = len(server.batches) - before[0]
+            cost = sum(sum(run.cost()) for run in runs)
+            problems = check_output(output, items)
+            if mode == "auto" and not interrupt:
+                batches_uninterrupted = batches
+            elif interrupt and batches_uninterrupted is not None and batches > batches_uninterrupted:
+                problems.append(f"{batches - batches_uninterrupted} batches resubmitted")
+            failed = failed or bool(problems)
+            typer.echo(
+                f"{label:<16}{items / elapsed:>9.0f}{batches:>9}{server.messages - before[1]:>10}"
+                f"{server.batch_messages - before[2]:>12}{1000 * cost / items:>10.4f}  {'; '.join(problems) or 'ok'}"
+            )
+    pool.close()
+    if failed:
+        raise typer.Exit(1)
+
+if __name__ == '__main__':
+    app()
@@ -0,0 +1,107 @@
+"""
+Measure requests/sec through claude_client against the mock Messages server.
+
+A mock_claude_server.py instance with ``--latency`` seconds per response
+(and optionally a share of 529/429 errors) stands in for the API. The
+same workload is sent four ways:
+
+    one client, sequential   a plain anthropic.Anthropic, one call at a time (the old scripts)
+    pool, threads            the blocking facade from ``--concurrency`` threads
+    pool, asyncio            the async facade, ``--concurrency`` calls at once
+    pool, duplicates         as above, but every request is sent twice at once
+
+Reported per run: requests/sec, HTTP requests the server saw, retries,
+coalesced requests and failed requests. The sequential run only sends
+``--sequential`` requests, as it would otherwise dominate the time.
+Every run shares the process with the server, so at very low latencies
+the SDK's own per-request CPU cost is what limits the pooled runs.
+
+    python bench_claude_client.py --requests 1000 --concurrency 64 --latency 0.5 --overloaded 0.05
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import anthropic
+import typer
+
+from claude_client import ClaudePool
+from mock_claude_server import MockClaudeServer
+
+MODEL = "claude-3-7-sonnet-20250219"
+
+def request(i):
+    return {"model": MODEL, "max_tokens": 100, "messages": [{"role": "user", "content": f"Where is order {i}?"}]}
+
+def run_sequential(server, count):
+    client = anthropic.Anthropic(base_url=server.base_url, api_key="mock", max_retries=0)
+    failed = 0
+    for i in range(count):
+        try:
+            client.messages.create(**request(i))
+        except anthropic.APIStatusError:
+            failed += 1
+    return failed
+
+def run_threads(pool, requests, concurrency):
+    def send(body):
+        try:
+            pool.client.messages.create(**body)
+            return 0
+        except anthropic.APIStatusError:
+            return 1
+
+    with ThreadPoolExecutor(concurrency) as threads:
+        return sum(threads.map(send, requests))
+
+async def run_async(pool, requests):
+    results = await asyncio.gather(
+        *(pool.async_client.messages.create(**body) for body in requests), return_exceptions=True
+    )
+    return sum(isinstance(result, Exception) for result in results)
+
+app = typer.Typer()
+
+@app.command()
+def main(
+    requests: int = 1000,
+    concurrency: int = 64,
+    latency: float = 0.5,
+    overloaded: float = 0.0,
+    rate_limited: float = 0.0,
+    sequential: int = 20,
+):
+    server = MockClaudeServer(latency=latency, overloaded=overloaded, rate_limited=rate_limited).start()
+    distinct = [request(i) for i in range(requests)]
+    duplicated = [request(i // 2) for i in range(requests)]
+
+    def pool():
+        return ClaudePool(
+            base_url=server.base_url, api_key="mock", max_connections=concurrency, max_concurrency=concurrency, backoff=0.05
+        )
+
+    pools = {"pool, threads": pool(), "pool, asyncio": pool(), "pool, duplicates": pool()}
+    runs = {
+        "one client, sequential": (sequential, None, lambda: run_sequential(server, sequential)),
+        "pool, threads": (requests, pools["pool, threads"], lambda: run_threads(pools["pool, threads"], distinct, concurrency)),
+        "pool, asyncio": (requests, pools["pool, asyncio"], lambda: asyncio.run(run_async(pools["pool, asyncio"], distinct))),
+        "pool, duplicates": (requests, pools["pool, duplicates"], lambda: asyncio.run(run_async(pools["pool, duplicates"], duplicated))),
+    }
+    typer.echo(f"{latency * 1000:g} ms per response, {overloaded:.0%} overloaded, {rate_limited:.0%} rate limited, concurrency {concurrency}")
+    typer.echo(f"{'run':<24}{'requests':>9}{'req/s':>9}{'http':>7}{'retries':>9}{'coalesced':>11}{'failed':>8}")
+    for label, (count, run_pool, run) in runs.items():
+        before = server.requests
+        started = time.perf_counter()
+        failed = run()
+        elapsed = time.perf_counter() - started
+        stats = run_pool.stats() if run_pool else {"retries": 0, "coalesced": 0}
+        typer.echo(
+            f"{label:<24}{count:>9}{count / elapsed:>9.0f}{server.requests - before:>7}"
+            f"{stats['retries']:>9}{stats['coalesced']:>11}{failed:>8}"
+        )
+    for run_pool in pools.values():
+        run_pool.close()
+
+if __name__ == '__main__':
+    app()
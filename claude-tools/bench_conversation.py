@@ -0,0 +1,157 @@
+"""
+Simulate a long support session and report input tokens per turn.
+
+Each turn the user asks something, Claude calls one tool whose result is
+about ``--result-tokens`` long, and then answers. A fake client stands in
+for the Messages API. It counts request tokens with the same estimate the
+Conversation uses and models the provider's prompt cache: a request reads
+from the cache the longest prefix that an earlier request marked with a
+cache_control breakpoint and writes everything up to its own last
+breakpoint. The session runs three ways:
+
+    plain list          messages resent in full every call (the old loops)
+    cache               Conversation with cache_control breakpoints
+    cache + compaction  Conversation with a token_budget as well
+
+Reported per turn: input tokens processed uncached, written to the cache
+and read from it. Without compaction the total keeps growing with the
+session; with it the total stays flat and is mostly cache reads.
+
+    python bench_conversation.py --turns 50 --result-tokens 1500 --budget 20000
+"""
+
+import hashlib
+import json
+
+import typer
+from anthropic.types import Message, TextBlock, ToolUseBlock, Usage
+
+from agent import ToolExecutor, run_agent
+from conversation import Conversation, as_dict
+from passages import estimate_tokens
+from registry import ToolRegistry
+
+SYSTEM_PROMPT = "You are a customer support agent for TechNova."
+
+def make_executor(result_tokens):
+    registry = ToolRegistry()
+
+    @registry.tool
+    def get_order_history(customer_id: str):
+        """
+        Retrieves every order a customer has placed, with line items and shipping events.
+
+        Args:
+            customer_id: The customer_id belonging to the user
+        """
+        line = f"order for {customer_id}: 2 x Wireless Headphones, shipped, delivered, no returns. "
+        return line * (result_tokens * 4 // len(line) + 1)
+
+    return ToolExecutor(registry)
+
+def segments(request):
+    """Cache-relevant parts of a request in order, as (key, tokens, is_breakpoint)."""
+    parts = [as_dict(tool) for tool in request.get("tools", [])]
+    system = request.get("system")
+    if system:
+        parts += system if isinstance(system, list) else [{"type": "text", "text": system}]
+    for message in request["messages"]:
+        content = message["content"]
+        blocks = [{"type": "text", "text": content}] if isinstance(content, str) else [as_dict(block) for block in content]
+        parts += [{"role": message["role"], **block} for block in blocks]
+    result = []
+    digest = hashlib.sha256()
+    for part in parts:
+        breakpoint = "cache_control" in part
+        part = {name: value for name, value in part.items() if name != "cache_control"}
+        encoded = json.dumps(part, sort_keys=True, default=str)
+        digest.update(encoded.encode("utf-8"))
+        result.append((digest.hexdigest(), estimate_tokens(encoded), breakpoint))
+    return result
+
+class FakeMessages:
+    def __init__(self):
+        self.cached = set()
+        self.calls = 0
+
+    def create(self, **request):
+        self.calls += 1
+        parts = segments(request)
+        total = sum(tokens for _, tokens, _ in parts)
+        read = write = 0
+        breakpoints = [i for i, (_, _, breakpoint) in enumerate(parts) if breakpoint]
+        if breakpoints:
+            hit = max((i for i in range(breakpoints[-1] + 1) if parts[i][0] in self.cached), default=-1)
+            read = sum(tokens for _, tokens, _ in parts[: hit + 1])
+            write = sum(tokens for _, tokens, _ in parts[hit + 1: breakpoints[-1] + 1])
+            self.cached.update(parts[i][0] for i in breakpoints)
+        usage = Usage(
+            input_tokens=total - read - write,
+            cache_creation_input_tokens=write,
+            cache_read_input_tokens=read,
+            output_tokens=50,
+        )
+        last = request["messages"][-1]["content"]
+        asked_tool = isinstance(last, list) and any(as_dict(block).get("type") == "tool_result" for block in last)
+        if asked_tool:
+            content = [TextBlock(type="text", text="Your order has shipped and should arrive on Thursday.")]
+            stop_reason = "end_turn"
+        else:
+            content = [ToolUseBlock(type="tool_use", id=f"toolu_{self.calls}", name="get_order_history", input={"customer_id": "1213210"})]
+            stop_reason = "tool_use"
+        return Message(
+            id=f"msg_{self.calls}", type="message", role="assistant", model="fake", content=content,
+            stop_reason=stop_reason, stop_sequence=None, usage=usage,
+        )
+
+class FakeClient:
+    def __init__(self):
+        self.messages = FakeMessages()
+
+def run_session(conversation, turns, result_tokens):
+    """Per turn: (uncached input, cache write, cache read) summed over the turn's calls."""
+    client = FakeClient()
+    executor = make_executor(result_tokens)
+    per_turn = []
+    messages = conversation.messages if isinstance(conversation, Conversation) else conversation
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"Where is my order? (message {turn})"})
+        usage = []
+        run_agent(
+            client,
+            executor,
+            conversation,
+            on_response=lambda response: usage.append(response.usage),
+            system=SYSTEM_PROMPT,
+            model="fake",
+            max_tokens=1000,
+        )
+        per_turn.append((
+            sum(u.input_tokens for u in usage),
+            sum(u.cache_creation_input_tokens for u in usage),
+            sum(u.cache_read_input_tokens for u in usage),
+        ))
+    return per_turn
+
+app = typer.Typer()
+
+@app.command()
+def main(turns: int = 50, result_tokens: int = 1500, budget: int = 20000, every: int = 5):
+    sessions = {
+        "plain list": run_session([], turns, result_tokens),
+        "cache": run_session(Conversation(), turns, result_tokens),
+        "cache + compaction": run_session(Conversation(token_budget=budget), turns, result_tokens),
+    }
+    for label, per_turn in sessions.items():
+        typer.echo(f"\n{label}")
+        typer.echo(f"{'turn':>5}{'uncached':>10}{'cache write':>13}{'cache read':>12}{'total':>8}")
+        for turn, (uncached, write, read) in enumerate(per_turn, start=1):
+            if turn == 1 or turn % every == 0:
+                typer.echo(f"{turn:>5}{uncached:>10}{write:>13}{read:>12}{uncached + write + read:>8}")
+        uncached = sum(turn[0] for turn in per_turn)
+        write = sum(turn[1] for turn in per_turn)
+        read = sum(turn[2] for turn in per_turn)
+        typer.echo(f"{'all':>5}{uncached:>10}{write:>13}{read:>12}{uncached + write + read:>8}")
+
+if __name__ == '__main__':
+    app()
@@ -0,0 +1,83 @@
+"""
+Measure the per-call overhead of tool dispatch.
+
+A no-op tool is called through each dispatch style the scripts have used:
+a direct call, the old globals() lookup, the old if/elif chain, a plain
+name -> function dict and ToolRegistry.call (schema validation plus stats).
+The same tool is also run through ToolExecutor.execute, the full
+concurrent path of an agent turn, whose cost is dominated by the event
+loop and thread hand-off. No API calls are made.
+
+    python bench_dispatch.py --calls 100000
+"""
+
+import time
+from types import SimpleNamespace
+
+import typer
+
+from agent import ToolExecutor
+from registry import ToolRegistry
+
+registry = ToolRegistry()
+
+@registry.tool
+def lookup(order_id: str, include_items: bool = False):
+    """
+    Returns the order ID it was given.
+
+    Args:
+        order_id: The order to look up
+        include_items: Whether to include the order's line items
+    """
+    return order_id
+
+def other_tool(x):
+    return x
+
+FUNCTIONS = {"other_tool": other_tool, "lookup": lookup}
+
+def if_elif_dispatch(name, arguments):
+    if name == "other_tool":
+        return other_tool(**arguments)
+    elif name == "lookup":
+        return lookup(**arguments)
+
+def time_per_call(call, calls, rounds=5):
+    """Best-of-``rounds`` nanoseconds per call, so warm-up and noise do not count."""
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(calls):
+            call()
+        best = min(best, time.perf_counter() - started)
+    return 1e9 * best / calls
+
+app = typer.Typer()
+
+@app.command()
+def main(calls: int = 100000, turns: int = 500):
+    name = "lookup"
+    arguments = {"order_id": "24601", "include_items": True}
+    variants = {
+        "direct call": lambda: lookup(**arguments),
+        "globals() lookup": lambda: globals()[name](**arguments),
+        "if/elif chain": lambda: if_elif_dispatch(name, arguments),
+        "dict lookup": lambda: FUNCTIONS[name](**arguments),
+        "ToolRegistry.call": lambda: registry.call(name, arguments),
+    }
+    results = {label: time_per_call(call, calls) for label, call in variants.items()}
+
+    executor = ToolExecutor(registry)
+    tool_uses = [SimpleNamespace(id="toolu_bench", name=name, input=arguments)]
+    results["ToolExecutor.execute"] = time_per_call(lambda: executor.execute(tool_uses), turns)
+
+    baseline = results["direct call"]
+    typer.echo(f"{'dispatch':<24}{'ns/call':>12}{'overhead ns':>14}")
+    for label, ns in results.items():
+        typer.echo(f"{label:<24}{ns:>12.0f}{ns - baseline:>14.0f}")
+    typer.echo("")
+    typer.echo(registry.format_stats())
+
+if __name__ == '__main__':
+    app()
@@ -0,0 +1,131 @@
+"""
+Time FakeDatabase lookups from 10 to millions of rows.
+
+For each size, synthetic customers (one per four orders) and orders are
+loaded into the in-memory store, a SQLite store in a temporary directory
+and, up to ``--scan-max`` rows, the old list-of-dicts scan for comparison.
+Each tool-facing method is then timed over ``--lookups`` random keys.
+Reported: load time and mean microseconds per call.
+
+Loading 10M rows in memory needs several GB of RAM; SQLite does not.
+
+    python bench_fake_db.py --max-rows 10000000 --scan-max 100000
+"""
+
+import os
+import random
+import tempfile
+import time
+
+import typer
+
+from fake_db import FakeDatabase
+
+STATUSES = ("Processing", "Shipped", "Delivered")
+
+class ScanDatabase:
+    """The original FakeDatabase: lists of dicts and linear scans."""
+
+    def __init__(self, customers, orders):
+        self.customers = list(customers)
+        self.orders = list(orders)
+
+    def get_user(self, key, value):
+        for customer in self.customers:
+            if customer[key] == value:
+                return customer
+        return f"Couldn't find a user with {key} of {value}"
+
+    def get_order_by_id(self, order_id):
+        for order in self.orders:
+            if order["id"] == order_id:
+                return order
+        return None
+
+    def get_customer_orders(self, customer_id):
+        return [order for order in self.orders if order["customer_id"] == customer_id]
+
+    def cancel_order(self, order_id):
+        order = self.get_order_by_id(order_id)
+        if order:
+            if order["status"] == "Processing":
+                order["status"] = "Cancelled"
+                return "Cancelled the order"
+            else:
+                return "Order has already shipped.  Can't cancel it."
+        return "Can't find that order!"
+
+def customer_rows(count):
+    for i in range(count):
+        yield {
+            "id": f"c{i}",
+            "name": f"Customer {i}",
+            "email": f"customer{i}@example.com",
+            "phone": f"555-{i:07d}",
+            "username": f"user{i}",
+        }
+
+def order_rows(count, customers):
+    for i in range(count):
+        yield {
+            "id": f"o{i}",
+            "customer_id": f"c{i % customers}",
+            "product": "Wireless Headphones",
+            "quantity": 1 + i % 3,
+            "price": 79.99,
+            "status": STATUSES[i % len(STATUSES)],
+        }
+
+def time_calls(db, rows, customers, lookups):
+    """Mean microseconds per call of each tool-facing method."""
+    rng = random.Random(0)
+    order_ids = [f"o{rng.randrange(rows)}" for _ in range(lookups)]
+    customer_ids = [f"c{rng.randrange(customers)}" for _ in range(lookups)]
+    calls = {
+        "get_user": lambda i: db.get_user("email", f"customer{customer_ids[i][1:]}@example.com"),
+        "get_order_by_id": lambda i: db.get_order_by_id(order_ids[i]),
+        "get_customer_orders": lambda i: db.get_customer_orders(customer_ids[i]),
+        "cancel_order": lambda i: db.cancel_order(order_ids[i]),
+    }
+    timings = {}
+    for name, call in calls.items():
+        started = time.perf_counter()
+        for i in range(lookups):
+            call(i)
+        timings[name] = 1e6 * (time.perf_counter() - started) / lookups
+    return timings
+
+app = typer.Typer()
+
+@app.command()
+def main(max_rows: int = 1000000, scan_max: int = 100000, lookups: int = 1000):
+    sizes = []
+    rows = 10
+    while rows <= max_rows:
+        sizes.append(rows)
+        rows *= 10
+    names = ("get_user", "get_order_by_id", "get_customer_orders", "cancel_order")
+    typer.echo(f"{'orders':>10}  {'store':<7}{'load s':>9}" + "".join(f"{name:>22}" for name in names))
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            customers = rows // 4 + 1
+            stores = {
+                "memory": lambda: FakeDatabase(customer_rows(customers), order_rows(rows, customers)),
+                "sqlite": lambda: FakeDatabase(
+                    customer_rows(customers), order_rows(rows, customers), path=os.path.join(directory, f"{rows}.sqlite3")
+                ),
+            }
+            if rows <= scan_max:
+                stores["scan"] = lambda: ScanDatabase(customer_rows(customers), order_rows(rows, customers))
+            for label, build in stores.items():
+                started = time.perf_counter()
+                db = build()
+                load = time.perf_counter() - started
+                # Scans are slow enough that fewer lookups give a stable mean
+                count = lookups if label != "scan" else max(10, min(lookups, 10 ** 7 // rows))
+                timings = time_calls(db, rows, customers, count)
+                typer.echo(f"{rows:>10}  {label:<7}{load:>9.2f}" + "".join(f"{timings[name]:>19.1f} us" for name in names))
+                del db
+
+if __name__ == '__main__':
+    app()
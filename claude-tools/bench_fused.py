@@ -0,0 +1,92 @@
+"""
+Report what fused extraction saves over one call per task, on a sample corpus.
+
+Every text in structured_corpus.json is analysed twice with
+3_structured_outputs: three forced calls (sentiment, entities,
+translation), as ``extract`` does today, each resending all three tool
+definitions and the text; and one ``extract_fused`` call with a single
+composite tool, whose result is split per task and validated. Reported
+per text and in total: wall time, input and output tokens and whether the
+fused result passed validation.
+
+By default the mock Messages server answers every call after
+``--latency`` seconds, so times mostly count round-trips; its token
+counts are estimates. ``--live`` uses the real API through claude_client
+instead and needs ANTHROPIC_API_KEY.
+
+    python bench_fused.py [--corpus structured_corpus.json] [--latency 1.0] [--live]
+"""
+
+import importlib
+import json
+import time
+
+import typer
+
+from claude_client import ClaudePool
+from mock_claude_server import MockClaudeServer
+from registry import ToolInputError
+
+CORPUS_PATH = "structured_corpus.json"
+
+structured = importlib.import_module("3_structured_outputs")
+
+app = typer.Typer()
+
+def timed(call):
+    started = time.perf_counter()
+    result = call()
+    return result, time.perf_counter() - started
+
+@app.command()
+def main(corpus: str = CORPUS_PATH, latency: float = 1.0, live: bool = False):
+    with open(corpus) as f:
+        texts = json.load(f)
+    pool = None
+    if not live:
+        server = MockClaudeServer(latency=latency).start()
+        pool = ClaudePool(base_url=server.base_url, api_key="mock")
+        structured.client = pool.client
+    tasks = list(structured.TASKS)
+
+    totals = {"separate": [0.0, 0, 0], "fused": [0.0, 0, 0]}
+    valid = 0
+    typer.echo(f"{'text':<42}{'3 calls s':>10}{'fused s':>9}{'3 calls in':>12}{'fused in':>10}{'3 calls out':>13}{'fused out':>11}  valid")
+    for text in texts:
+        responses, separate_seconds = timed(lambda: [structured.extract(task, text) for task in tasks])
+        started = time.perf_counter()
+        try:
+            _, response = structured.extract_fused(text, tasks)
+            valid += 1
+            ok = "yes"
+        except ToolInputError as e:
+            response = None
+            ok = f"NO: {e}"
+        fused_seconds = time.perf_counter() - started
+        separate = [
+            separate_seconds,
+            sum(r.usage.input_tokens for r in responses),
+            sum(r.usage.output_tokens for r in responses),
+        ]
+        combined = [fused_seconds, 0, 0]
+        if response is not None:
+            combined[1:] = [response.usage.input_tokens, response.usage.output_tokens]
+        for total, values in ((totals["separate"], separate), (totals["fused"], combined)):
+            for i, value in enumerate(values):
+                total[i] += value
+        typer.echo(
+            f"{text[:40]:<42}{separate[0]:>10.2f}{combined[0]:>9.2f}{separate[1]:>12}{combined[1]:>10}"
+            f"{separate[2]:>13}{combined[2]:>11}  {ok}"
+        )
+
+    separate, fused = totals["separate"], totals["fused"]
+    typer.echo("")
+    typer.echo(f"wall time      {separate[0]:8.2f}s vs {fused[0]:8.2f}s  ({1 - fused[0] / separate[0]:.0%} saved)")
+    typer.echo(f"input tokens   {separate[1]:>9} vs {fused[1]:>9}  ({1 - fused[1] / separate[1]:.0%} saved)")
+    typer.echo(f"output tokens  {separate[2]:>9} vs {fused[2]:>9}")
+    typer.echo(f"fused results valid for {valid}/{len(texts)} texts")
+    if pool:
+        pool.close()
+
+if __name__ == '__main__':
+    app()
@@ -0,0 +1,53 @@
+"""
+Time Wikipedia lookups against the local fixture server.
+
+A wiki_fixture_server.py instance with ``--latency`` seconds per response
+stands in for Wikipedia. The same search terms are fetched three ways:
+one at a time without a cache (the old behaviour, minus its second request
+per title), concurrently into an empty on-disk cache, and again from that
+warm cache. Wall time and the number of HTTP requests are printed for each.
+
+    python bench_wiki.py --articles 8 --latency 0.3
+"""
+
+import os
+import tempfile
+import time
+
+import typer
+
+from wiki import WikiCache, WikipediaClient
+from wiki_fixture_server import WikiFixtureServer
+
+app = typer.Typer()
+
+@app.command()
+def main(articles: int = 8, latency: float = 0.3, words: int = 2000):
+    fixtures = {
+        f"Article {i}": " ".join(f"Sentence {j} of article {i}." for j in range(words // 5))
+        for i in range(articles)
+    }
+    server = WikiFixtureServer(fixtures, latency=latency).start()
+    terms = list(fixtures)
+
+    with tempfile.TemporaryDirectory() as directory:
+        runs = {
+            "sequential, no cache": (WikipediaClient(server.api_url, max_connections=1), terms),
+            "concurrent, cold cache": (WikipediaClient(server.api_url, WikiCache(os.path.join(directory, "wiki.sqlite3"))), terms),
+        }
+        runs["concurrent, warm cache"] = (runs["concurrent, cold cache"][0], terms)
+        typer.echo(f"{articles} articles, {latency:g}s per round-trip")
+        typer.echo(f"{'run':<26}{'seconds':>9}{'requests':>10}")
+        for label, (client, run_terms) in runs.items():
+            before = server.requests
+            started = time.perf_counter()
+            if client.cache is None:
+                for term in run_terms:
+                    client.get_article(term)
+            else:
+                client.get_articles(run_terms)
+            elapsed = time.perf_counter() - started
+            typer.echo(f"{label:<26}{elapsed:>9.3f}{server.requests - before:>10}")
+
+if __name__ == '__main__':
+    app()
@@ -0,0 +1,345 @@
+"""
+Bulk structured extraction: one forced tool call per text, for millions of texts.
+
+Texts are streamed from a JSONL or CSV file and sent in chunks of
+``batch_size`` through the Message Batches API, with up to
+``max_pending`` batches in flight at once. Each result's ``tool_use``
+input is validated against the tool's input_schema and appended to an
+output JSONL file as it arrives:
+
+    {"row": 7, "id": "t7", "via": "batch", "input": {...}}
+    {"row": 8, "id": "t8", "via": "realtime", "error": "input.positive_score is required"}
+
+In ``auto`` mode, requests a batch could not answer (errored, expired or
+invalid output) are retried as concurrent realtime calls, and if the
+Batches API itself is unavailable the whole run falls back to them.
+``realtime`` mode never uses batches; ``batch`` mode never falls back.
+
+Progress survives a crash. The output file records every finished row,
+and ``<output>.checkpoint.json`` records the batches submitted but not yet
+collected, so a rerun with the same arguments collects those instead of
+resubmitting them and skips rows already written. Every row ends up in
+the output exactly once.
+
+Only final failures (a rejected request, output that fails validation)
+are written as error rows. Rows that still fail transiently after the
+client's retries (overloaded, connection errors, expired batch requests)
+are left out and counted as ``deferred``, so a rerun picks them up.
+"""
+
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import anthropic
+
+from claude_client import is_transient
+from registry import compile_schema, schema_problems
+
+BATCH_SIZE = 1000
+MAX_PENDING_BATCHES = 4
+POLL_INTERVAL = 30.0
+REALTIME_CONCURRENCY = 32
+# USD per million (input, output) tokens; batches are billed at BATCH_DISCOUNT of that
+PRICES = {
+    "claude-3-5-sonnet-20240620": (3.0, 15.0),
+    "claude-3-7-sonnet-20250219": (3.0, 15.0),
+    "claude-3-5-haiku-20241022": (0.8, 4.0),
+}
+BATCH_DISCOUNT = 0.5
+# Statuses meaning the Batches API is not available to this key or endpoint
+BATCHES_UNAVAILABLE = (403, 404, 405)
+
+
+def read_items(path, text_field="text", id_field="id"):
+    """
+    Yield ``(row, id, text)`` for every record of a .jsonl or .csv file, lazily.
+
+    ``row`` counts records from 0 and identifies them across runs; ``id``
+    is the record's ``id_field``, or the row if it has none.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for row, record in enumerate(records):
+            yield row, record.get(id_field, row), record[text_field]
+
+
+def chunks(items, size):
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+class Checkpoint:
+    """
+    The output file and the batches still to collect, for resuming.
+
+    Loading trims a line left half-written by a crash, so appending
+    carries on cleanly.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.path = output_path + ".checkpoint.json"
+        self.done = set()
+        if os.path.exists(output_path):
+            with open(output_path, "rb+") as f:
+                data = f.read()
+                end = data.rfind(b"\n") + 1
+                if end < len(data):
+                    f.truncate(end)
+            for line in data[:end].splitlines():
+                self.done.add(json.loads(line)["row"])
+        self.batches = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.batches = {batch_id: [tuple(item) for item in items] for batch_id, items in json.load(f).items()}
+        self._out = open(output_path, "a", encoding="utf-8")
+
+    def write(self, record):
+        """Append a finished row unless it is already there; returns whether it was written."""
+        if record["row"] in self.done:
+            return False
+        self._out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._out.flush()
+        self.done.add(record["row"])
+        return True
+
+    def add_batch(self, batch_id, items):
+        self.batches[batch_id] = items
+        self._save()
+
+    def finish_batch(self, batch_id):
+        del self.batches[batch_id]
+        self._save()
+
+    def _save(self):
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(self.batches, f)
+        os.replace(temporary, self.path)
+
+    def close(self):
+        self._out.close()
+        if not self.batches and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _error_type(result):
+    """The API error type of an errored batch result, e.g. "overloaded_error"."""
+    error = getattr(result, "error", None)
+    return getattr(getattr(error, "error", None), "type", None)
+
+
+class BulkExtractor:
+    """
+    Runs one forced ``tool`` call per text and keeps its validated input.
+
+    Args:
+        client: A claude_client Client (``messages.create`` and ``messages.batches``)
+        tool: The tool definition the model is made to call
+        system: System prompt of every request
+        model: Model name, also used to look up PRICES
+        mode: "auto", "batch" or "realtime"
+        batch_size: Requests per batch, and per chunk of realtime calls
+        max_pending: Batches in flight at once
+        poll_interval: Seconds between checks on pending batches
+        concurrency: Realtime calls at once
+        on_progress: Called with the extractor after every submitted or collected batch
+        **create_kwargs: More request parameters (max_tokens, temperature, ...)
+    """
+
+    def __init__(
+        self,
+        client,
+        tool,
+        system,
+        model,
+        mode="auto",
+        batch_size=BATCH_SIZE,
+        max_pending=MAX_PENDING_BATCHES,
+        poll_interval=POLL_INTERVAL,
+        concurrency=REALTIME_CONCURRENCY,
+        on_progress=None,
+        **create_kwargs,
+    ):
+        if mode not in ("auto", "batch", "realtime"):
+            raise ValueError(f"mode must be auto, batch or realtime, not {mode!r}")
+        self.client = client
+        self.tool = tool
+        self.system = system
+        self.model = model
+        self.mode = mode
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self.concurrency = concurrency
+        self.on_progress = on_progress
+        self.create_kwargs = {"max_tokens": 1000, **create_kwargs}
+        self._is_valid = compile_schema(tool["input_schema"])
+        self.stats = {
+            "written": 0, "batch": 0, "realtime": 0, "errors": 0, "deferred": 0, "batches": 0,
+            "batch_input_tokens": 0, "batch_output_tokens": 0, "realtime_input_tokens": 0, "realtime_output_tokens": 0,
+        }
+
+    def request(self, text):
+        """Parameters of the Messages request for one text."""
+        return {
+            "model": self.model,
+            "system": self.system,
+            "tools": [self.tool],
+            "tool_choice": {"type": "tool", "name": self.tool["name"]},
+            "messages": [{"role": "user", "content": text}],
+            **self.create_kwargs,
+        }
+
+    def parse(self, message):
+        """The validated tool input of ``message``, as ``(input, None)`` or ``(None, error)``."""
+        for block in message.content:
+            if block.type == "tool_use" and block.name == self.tool["name"]:
+                if self._is_valid(block.input):
+                    return block.input, None
+                return None, "; ".join(schema_problems(self.tool["input_schema"], block.input)) or "invalid input"
+        return None, f"no {self.tool['name']} tool_use in the response"
+
+    def _count(self, via, message):
+        usage = message.usage
+        self.stats[f"{via}_input_tokens"] += usage.input_tokens
+        self.stats[f"{via}_output_tokens"] += usage.output_tokens
+
+    def _write(self, checkpoint, via, row, item_id, tool_input=None, error=None):
+        record = {"row": row, "id": item_id, "via": via}
+        if error is None:
+            record["input"] = tool_input
+        else:
+            record["error"] = error
+        if checkpoint.write(record):
+            self.stats["written"] += 1
+            self.stats[via] += 1
+            self.stats["errors"] += error is not None
+
+    def _realtime_one(self, text):
+        """``(message, tool input, error)``; all None if the call failed transiently."""
+        try:
+            message = self.client.messages.create(**self.request(text))
+        except anthropic.APIError as e:
+            if is_transient(e):
+                return None, None, None
+            return None, None, str(e)
+        return (message, *self.parse(message))
+
+    def run_realtime(self, items, checkpoint):
+        """Answer ``items`` with concurrent realtime calls."""
+        with ThreadPoolExecutor(self.concurrency) as threads:
+            for (row, item_id, _), (message, tool_input, error) in zip(
+                items, threads.map(lambda item: self._realtime_one(item[2]), items)
+            ):
+                if message is None and error is None:
+                    self.stats["deferred"] += 1
+                    continue
+                if message is not None:
+                    self._count("realtime", message)
+                self._write(checkpoint, "realtime", row, item_id, tool_input, error)
+
+    def _submit(self, items, checkpoint):
+        batch = self.client.messages.batches.create(
+            requests=[{"custom_id": f"row-{row}", "params": self.request(text)} for row, _, text in items]
+        )
+        checkpoint.add_batch(batch.id, items)
+        self.stats["batches"] += 1
+        return batch.id
+
+    def _collect(self, batch_id, items, checkpoint):
+        """Write a finished batch's results and retry or record what it could not answer."""
+        by_row = {row: (item_id, text) for row, item_id, text in items}
+        retry = []
+        # Row -> error for requests that will fail again; the rest are worth another try
+        failures = {}
+        for result in self.client.messages.batches.results(batch_id):
+            row = int(result.custom_id.split("-", 1)[1])
+            if row not in by_row:
+                continue
+            item_id, text = by_row.pop(row)
+            if result.result.type == "succeeded":
+                self._count("batch", result.result.message)
+                tool_input, error = self.parse(result.result.message)
+                if error is None:
+                    self._write(checkpoint, "batch", row, item_id, tool_input)
+                    continue
+                failures[row] = error
+            elif result.result.type == "errored" and _error_type(result.result) == "invalid_request_error":
+                failures[row] = "batch request errored: invalid_request_error"
+            retry.append((row, item_id, text))
+        retry += [(row, item_id, text) for row, (item_id, text) in by_row.items()]
+        retry = [item for item in retry if item[0] not in checkpoint.done]
+        if self.mode == "auto":
+            self.run_realtime(retry, checkpoint)
+        else:
+            for row, item_id, _ in retry:
+                if row in failures:
+                    self._write(checkpoint, "batch", row, item_id, error=failures[row])
+                else:
+                    self.stats["deferred"] += 1
+        checkpoint.finish_batch(batch_id)
+
+    def _progress(self):
+        if self.on_progress:
+            self.on_progress(self)
+
+    def run(self, items, checkpoint):
+        """
+        Extract every item not yet in ``checkpoint`` and return the stats.
+
+        Batches left pending by an earlier run are collected first.
+        """
+        pending = dict(checkpoint.batches)
+        in_batches = {row for batch in pending.values() for row, _, _ in batch}
+        items = (item for item in items if item[0] not in checkpoint.done and item[0] not in in_batches)
+        remaining = chunks(items, self.batch_size)
+        realtime = self.mode == "realtime"
+        while True:
+            while not realtime and len(pending) < self.max_pending:
+                chunk = next(remaining, None)
+                if chunk is None:
+                    break
+                try:
+                    pending[self._submit(chunk, checkpoint)] = chunk
+                except anthropic.APIStatusError as e:
+                    if self.mode != "auto" or e.status_code not in BATCHES_UNAVAILABLE:
+                        raise
+                    realtime = True
+                    self.run_realtime(chunk, checkpoint)
+                self._progress()
+            if not pending:
+                break
+            ended = [
+                batch_id for batch_id in pending
+                if self.client.messages.batches.retrieve(batch_id).processing_status == "ended"
+            ]
+            if not ended:
+                time.sleep(self.poll_interval)
+                continue
+            for batch_id in ended:
+                self._collect(batch_id, pending.pop(batch_id), checkpoint)
+                self._progress()
+        for chunk in remaining:
+            self.run_realtime(chunk, checkpoint)
+            self._progress()
+        return self.stats
+
+    def cost(self):
+        """Estimated USD spent so far, as ``(batch, realtime)``."""
+        input_price, output_price = PRICES.get(self.model, (0.0, 0.0))
+
+        def priced(via):
+            tokens_in = self.stats[f"{via}_input_tokens"]
+            tokens_out = self.stats[f"{via}_output_tokens"]
+            return (tokens_in * input_price + tokens_out * output_price) / 1e6
+
+        return priced("batch") * BATCH_DISCOUNT, priced("realtime")
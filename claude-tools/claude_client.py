@@ -0,0 +1,274 @@
+"""
+One shared, pooled Anthropic client for every script in this directory.
+
+A ClaudePool owns a single ``anthropic.AsyncAnthropic`` and its pooled
+HTTP connections, running on a background event loop. Two facades with
+the usual ``client.messages.create(...)`` shape sit on top of it:
+
+    client = get_client()              # blocking, for the plain scripts
+    client = get_async_client()        # awaitable, from any event loop
+
+so threads and event loops alike share one connection pool and one set
+of limits. Every ``messages.create`` goes through the pool, which
+
+* runs at most ``max_concurrency`` API calls at once;
+* retries transient failures up to ``max_retries`` times: 429 (rate
+  limited), 529 (overloaded), 408, 409 and other 5xx responses, and
+  connection errors and timeouts, as the SDK's own retries did. It waits
+  a jittered exponential backoff or the server's ``retry-after``,
+  whichever is longer;
+* coalesces identical concurrent requests: a request equal to one already
+  in flight waits for that call instead of making its own, and both
+  callers get the same Message.
+
+The blocking facade also has ``messages.batches`` for the Message Batches
+API, sent over the same connections with the same limit and retries but
+never coalesced.
+
+Set ``ANTHROPIC_BASE_URL`` (read by the SDK) to point the pool at
+mock_claude_server.py.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+
+import anthropic
+import httpx
+
+from conversation import as_dict
+
+MAX_CONNECTIONS = int(os.getenv("CLAUDE_MAX_CONNECTIONS", "64"))
+MAX_CONCURRENCY = int(os.getenv("CLAUDE_MAX_CONCURRENCY", "32"))
+MAX_RETRIES = int(os.getenv("CLAUDE_MAX_RETRIES", "5"))
+# Besides these, every 5xx response is retried
+RETRY_STATUSES = (408, 409, 429)
+BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+REQUEST_TIMEOUT = 600.0
+
+
+def request_key(request):
+    """A digest identifying a request by its content."""
+    encoded = json.dumps(request, sort_keys=True, default=as_dict)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def retry_delay(attempt, backoff=BACKOFF, max_backoff=MAX_BACKOFF, retry_after=None):
+    """Seconds to wait before retry number ``attempt`` (from 0): full jitter, at least ``retry_after``."""
+    delay = random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def is_transient(error):
+    """Whether a failed API call is worth retrying."""
+    if isinstance(error, anthropic.APIConnectionError):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and (
+        error.status_code in RETRY_STATUSES or error.status_code >= 500
+    )
+
+
+def _retry_after(error):
+    if not isinstance(error, anthropic.APIStatusError):
+        return None
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ClaudePool:
+    """
+    The shared transport, limits, retries and request coalescing.
+
+    Args:
+        anthropic_client: An ``AsyncAnthropic``-shaped client to send through; by default one
+            is built with its own connection pool and SDK retries turned off
+        max_connections: Size of the HTTP connection pool
+        max_concurrency: API calls in flight at once; more wait their turn
+        max_retries: Retries of a transient failure before it is raised
+        backoff: Base of the exponential backoff, in seconds
+        coalesce: Whether identical concurrent requests share one API call
+        **client_kwargs: Passed to ``anthropic.AsyncAnthropic`` (api_key, base_url, ...)
+    """
+
+    def __init__(
+        self,
+        anthropic_client=None,
+        max_connections=MAX_CONNECTIONS,
+        max_concurrency=MAX_CONCURRENCY,
+        max_retries=MAX_RETRIES,
+        backoff=BACKOFF,
+        coalesce=True,
+        **client_kwargs,
+    ):
+        if anthropic_client is None:
+            http_client = anthropic.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                timeout=client_kwargs.pop("timeout", REQUEST_TIMEOUT),
+            )
+            anthropic_client = anthropic.AsyncAnthropic(http_client=http_client, max_retries=0, **client_kwargs)
+        self.anthropic = anthropic_client
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.coalesce = coalesce
+        self.loop = asyncio.new_event_loop()
+        self._limit = asyncio.Semaphore(max_concurrency)
+        self._in_flight = {}
+        self._thread = threading.Thread(target=self.loop.run_forever, name="claude-pool", daemon=True)
+        self._thread.start()
+        self.requests = 0
+        self.api_calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.client = Client(self)
+        self.async_client = AsyncClient(self)
+
+    async def _send(self, request):
+        return await self._retrying(lambda: self.anthropic.messages.create(**request))
+
+    async def _retrying(self, call):
+        """Await ``call()``, an API call, within the concurrency limit, retrying transient failures."""
+        attempt = 0
+        while True:
+            async with self._limit:
+                self.api_calls += 1
+                try:
+                    return await call()
+                except anthropic.APIError as e:
+                    if not is_transient(e) or attempt >= self.max_retries:
+                        raise
+                    delay = retry_delay(attempt, self.backoff, retry_after=_retry_after(e))
+            self.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _create(self, request):
+        """Send ``request``, or join an identical one in flight. Runs on the pool's loop."""
+        self.requests += 1
+        if not self.coalesce:
+            return await self._send(request)
+        key = request_key(request)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = self.loop.create_task(self._send(request))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # One caller giving up must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def submit(self, request):
+        """Schedule ``request`` on the pool's loop; returns a ``concurrent.futures.Future``."""
+        return asyncio.run_coroutine_threadsafe(self._create(request), self.loop)
+
+    def run(self, coroutine):
+        """Run ``coroutine`` on the pool's loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def call(self, call):
+        """Run ``call()``, an API call, like a request: limited, retried, on the pool's loop."""
+        return self.run(self._retrying(call))
+
+    def stats(self):
+        return {"requests": self.requests, "api_calls": self.api_calls, "coalesced": self.coalesced, "retries": self.retries}
+
+    def close(self):
+        close = getattr(self.anthropic, "close", None)
+        if close is not None:
+            asyncio.run_coroutine_threadsafe(close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+class _Batches:
+    def __init__(self, pool):
+        self._pool = pool
+        self._batches = pool.anthropic.messages.batches
+
+    def create(self, **kwargs):
+        return self._pool.call(lambda: self._batches.create(**kwargs))
+
+    def retrieve(self, batch_id):
+        return self._pool.call(lambda: self._batches.retrieve(batch_id))
+
+    def cancel(self, batch_id):
+        return self._pool.call(lambda: self._batches.cancel(batch_id))
+
+    def results(self, batch_id):
+        """Every result of an ended batch, as a list."""
+
+        async def collect():
+            return [result async for result in await self._batches.results(batch_id)]
+
+        return self._pool.call(collect)
+
+
+class _Messages:
+    def __init__(self, pool):
+        self._pool = pool
+
+    def create(self, **request):
+        return self._pool.submit(request).result()
+
+    @property
+    def batches(self):
+        return _Batches(self._pool)
+
+
+class _AsyncMessages:
+    def __init__(self, pool):
+        self._pool = pool
+
+    async def create(self, **request):
+        return await asyncio.wrap_future(self._pool.submit(request))
+
+
+class Client:
+    """Blocking ``messages.create`` through a ClaudePool; safe to share between threads."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.messages = _Messages(pool)
+
+
+class AsyncClient:
+    """Awaitable ``messages.create`` through a ClaudePool, usable from any event loop."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.messages = _AsyncMessages(pool)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def set_pool(pool):
+    """Replace the process-wide pool, e.g. with one pointed at mock_claude_server.py."""
+    global _pool
+    with _pool_lock:
+        _pool = pool
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ClaudePool()
+        return _pool
+
+
+def get_client():
+    return get_pool().client
+
+
+def get_async_client():
+    return get_pool().async_client
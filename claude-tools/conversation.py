@@ -0,0 +1,194 @@
+"""
+Conversation state for the tool-use loops: prompt caching, compaction and token tracking.
+
+Without it every call to ``client.messages.create`` resends the whole
+history, so a session's per-turn cost and latency grow with its length. A
+Conversation keeps that in check in three ways:
+
+* Prompt caching. Requests carry ``cache_control`` breakpoints on the last
+  tool definition, the system prompt and the newest message, so the stable
+  prefix (tools, system prompt, earlier turns) is read from the provider's
+  cache instead of being processed again.
+* Compaction. Once the estimated history size passes ``token_budget``, old
+  tool results are cut down (or summarized by a ``summarize`` callback),
+  and if that is not enough the oldest turns are dropped, until the history
+  is back under ``compact_to`` of the budget. Compacting well below the
+  budget means the cached prefix only changes every few turns rather than
+  on every one. The last ``keep_messages`` messages are never touched, and
+  the question that started the current turn is never dropped.
+* Token tracking. Every response's usage (input, cache write, cache read
+  and output tokens) is recorded next to the estimated history size.
+
+    conversation = Conversation(token_budget=20000)
+    conversation.add_user(question)
+    response = run_agent(client, executor, conversation, model=..., system=...)
+    print(conversation.format_usage())
+"""
+
+import json
+
+from passages import estimate_tokens
+
+CACHE_CONTROL = {"type": "ephemeral"}
+COMPACT_TO = 0.6
+KEEP_MESSAGES = 4
+COMPACTED_TOOL_RESULT_TOKENS = 100
+
+
+def as_dict(block):
+    """SDK content blocks as plain dicts, so they can be copied and measured."""
+    if hasattr(block, "model_dump"):
+        return block.model_dump(exclude_none=True)
+    return block
+
+
+def message_tokens(message):
+    content = message["content"]
+    if isinstance(content, str):
+        return estimate_tokens(content)
+    return estimate_tokens(json.dumps([as_dict(block) for block in content], default=str))
+
+
+def is_tool_results(message):
+    content = message["content"]
+    return (
+        message["role"] == "user"
+        and not isinstance(content, str)
+        and any(as_dict(block).get("type") == "tool_result" for block in content)
+    )
+
+
+def truncate(text, tokens):
+    """Default summarizer: keep the head of a tool result."""
+    kept = text[: tokens * 4]
+    return f"{kept}\n[... compacted: {estimate_tokens(text) - estimate_tokens(kept)} more tokens of this tool result dropped]"
+
+
+class Conversation:
+    """
+    The messages of one session plus what is needed to send them cheaply.
+
+    Args:
+        messages: Existing messages to continue from; the list is used in place
+        token_budget: Estimated history tokens that trigger compaction, or None never to compact
+        keep_messages: Most recent messages left intact
+        cache: Whether to add cache_control breakpoints to requests
+        summarize: ``summarize(text, tokens)`` shortening an old tool result; defaults to truncation
+        compact_to: Share of ``token_budget`` compaction brings the history down to
+    """
+
+    def __init__(self, messages=None, token_budget=None, keep_messages=KEEP_MESSAGES, cache=True, summarize=None, compact_to=COMPACT_TO):
+        self.messages = messages if messages is not None else []
+        self.token_budget = token_budget
+        self.keep_messages = keep_messages
+        self.cache = cache
+        self.summarize = summarize or truncate
+        self.compact_to = compact_to
+        self.usage = []
+        self.compactions = 0
+
+    def add_user(self, content):
+        self.messages.append({"role": "user", "content": content})
+
+    def add_response(self, response):
+        """Append an assistant turn and record its token usage."""
+        self.messages.append({"role": "assistant", "content": response.content})
+        usage = getattr(response, "usage", None)
+        self.usage.append({
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            "history_tokens": self.history_tokens(),
+        })
+
+    def add_tool_results(self, results):
+        self.messages.append({"role": "user", "content": results})
+
+    def history_tokens(self):
+        return sum(message_tokens(message) for message in self.messages)
+
+    def _turn_starts(self):
+        """Indexes of user messages that start a turn, i.e. are not tool results."""
+        return [
+            i for i, message in enumerate(self.messages)
+            if message["role"] == "user" and not is_tool_results(message)
+        ]
+
+    def compact(self):
+        """Shrink the history to ``compact_to`` of the budget if it is over budget."""
+        if self.token_budget is None:
+            return
+        total = self.history_tokens()
+        if total <= self.token_budget:
+            return
+        target = self.token_budget * self.compact_to
+        protected = max(0, len(self.messages) - self.keep_messages)
+        self.compactions += 1
+
+        # Old tool results first: they are the bulk of most histories
+        for i in range(protected):
+            if total <= target:
+                return
+            message = self.messages[i]
+            if not is_tool_results(message):
+                continue
+            blocks = []
+            for block in message["content"]:
+                content = block.get("content")
+                if isinstance(content, str) and estimate_tokens(content) > COMPACTED_TOOL_RESULT_TOKENS:
+                    block = {**block, "content": self.summarize(content, COMPACTED_TOOL_RESULT_TOKENS)}
+                blocks.append(block)
+            compacted = {**message, "content": blocks}
+            total += message_tokens(compacted) - message_tokens(message)
+            self.messages[i] = compacted
+
+        # Then whole turns, oldest first; a turn always starts with a user message
+        drop = 0
+        for start in self._turn_starts()[1:]:
+            if total <= target or start > protected:
+                break
+            total -= sum(message_tokens(message) for message in self.messages[drop:start])
+            drop = start
+        del self.messages[:drop]
+
+    def request(self, tools=None, **create_kwargs):
+        """
+        Compact if needed and return the keyword arguments for ``client.messages.create``.
+
+        The stored messages are not modified by the cache breakpoints; the
+        newest message is copied to carry one.
+        """
+        self.compact()
+        messages = list(self.messages)
+        tools = list(tools or [])
+        system = create_kwargs.pop("system", None)
+        if self.cache:
+            if tools:
+                tools[-1] = {**tools[-1], "cache_control": CACHE_CONTROL}
+            if isinstance(system, str):
+                system = [{"type": "text", "text": system, "cache_control": CACHE_CONTROL}]
+            if messages:
+                last = messages[-1]
+                content = last["content"]
+                if isinstance(content, str):
+                    content = [{"type": "text", "text": content}]
+                content = [as_dict(block) for block in content]
+                content[-1] = {**content[-1], "cache_control": CACHE_CONTROL}
+                messages[-1] = {**last, "content": content}
+        request = {"messages": messages, **create_kwargs}
+        if tools:
+            request["tools"] = tools
+        if system is not None:
+            request["system"] = system
+        return request
+
+    def format_usage(self):
+        """Per-call token usage as a plain-text table."""
+        lines = [f"{'call':>4}{'input':>9}{'cache write':>13}{'cache read':>12}{'output':>8}{'history~':>10}"]
+        for i, usage in enumerate(self.usage, start=1):
+            lines.append(
+                f"{i:>4}{usage['input_tokens']:>9}{usage['cache_creation_input_tokens']:>13}"
+                f"{usage['cache_read_input_tokens']:>12}{usage['output_tokens']:>8}{usage['history_tokens']:>10}"
+            )
+        return "\n".join(lines)
@@ -1,60 +1,297 @@
-class FakeDatabase:
+"""
+The customer and order data behind the support chatbot.
+
+Rows are kept in a storage engine with hash indexes, so every lookup the
+tools make is O(1) (or O(orders of the customer)) instead of a scan:
+
+    customers  by id, and by email, phone and username
+    orders     by id, and by customer_id
+
+MemoryStore keeps rows as compact ``__slots__`` records in dicts.
+SQLiteStore keeps them in a SQLite file with the same indexes, for data
+sets that should outlive the process or not fit in memory. In both, status
+changes are atomic compare-and-set operations (under a row-level lock in
+memory), so one database can be shared by concurrent chat sessions.
+FakeDatabase puts the original method signatures and return values on top
+of either:
+
+    db = FakeDatabase()                              # the sample rows, in memory
+    db = FakeDatabase(path="orders.sqlite3")         # persisted; seeded if new
+    db = FakeDatabase(customers=rows, orders=rows)   # your own rows
+"""
+
+import os
+import sqlite3
+import threading
+
+CUSTOMERS = [
+    {"id": "1213210", "name": "John Doe", "email": "john@gmail.com", "phone": "123-456-7890", "username": "johndoe"},
+    {"id": "2837622", "name": "Priya Patel", "email": "priya@candy.com", "phone": "987-654-3210", "username": "priya123"},
+    {"id": "3924156", "name": "Liam Nguyen", "email": "lnguyen@yahoo.com", "phone": "555-123-4567", "username": "liamn"},
+    {"id": "4782901", "name": "Aaliyah Davis", "email": "aaliyahd@hotmail.com", "phone": "111-222-3333", "username": "adavis"},
+    {"id": "5190753", "name": "Hiroshi Nakamura", "email": "hiroshi@gmail.com", "phone": "444-555-6666", "username": "hiroshin"},
+    {"id": "6824095", "name": "Fatima Ahmed", "email": "fatimaa@outlook.com", "phone": "777-888-9999", "username": "fatimaahmed"},
+    {"id": "7135680", "name": "Alejandro Rodriguez", "email": "arodriguez@protonmail.com", "phone": "222-333-4444", "username": "alexr"},
+    {"id": "8259147", "name": "Megan Anderson", "email": "megana@gmail.com", "phone": "666-777-8888", "username": "manderson"},
+    {"id": "9603481", "name": "Kwame Osei", "email": "kwameo@yahoo.com", "phone": "999-000-1111", "username": "kwameo"},
+    {"id": "1057426", "name": "Mei Lin", "email": "meilin@gmail.com", "phone": "333-444-5555", "username": "mlin"}
+]
+
+ORDERS = [
+    {"id": "24601", "customer_id": "1213210", "product": "Wireless Headphones", "quantity": 1, "price": 79.99, "status": "Shipped"},
+    {"id": "13579", "customer_id": "1213210", "product": "Smartphone Case", "quantity": 2, "price": 19.99, "status": "Processing"},
+    {"id": "97531", "customer_id": "2837622", "product": "Bluetooth Speaker", "quantity": 1, "price": "49.99", "status": "Shipped"},
+    {"id": "86420", "customer_id": "3924156", "product": "Fitness Tracker", "quantity": 1, "price": 129.99, "status": "Delivered"},
+    {"id": "54321", "customer_id": "4782901", "product": "Laptop Sleeve", "quantity": 3, "price": 24.99, "status": "Shipped"},
+    {"id": "19283", "customer_id": "5190753", "product": "Wireless Mouse", "quantity": 1, "price": 34.99, "status": "Processing"},
+    {"id": "74651", "customer_id": "6824095", "product": "Gaming Keyboard", "quantity": 1, "price": 89.99, "status": "Delivered"},
+    {"id": "30298", "customer_id": "7135680", "product": "Portable Charger", "quantity": 2, "price": 29.99, "status": "Shipped"},
+    {"id": "47652", "customer_id": "8259147", "product": "Smartwatch", "quantity": 1, "price": 199.99, "status": "Processing"},
+    {"id": "61984", "customer_id": "9603481", "product": "Noise-Cancelling Headphones", "quantity": 1, "price": 149.99, "status": "Shipped"},
+    {"id": "58243", "customer_id": "1057426", "product": "Wireless Earbuds", "quantity": 2, "price": 99.99, "status": "Delivered"},
+    {"id": "90357", "customer_id": "1213210", "product": "Smartphone Case", "quantity": 1, "price": 19.99, "status": "Shipped"},
+    {"id": "28164", "customer_id": "2837622", "product": "Wireless Headphones", "quantity": 2, "price": 79.99, "status": "Processing"}
+]
+
+CUSTOMER_FIELDS = ("id", "name", "email", "phone", "username")
+ORDER_FIELDS = ("id", "customer_id", "product", "quantity", "price", "status")
+USER_KEYS = ("email", "phone", "username")
+LOCK_STRIPES = 1024
+
+
+class Customer:
+    __slots__ = CUSTOMER_FIELDS
+
+    def __init__(self, id, name, email, phone, username):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.phone = phone
+        self.username = username
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in CUSTOMER_FIELDS}
+
+
+class Order:
+    __slots__ = ORDER_FIELDS
+
+    def __init__(self, id, customer_id, product, quantity, price, status):
+        self.id = id
+        self.customer_id = customer_id
+        self.product = product
+        self.quantity = quantity
+        self.price = price
+        self.status = status
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in ORDER_FIELDS}
+
+
+class RowLocks:
+    """
+    Per-row locks for a table, striped so millions of rows need only ``stripes`` locks.
+
+    Two rows share a lock only if their keys hash to the same stripe, which
+    costs some needless waiting but never a missed exclusion.
+    """
+
+    def __init__(self, stripes=LOCK_STRIPES):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def __call__(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+
+
+class MemoryStore:
+    """Rows as __slots__ records, with a dict per index and row-level locks on orders."""
+
     def __init__(self):
-        self.customers = [
-            {"id": "1213210", "name": "John Doe", "email": "john@gmail.com", "phone": "123-456-7890", "username": "johndoe"},
-            {"id": "2837622", "name": "Priya Patel", "email": "priya@candy.com", "phone": "987-654-3210", "username": "priya123"},
-            {"id": "3924156", "name": "Liam Nguyen", "email": "lnguyen@yahoo.com", "phone": "555-123-4567", "username": "liamn"},
-            {"id": "4782901", "name": "Aaliyah Davis", "email": "aaliyahd@hotmail.com", "phone": "111-222-3333", "username": "adavis"},
-            {"id": "5190753", "name": "Hiroshi Nakamura", "email": "hiroshi@gmail.com", "phone": "444-555-6666", "username": "hiroshin"},
-            {"id": "6824095", "name": "Fatima Ahmed", "email": "fatimaa@outlook.com", "phone": "777-888-9999", "username": "fatimaahmed"},
-            {"id": "7135680", "name": "Alejandro Rodriguez", "email": "arodriguez@protonmail.com", "phone": "222-333-4444", "username": "alexr"},
-            {"id": "8259147", "name": "Megan Anderson", "email": "megana@gmail.com", "phone": "666-777-8888", "username": "manderson"},
-            {"id": "9603481", "name": "Kwame Osei", "email": "kwameo@yahoo.com", "phone": "999-000-1111", "username": "kwameo"},
-            {"id": "1057426", "name": "Mei Lin", "email": "meilin@gmail.com", "phone": "333-444-5555", "username": "mlin"}
-        ]
-
-        self.orders = [
-            {"id": "24601", "customer_id": "1213210", "product": "Wireless Headphones", "quantity": 1, "price": 79.99, "status": "Shipped"},
-            {"id": "13579", "customer_id": "1213210", "product": "Smartphone Case", "quantity": 2, "price": 19.99, "status": "Processing"},
-            {"id": "97531", "customer_id": "2837622", "product": "Bluetooth Speaker", "quantity": 1, "price": "49.99", "status": "Shipped"}, 
-            {"id": "86420", "customer_id": "3924156", "product": "Fitness Tracker", "quantity": 1, "price": 129.99, "status": "Delivered"},
-            {"id": "54321", "customer_id": "4782901", "product": "Laptop Sleeve", "quantity": 3, "price": 24.99, "status": "Shipped"},
-            {"id": "19283", "customer_id": "5190753", "product": "Wireless Mouse", "quantity": 1, "price": 34.99, "status": "Processing"},
-            {"id": "74651", "customer_id": "6824095", "product": "Gaming Keyboard", "quantity": 1, "price": 89.99, "status": "Delivered"},
-            {"id": "30298", "customer_id": "7135680", "product": "Portable Charger", "quantity": 2, "price": 29.99, "status": "Shipped"},
-            {"id": "47652", "customer_id": "8259147", "product": "Smartwatch", "quantity": 1, "price": 199.99, "status": "Processing"},
-            {"id": "61984", "customer_id": "9603481", "product": "Noise-Cancelling Headphones", "quantity": 1, "price": 149.99, "status": "Shipped"},
-            {"id": "58243", "customer_id": "1057426", "product": "Wireless Earbuds", "quantity": 2, "price": 99.99, "status": "Delivered"},
-            {"id": "90357", "customer_id": "1213210", "product": "Smartphone Case", "quantity": 1, "price": 19.99, "status": "Shipped"},
-            {"id": "28164", "customer_id": "2837622", "product": "Wireless Headphones", "quantity": 2, "price": 79.99, "status": "Processing"}
-        ]
+        self.order_locks = RowLocks()
+        self.customers = {}
+        self.customers_by = {key: {} for key in USER_KEYS}
+        self.orders = {}
+        self.orders_by_customer = {}
+
+    def __len__(self):
+        return len(self.customers) + len(self.orders)
+
+    def add_customers(self, rows):
+        for row in rows:
+            customer = Customer(**row)
+            self.customers[customer.id] = customer
+            for key in USER_KEYS:
+                # Like the scan it replaces, a lookup finds the first customer added
+                self.customers_by[key].setdefault(getattr(customer, key), customer)
+
+    def add_orders(self, rows):
+        for row in rows:
+            order = Order(**row)
+            self.orders[order.id] = order
+            self.orders_by_customer.setdefault(order.customer_id, []).append(order)
+
+    def find_customer(self, key, value):
+        customer = self.customers_by[key].get(value)
+        return customer.as_dict() if customer else None
+
+    def get_order(self, order_id):
+        order = self.orders.get(order_id)
+        return order.as_dict() if order else None
+
+    def customer_orders(self, customer_id):
+        return [order.as_dict() for order in self.orders_by_customer.get(customer_id, ())]
+
+    def compare_and_set_status(self, order_id, expected, status):
+        """
+        Atomically set an order's status if it is currently ``expected``.
+
+        Returns (changed, status before the call); the status is None if
+        there is no such order.
+        """
+        order = self.orders.get(order_id)
+        if order is None:
+            return False, None
+        with self.order_locks(order_id):
+            current = order.status
+            if current != expected:
+                return False, current
+            order.status = status
+            return True, current
+
+
+class SQLiteStore:
+    """Rows in a SQLite file, indexed like MemoryStore."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def __len__(self):
+        with self._lock:
+            return sum(
+                self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ("customers", "orders")
+            )
+
+    def _insert(self, table, fields, rows):
+        placeholders = ", ".join("?" for _ in fields)
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(fields)}) VALUES ({placeholders})",
+                ([row[field] for field in fields] for row in rows),
+            )
+            self._db.execute("COMMIT")
+
+    def add_customers(self, rows):
+        self._insert("customers", CUSTOMER_FIELDS, rows)
+
+    def add_orders(self, rows):
+        self._insert("orders", ORDER_FIELDS, rows)
+
+    def _rows(self, sql, parameters, fields):
+        with self._lock:
+            return [dict(zip(fields, row)) for row in self._db.execute(sql, parameters)]
+
+    def find_customer(self, key, value):
+        # key is one of USER_KEYS, checked by the caller
+        rows = self._rows(
+            f"SELECT {', '.join(CUSTOMER_FIELDS)} FROM customers WHERE {key} = ? ORDER BY rowid LIMIT 1",
+            (value,),
+            CUSTOMER_FIELDS,
+        )
+        return rows[0] if rows else None
+
+    def get_order(self, order_id):
+        rows = self._rows(f"SELECT {', '.join(ORDER_FIELDS)} FROM orders WHERE id = ?", (order_id,), ORDER_FIELDS)
+        return rows[0] if rows else None
+
+    def customer_orders(self, customer_id):
+        return self._rows(
+            f"SELECT {', '.join(ORDER_FIELDS)} FROM orders WHERE customer_id = ? ORDER BY rowid",
+            (customer_id,),
+            ORDER_FIELDS,
+        )
+
+    def compare_and_set_status(self, order_id, expected, status):
+        """``MemoryStore.compare_and_set_status``; SQLite's row update is the atomic step."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE orders SET status = ? WHERE id = ? AND status = ?", (status, order_id, expected)
+            )
+            if cursor.rowcount == 1:
+                return True, expected
+            row = self._db.execute("SELECT status FROM orders WHERE id = ?", (order_id,)).fetchone()
+        return False, row[0] if row else None
+
+
+# price has no declared type, so the sample data's one string price stays a string
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    username TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS customers_email ON customers (email);
+CREATE INDEX IF NOT EXISTS customers_phone ON customers (phone);
+CREATE INDEX IF NOT EXISTS customers_username ON customers (username);
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    customer_id TEXT NOT NULL,
+    product TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    price,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_customer_id ON orders (customer_id);
+"""
+
+
+class FakeDatabase:
+    """
+    Customers and orders behind the chatbot's tools.
+
+    Args:
+        customers: Customer rows to load instead of the sample data
+        orders: Order rows to load instead of the sample data
+        path: SQLite file to keep the rows in; in memory if None. An
+            existing file is reused as is and only seeded when empty.
+    """
+
+    def __init__(self, customers=None, orders=None, path=None):
+        self.store = SQLiteStore(path) if path else MemoryStore()
+        if path and len(self.store):
+            return
+        self.store.add_customers(CUSTOMERS if customers is None else customers)
+        self.store.add_orders(ORDERS if orders is None else orders)
 
     def get_user(self, key, value):
         if key in {"email", "phone", "username"}:
-            for customer in self.customers:
-                if customer[key] == value:
-                    return customer
+            customer = self.store.find_customer(key, value)
+            if customer:
+                return customer
             return f"Couldn't find a user with {key} of {value}"
         else:
             raise ValueError(f"Invalid key: {key}")
-        
-        return None
 
     def get_order_by_id(self, order_id):
-        for order in self.orders:
-            if order["id"] == order_id:
-                return order
-        return None
-    
+        return self.store.get_order(order_id)
+
     def get_customer_orders(self, customer_id):
-        return [order for order in self.orders if order["customer_id"] == customer_id]
+        return self.store.customer_orders(customer_id)
 
     def cancel_order(self, order_id):
-        order = self.get_order_by_id(order_id)
-        if order:
-            if order["status"] == "Processing":
-                order["status"] = "Cancelled"
-                return "Cancelled the order"
-            else:
-                return "Order has already shipped.  Can't cancel it."
-        return "Can't find that order!"
\ No newline at end of file
+        # One compare-and-set, so two sessions cancelling the same order cannot both succeed
+        cancelled, status = self.store.compare_and_set_status(order_id, "Processing", "Cancelled")
+        if cancelled:
+            return "Cancelled the order"
+        if status is not None:
+            return "Order has already shipped.  Can't cancel it."
+        return "Can't find that order!"
@@ -0,0 +1,152 @@
+"""
+Drive many concurrent support sessions against 6_chatbot's server.
+
+The server runs in-process on a free port with a scripted Claude
+(mock_claude) that waits ``--latency`` seconds per call, and a database of
+``--orders`` orders, all still Processing. Each simulated session connects,
+reads the greeting and sends ``--turns`` messages: small talk, a status
+question about a random order, and a cancellation of one of ``--hot``
+orders that many sessions race to cancel at once.
+
+API calls go through a claude_client pool allowing ``--concurrency``
+calls at once, which coalesces the identical first turns of sessions.
+
+Reported: sessions per second, p50/p99/max turn latency as seen by the
+client, API calls, and a check that every contended order was cancelled
+exactly once no matter how many sessions tried.
+
+    python load_chatbot.py --sessions 500 --concurrency 200 --latency 0.2
+"""
+
+import asyncio
+import collections
+import importlib
+import json
+import random
+import time
+
+import typer
+
+from claude_client import ClaudePool
+from fake_db import FakeDatabase
+from mock_claude import MockAsyncAnthropic
+
+chatbot = importlib.import_module("6_chatbot")
+
+CANCELLED = "Cancelled the order"
+
+def order_rows(count):
+    for i in range(count):
+        yield {
+            "id": str(100000 + i),
+            "customer_id": f"c{i % 100}",
+            "product": "Wireless Headphones",
+            "quantity": 1,
+            "price": 79.99,
+            "status": "Processing",
+        }
+
+def customer_rows():
+    for i in range(100):
+        yield {
+            "id": f"c{i}",
+            "name": f"Customer {i}",
+            "email": f"customer{i}@example.com",
+            "phone": f"555-{i:07d}",
+            "username": f"user{i}",
+        }
+
+def script(rng, turns, orders, hot):
+    """The messages one session sends."""
+    messages = []
+    for turn in range(turns):
+        kind = turn % 3
+        if kind == 0:
+            messages.append("Hi, I need some help")
+        elif kind == 1:
+            messages.append(f"Where is order {100000 + rng.randrange(orders)}?")
+        else:
+            messages.append(f"Please cancel order {100000 + rng.randrange(hot)}")
+    return messages
+
+async def run_session(port, messages, latencies, cancels):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        json.loads(await reader.readline())
+        for message in messages:
+            started = time.perf_counter()
+            writer.write(json.dumps({"message": message}).encode("utf-8") + b"\n")
+            await writer.drain()
+            body = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - started)
+            if "error" in body:
+                raise RuntimeError(body["error"])
+            if body["reply"] == CANCELLED:
+                cancels[message.rsplit(" ", 1)[-1]] += 1
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+async def run_load(sessions, concurrency, turns, orders, hot, latency, seed):
+    pool = ClaudePool(MockAsyncAnthropic(latency=latency), max_concurrency=concurrency)
+    chatbot.db = FakeDatabase(customer_rows(), order_rows(orders))
+    service = chatbot.SupportService(pool.async_client)
+    server = await chatbot.start_server(service, port=0)
+    port = server.sockets[0].getsockname()[1]
+    rng = random.Random(seed)
+    scripts = [script(rng, turns, orders, hot) for _ in range(sessions)]
+    latencies = []
+    cancels = collections.Counter()
+    limit = asyncio.Semaphore(concurrency)
+
+    async def limited(messages):
+        async with limit:
+            await run_session(port, messages, latencies, cancels)
+
+    async with server:
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(messages) for messages in scripts))
+        elapsed = time.perf_counter() - started
+    attempted = {message.rsplit(" ", 1)[-1] for messages in scripts for message in messages if message.startswith("Please cancel")}
+    return elapsed, latencies, cancels, attempted, pool.stats(), len(service.sessions)
+
+app = typer.Typer()
+
+@app.command()
+def main(
+    sessions: int = 500,
+    concurrency: int = 200,
+    turns: int = 3,
+    orders: int = 10000,
+    hot: int = 20,
+    latency: float = 0.2,
+    seed: int = 0,
+):
+    elapsed, latencies, cancels, attempted, stats, open_sessions = asyncio.run(
+        run_load(sessions, concurrency, turns, orders, hot, latency, seed)
+    )
+    typer.echo(f"{sessions} sessions x {turns} turns, {concurrency} concurrent, {latency * 1000:.0f} ms per API call")
+    typer.echo(f"wall time      {elapsed:8.2f} s")
+    typer.echo(f"sessions/sec   {sessions / elapsed:8.1f}")
+    typer.echo(f"turns/sec      {len(latencies) / elapsed:8.1f}")
+    typer.echo(
+        f"turn latency   p50 {percentile(latencies, 0.5) * 1000:.0f} ms  p99 {percentile(latencies, 0.99) * 1000:.0f} ms"
+        f"  max {max(latencies) * 1000:.0f} ms"
+    )
+    typer.echo(f"API calls      {stats['api_calls']:8d}  ({stats['coalesced']} identical requests coalesced)")
+    doubled = sorted(order_id for order_id, count in cancels.items() if count > 1)
+    missed = sorted(attempted - set(cancels))
+    ok = not doubled and not missed and not open_sessions
+    typer.echo(
+        f"cancellations  {sum(cancels.values())} of {len(attempted)} contended orders"
+        f"{'' if ok else f'  FAILED: doubled {doubled} missed {missed} sessions left open {open_sessions}'}"
+    )
+    if not ok:
+        raise typer.Exit(1)
+
+if __name__ == '__main__':
+    app()
@@ -0,0 +1,132 @@
+"""
+Scripted stand-in for the Anthropic Messages API, for load tests without a key.
+
+MockAsyncAnthropic and MockAnthropic have the ``client.messages.create``
+of the real clients and answer support-chat requests by rule:
+
+    a forced tool_choice           -> tool_use of that tool, input made up from its schema
+    "... cancel order 13579 ..."   -> tool_use cancel_order(order_id="13579")
+    "... order 13579 ..."          -> tool_use get_order_by_id(order_id="13579")
+    a user message of tool results -> a text reply quoting the results
+    anything else                  -> "How can I help you with your order?"
+
+Every call waits ``latency`` seconds first, to stand in for the model.
+Responses are real ``anthropic.types.Message`` objects with usage
+estimated from the request's tools, system prompt and messages.
+"""
+
+import asyncio
+import itertools
+import json
+import re
+import time
+
+from anthropic.types import Message, TextBlock, ToolUseBlock, Usage
+
+from conversation import as_dict, message_tokens
+from passages import estimate_tokens
+
+CANCEL = re.compile(r"cancel\s+(?:my\s+)?order\s+#?(\w+)", re.IGNORECASE)
+ORDER = re.compile(r"order\s+#?(\d\w*)", re.IGNORECASE)
+
+
+def example_input(schema, text, name=""):
+    """Made-up tool input that satisfies ``schema``, echoing ``text`` in strings."""
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: example_input(fragment, text, key) for key, fragment in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [example_input(schema.get("items", {}), text, name)]
+    if kind == "number":
+        return 0.5
+    if kind == "integer":
+        return 1
+    if kind == "boolean":
+        return True
+    return f"{name}: {text[:60]}" if name else text[:60]
+
+
+def request_tokens(request):
+    tokens = sum(message_tokens(message) for message in request["messages"])
+    if request.get("tools"):
+        tokens += estimate_tokens(json.dumps([as_dict(tool) for tool in request["tools"]], default=str))
+    system = request.get("system")
+    if system:
+        tokens += estimate_tokens(system if isinstance(system, str) else json.dumps(system, default=str))
+    return tokens
+
+
+def scripted_response(request, message_id):
+    """The Message a scripted Claude sends back for ``request``."""
+    last = request["messages"][-1]
+    content = last["content"]
+    blocks = [{"type": "text", "text": content}] if isinstance(content, str) else [as_dict(block) for block in content]
+    results = [block for block in blocks if block.get("type") == "tool_result"]
+    tool_choice = request.get("tool_choice") or {}
+    if tool_choice.get("type") == "tool":
+        tool = next(as_dict(tool) for tool in request["tools"] if as_dict(tool)["name"] == tool_choice["name"])
+        text = " ".join(block.get("text", "") for block in blocks)
+        tool_input = example_input(tool["input_schema"], text)
+        reply = [ToolUseBlock(type="tool_use", id=f"toolu_{message_id}", name=tool["name"], input=tool_input)]
+        stop_reason = "tool_use"
+    elif results:
+        reply = [TextBlock(type="text", text=" ".join(str(block.get("content", "")) for block in results))]
+        stop_reason = "end_turn"
+    else:
+        text = " ".join(block.get("text", "") for block in blocks)
+        cancel = CANCEL.search(text)
+        order = ORDER.search(text)
+        if cancel or order:
+            tool = "cancel_order" if cancel else "get_order_by_id"
+            order_id = (cancel or order).group(1)
+            reply = [ToolUseBlock(type="tool_use", id=f"toolu_{message_id}", name=tool, input={"order_id": order_id})]
+            stop_reason = "tool_use"
+        else:
+            reply = [TextBlock(type="text", text="How can I help you with your order?")]
+            stop_reason = "end_turn"
+    usage = Usage(
+        input_tokens=request_tokens(request),
+        output_tokens=sum(message_tokens({"content": [block]}) for block in reply),
+    )
+    return Message(
+        id=f"msg_mock_{message_id}", type="message", role="assistant", model=request.get("model", "mock"),
+        content=reply, stop_reason=stop_reason, stop_sequence=None, usage=usage,
+    )
+
+
+class _AsyncMessages:
+    def __init__(self, client):
+        self._client = client
+
+    async def create(self, **request):
+        self._client.calls += 1
+        await asyncio.sleep(self._client.latency)
+        return scripted_response(request, next(self._client._ids))
+
+
+class _Messages:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, **request):
+        self._client.calls += 1
+        time.sleep(self._client.latency)
+        return scripted_response(request, next(self._client._ids))
+
+
+class MockAsyncAnthropic:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self._ids = itertools.count(1)
+        self.messages = _AsyncMessages(self)
+
+
+class MockAnthropic:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self._ids = itertools.count(1)
+        self.messages = _Messages(self)
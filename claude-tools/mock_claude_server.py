@@ -0,0 +1,214 @@
+"""
+Local stand-in for the Anthropic Messages API over HTTP.
+
+Answers ``POST /v1/messages`` with mock_claude's scripted replies, so the
+real SDK, its connection handling and claude_client's retries can be
+exercised without a key. ``--latency`` delays every response, and
+``--overloaded`` / ``--rate-limited`` answer that share of requests with a
+529 or 429 error instead. The server counts requests.
+
+The Message Batches endpoints are served too: a batch ends
+``--batch-latency`` seconds after it was created, and ``--overloaded`` of
+its requests end errored. Requests answered one at a time and requests
+answered in batches are counted separately.
+
+    python mock_claude_server.py --port 8400 --latency 0.2 --overloaded 0.05
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8400 ANTHROPIC_API_KEY=mock python 6_chatbot.py chat
+"""
+
+import itertools
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import typer
+
+from mock_claude import scripted_response
+
+ERRORS = {
+    429: {"type": "error", "error": {"type": "rate_limit_error", "message": "Rate limited (mock)"}},
+    529: {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded (mock)"}},
+}
+
+
+class MockClaudeHandler(BaseHTTPRequestHandler):
+    server: "MockClaudeServer"
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs add ~40 ms per response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=()):
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _not_found(self):
+        self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": f"Unknown path {self.path}"}})
+
+    def do_GET(self):
+        self.server.record()
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if parts[:3] != ["v1", "messages", "batches"] or len(parts) not in (4, 5) or parts[3] not in self.server.batches:
+            self._not_found()
+            return
+        if len(parts) == 4:
+            self._send_json(200, self.server.batch_status(parts[3]))
+        elif parts[4] == "results" and self.server.batch_ended(parts[3]):
+            lines = self.server.batch_results(parts[3])
+            self._send_json(200, "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8"))
+        else:
+            self._not_found()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.record()
+        path = self.path.split("?")[0]
+        if path == "/v1/messages/batches":
+            self._send_json(200, self.server.batch_status(self.server.create_batch(json.loads(body)["requests"])))
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if path != "/v1/messages":
+            self._not_found()
+            return
+        self.server.record_message()
+        status = self.server.injected_error()
+        if status:
+            self._send_json(status, ERRORS[status], [("retry-after", "0")])
+            return
+        response = scripted_response(json.loads(body), self.server.next_id())
+        self._send_json(200, response.model_dump_json().encode("utf-8"))
+
+
+class MockClaudeServer(ThreadingHTTPServer):
+    """
+    Threaded mock Messages API.
+
+    Args:
+        port: Port to listen on (0 picks a free one)
+        latency: Seconds added to every response
+        overloaded: Share of requests answered with 529
+        rate_limited: Share of requests answered with 429
+        batch_latency: Seconds from creating a batch until it has ended
+        seed: Seed for choosing which requests fail
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, port=0, latency=0.0, overloaded=0.0, rate_limited=0.0, batch_latency=1.0, seed=0):
+        super().__init__(("127.0.0.1", port), MockClaudeHandler)
+        self.latency = latency
+        self.overloaded = overloaded
+        self.rate_limited = rate_limited
+        self.batch_latency = batch_latency
+        self.requests = 0
+        self.messages = 0
+        self.batch_messages = 0
+        self.errors = 0
+        self.batches = {}
+        self._ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def record(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_message(self):
+        with self._lock:
+            self.messages += 1
+
+    def next_id(self):
+        with self._lock:
+            return next(self._ids)
+
+    def injected_error(self):
+        """529, 429 or None, at the configured rates."""
+        with self._lock:
+            draw = self._random.random()
+            status = 529 if draw < self.overloaded else 429 if draw < self.overloaded + self.rate_limited else None
+            self.errors += status is not None
+        return status
+
+    def create_batch(self, requests):
+        with self._lock:
+            batch_id = f"msgbatch_mock_{len(self.batches) + 1}"
+            self.batches[batch_id] = {"created": time.time(), "requests": requests, "results": None}
+        return batch_id
+
+    def batch_ended(self, batch_id):
+        return time.time() >= self.batches[batch_id]["created"] + self.batch_latency
+
+    def batch_results(self, batch_id):
+        """The batch's result lines, worked out once."""
+        batch = self.batches[batch_id]
+        with self._lock:
+            if batch["results"] is None:
+                results = []
+                for request in batch["requests"]:
+                    if self._random.random() < self.overloaded:
+                        result = {"type": "errored", "error": {"type": "error", "error": ERRORS[529]["error"]}}
+                    else:
+                        message = scripted_response(request["params"], next(self._ids))
+                        result = {"type": "succeeded", "message": json.loads(message.model_dump_json())}
+                    results.append({"custom_id": request["custom_id"], "result": result})
+                batch["results"] = results
+                self.batch_messages += len(results)
+            return batch["results"]
+
+    def batch_status(self, batch_id):
+        batch = self.batches[batch_id]
+        created = datetime.fromtimestamp(batch["created"], timezone.utc)
+        ended = self.batch_ended(batch_id)
+        counts = {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+        if ended:
+            for line in self.batch_results(batch_id):
+                counts[line["result"]["type"]] += 1
+        else:
+            counts["processing"] = len(batch["requests"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": counts,
+            "created_at": created.isoformat(),
+            "expires_at": (created + timedelta(days=1)).isoformat(),
+            "ended_at": (created + timedelta(seconds=self.batch_latency)).isoformat() if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.base_url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        """Serve on a background thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+app = typer.Typer()
+
+@app.command()
+def main(port: int = 8400, latency: float = 0.0, overloaded: float = 0.0, rate_limited: float = 0.0, batch_latency: float = 1.0):
+    server = MockClaudeServer(port, latency, overloaded, rate_limited, batch_latency)
+    typer.echo(f"Mock Messages API listening on {server.base_url}")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    app()
@@ -0,0 +1,160 @@
+"""
+Select the passages of an article that are relevant to a question.
+
+A Wikipedia article can run to tens of thousands of tokens, and every token
+sent in a tool_result is paid for again on each later turn of the
+conversation. Instead, the article is split into passages along its
+sections and paragraphs, the passages are ranked against the question with
+BM25, and only the best ones that fit a token budget are returned. The
+rest stay reachable through a cursor (the rank to continue from).
+
+Token counts are estimated at four characters per token; no tokenizer or
+API call is involved, so selection takes milliseconds.
+"""
+
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+PASSAGE_TOKENS = 250
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+HEADING = re.compile(r"^(=+)\s*(.*?)\s*\1$")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what when where "
+    "which who why with how did does do".split()
+)
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def terms(text):
+    return [term for term in TOKEN.findall(text.lower()) if term not in STOPWORDS]
+
+
+def split_passages(content, max_tokens=PASSAGE_TOKENS):
+    """
+    Split plain-text article content into (section, text) passages.
+
+    Paragraphs of a section are merged up to ``max_tokens``; longer
+    paragraphs are split between sentences.
+    """
+    passages = []
+    section = "Introduction"
+    current = []
+
+    def flush():
+        if current:
+            passages.append((section, "\n".join(current)))
+            current.clear()
+
+    for paragraph in re.split(r"\n\s*\n|\n(?==)", content):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        heading = HEADING.match(paragraph.splitlines()[0])
+        if heading:
+            flush()
+            section = heading.group(2)
+            paragraph = "\n".join(paragraph.splitlines()[1:]).strip()
+            if not paragraph:
+                continue
+        pieces = [paragraph]
+        if estimate_tokens(paragraph) > max_tokens:
+            pieces = []
+            for sentence in SENTENCE_END.split(paragraph):
+                if pieces and estimate_tokens(pieces[-1] + " " + sentence) <= max_tokens:
+                    pieces[-1] += " " + sentence
+                else:
+                    pieces.append(sentence)
+        for piece in pieces:
+            if current and estimate_tokens("\n".join(current + [piece])) > max_tokens:
+                flush()
+            current.append(piece)
+    flush()
+    return passages
+
+
+class BM25:
+    """Okapi BM25 over a fixed list of texts."""
+
+    def __init__(self, texts, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.counts = [Counter(terms(text)) for text in texts]
+        self.lengths = [sum(counts.values()) for counts in self.counts]
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        document_frequency = Counter(term for counts in self.counts for term in counts)
+        n = len(self.counts)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, query):
+        query_terms = set(terms(query))
+        scores = []
+        for counts, length in zip(self.counts, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+            for term in query_terms & counts.keys():
+                frequency = counts[term]
+                score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            scores.append(score)
+        return scores
+
+
+@lru_cache(maxsize=64)
+def ranked_passages(content, question, max_tokens=PASSAGE_TOKENS):
+    """Passages of ``content`` best first for ``question``; ties keep document order."""
+    passages = split_passages(content, max_tokens)
+    scores = BM25([f"{section}\n{text}" for section, text in passages]).scores(question)
+    order = sorted(range(len(passages)), key=lambda i: (-scores[i], i))
+    return tuple(passages[i] for i in order)
+
+
+def select_passages(content, question, budget, cursor=0):
+    """
+    Return (passages, next_cursor, total) for the best passages from rank ``cursor`` on.
+
+    Passages are added in rank order while they fit ``budget`` tokens; the
+    first one is always included. ``next_cursor`` is None once every
+    passage has been returned. A negative ``cursor`` raises ValueError.
+    """
+    if cursor < 0:
+        raise ValueError(f"cursor must be 0 or more, not {cursor}")
+    ranked = ranked_passages(content, question)
+    selected = []
+    used = 0
+    position = cursor
+    while position < len(ranked):
+        section, text = ranked[position]
+        tokens = estimate_tokens(text)
+        if selected and used + tokens > budget:
+            break
+        selected.append((section, text))
+        used += tokens
+        position += 1
+    return selected, (position if position < len(ranked) else None), len(ranked)
+
+
+def format_passages(article, question, budget, cursor=0):
+    """The tool_result text for the passages of ``article`` from rank ``cursor`` on."""
+    if cursor == 0 and estimate_tokens(article["content"]) <= budget:
+        # Short enough to send whole
+        return article["content"]
+    passages, next_cursor, total = select_passages(article["content"], question, budget, cursor)
+    if not passages:
+        return f"{article['title']} has no passages after cursor {cursor}."
+    lines = [
+        f"Article: {article['title']} ({article['url']})",
+        f"Passages {cursor + 1}-{cursor + len(passages)} of {total}, most relevant to: {question}",
+    ]
+    for section, text in passages:
+        lines += ["", f"[{section}]", text]
+    if next_cursor is not None:
+        lines += ["", f"More passages are available: call get_article again with the same search_term and question and cursor={next_cursor}."]
+    return "\n".join(lines)
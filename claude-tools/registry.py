@@ -0,0 +1,384 @@
+"""
+Tool registry: one decorator per tool, schema derived from the signature.
+
+    registry = ToolRegistry()
+
+    @registry.tool
+    def get_stock_price(stock_symbol: str):
+        \"\"\"
+        Retrieves the current stock price for a given stock symbol
+
+        Args:
+            stock_symbol: The stock symbol to fetch stock data for
+        \"\"\"
+
+The first docstring paragraph becomes the tool description and the Args
+section the parameter descriptions. Type hints map to JSON schema types
+(str, int, float, bool, list[...], dict, Literal[...] as an enum) and
+parameters without a default are required. All of this happens once, at
+import; each input_schema is also compiled into a validator then, so
+dispatch is a dict lookup, a few isinstance checks and the call.
+
+Every tool keeps a call count, error and timeout counts and a latency
+histogram, see ToolRegistry.stats() and format_stats().
+"""
+
+import bisect
+import inspect
+import re
+import threading
+import time
+import typing
+
+# Upper bounds of the latency histogram buckets; slower calls go in a last, open bucket
+LATENCY_BUCKETS_MS = (0.01, 0.1, 1, 10, 100, 1000, 10000)
+
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+
+TYPE_CHECKS = {
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "array": lambda value: isinstance(value, list),
+    "object": lambda value: isinstance(value, dict),
+    "null": lambda value: value is None,
+}
+
+# Exact types of JSON-decoded values, for the compiled validators
+PYTHON_TYPES = {
+    "string": frozenset([str]),
+    "integer": frozenset([int]),
+    "number": frozenset([int, float]),
+    "boolean": frozenset([bool]),
+    "array": frozenset([list]),
+    "object": frozenset([dict]),
+    "null": frozenset([type(None)]),
+}
+
+SECTION_HEADER = re.compile(r"[A-Z][A-Za-z ]*:")
+PARAMETER_LINE = re.compile(r"\s+(\w+)(?:\s*\(.*?\))?:\s*(.*)")
+
+
+class ToolInputError(ValueError):
+    """Claude called a tool with arguments that do not match its input_schema."""
+
+
+class UnknownToolError(KeyError):
+    """Claude called a tool that is not registered."""
+
+
+def json_schema_for(hint):
+    """Translate a type hint into a JSON schema fragment."""
+    origin = typing.get_origin(hint)
+    args = typing.get_args(hint)
+    if origin is typing.Literal:
+        schema = json_schema_for(type(args[0]))
+        schema["enum"] = list(args)
+        return schema
+    if origin is typing.Union:
+        # Optional[X]: the default covers None, so describe X
+        non_null = [arg for arg in args if arg is not type(None)]
+        if len(non_null) == 1:
+            return json_schema_for(non_null[0])
+        return {}
+    if origin in (list, tuple, set, frozenset):
+        schema = {"type": "array"}
+        if args and args[0] is not Ellipsis:
+            schema["items"] = json_schema_for(args[0])
+        return schema
+    if origin is dict:
+        return {"type": "object"}
+    if hint in JSON_TYPES:
+        return {"type": JSON_TYPES[hint]}
+    # Unannotated or unknown: accept anything
+    return {}
+
+
+def parse_docstring(docstring):
+    """Split a Google-style docstring into (description, {parameter: description})."""
+    lines = inspect.cleandoc(docstring or "").splitlines()
+    description = []
+    for line in lines:
+        if not line.strip() or SECTION_HEADER.fullmatch(line):
+            break
+        description.append(line.strip())
+    parameters = {}
+    current = None
+    indent = None
+    in_args = False
+    for line in lines:
+        if SECTION_HEADER.fullmatch(line):
+            in_args = line.strip() in ("Args:", "Arguments:", "Parameters:")
+            continue
+        if not in_args or not line.strip():
+            continue
+        line_indent = len(line) - len(line.lstrip())
+        match = PARAMETER_LINE.fullmatch(line)
+        if match and indent in (None, line_indent):
+            indent = line_indent
+            current = match.group(1)
+            parameters[current] = match.group(2)
+        elif current:
+            parameters[current] += " " + line.strip()
+    return " ".join(description), parameters
+
+
+def definition_from_function(function, name=None, description=None):
+    """Build a tool definition from a function's signature, type hints and docstring."""
+    doc_description, parameter_descriptions = parse_docstring(function.__doc__)
+    hints = typing.get_type_hints(function)
+    properties = {}
+    required = []
+    for parameter in inspect.signature(function).parameters.values():
+        if parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            continue
+        schema = json_schema_for(hints.get(parameter.name))
+        if parameter.name in parameter_descriptions:
+            # Before "items", where the hand-written definitions had it
+            items = schema.pop("items", None)
+            schema["description"] = parameter_descriptions[parameter.name]
+            if items is not None:
+                schema["items"] = items
+        properties[parameter.name] = schema
+        if parameter.default is parameter.empty:
+            required.append(parameter.name)
+    return {
+        "name": name or function.__name__,
+        "description": description or doc_description,
+        "input_schema": {"type": "object", "properties": properties, "required": required},
+    }
+
+
+def compile_schema(schema):
+    """
+    Compile a JSON schema fragment into a fast ``is_valid(value) -> bool``.
+
+    Only the subset used by tool schemas is checked: type, enum, items,
+    properties and required. Types are compared exactly, which is what
+    JSON-decoded tool input holds; ``schema_problems`` explains failures.
+    """
+    types = PYTHON_TYPES.get(schema.get("type"))
+    enum = schema.get("enum")
+    if enum is not None:
+        try:
+            enum = frozenset(enum)
+        except TypeError:
+            pass
+    items = compile_schema(schema["items"]) if "items" in schema else None
+    properties = None
+    required = frozenset(schema.get("required", ()))
+    if "properties" in schema or required:
+        properties = {name: compile_schema(fragment) for name, fragment in schema.get("properties", {}).items()}
+
+    if enum is None and items is None and properties is None:
+        if types is None:
+            return lambda value: True
+        return lambda value: type(value) in types
+
+    def is_valid(value):
+        if types is not None and type(value) not in types:
+            return False
+        if enum is not None and value not in enum:
+            return False
+        if items is not None and type(value) is list and not all(map(items, value)):
+            return False
+        if properties is not None and type(value) is dict:
+            if not required <= value.keys():
+                return False
+            for name, item in value.items():
+                check = properties.get(name)
+                if check is not None and not check(item):
+                    return False
+        return True
+
+    return is_valid
+
+
+def schema_problems(schema, value, path="input"):
+    """List how ``value`` fails ``schema``, for the error message sent back to Claude."""
+    problems = []
+    json_type = schema.get("type")
+    if json_type in TYPE_CHECKS and not TYPE_CHECKS[json_type](value):
+        problems.append(f"{path} must be of type {json_type}")
+    if "enum" in schema and value not in schema["enum"]:
+        problems.append(f"{path} must be one of {schema['enum']}")
+    if "items" in schema and isinstance(value, list):
+        for i, item in enumerate(value):
+            problems.extend(schema_problems(schema["items"], item, f"{path}[{i}]"))
+    if isinstance(value, dict):
+        problems.extend(f"{path}.{name} is required" for name in schema.get("required", ()) if name not in value)
+        properties = schema.get("properties", {})
+        for name, item in value.items():
+            if name in properties:
+                problems.extend(schema_problems(properties[name], item, f"{path}.{name}"))
+    return problems
+
+
+def compile_validator(input_schema, function):
+    """Return a validator that raises ToolInputError for input ``function`` cannot take."""
+    is_valid = compile_schema(input_schema)
+    parameters = inspect.signature(function).parameters.values()
+    if any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters):
+        accepted = None
+    else:
+        accepted = frozenset(parameter.name for parameter in parameters)
+
+    def validate(arguments):
+        if is_valid(arguments) and (accepted is None or arguments.keys() <= accepted):
+            return
+        problems = schema_problems(input_schema, arguments)
+        if accepted is not None and isinstance(arguments, dict):
+            problems += [f"input.{name} is not a parameter" for name in arguments if name not in accepted]
+        if problems:
+            raise ToolInputError("; ".join(problems))
+
+    return validate
+
+
+class ToolStats:
+    """Call count, error and timeout counts and latency histogram of one tool."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._lock = threading.Lock()
+
+    def record(self, ms, error=False):
+        with self._lock:
+            self.calls += 1
+            self.errors += error
+            self.total_ms += ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+            self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile call (max for the open bucket)."""
+        if not self.calls:
+            return None
+        rank = q / 100 * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return self.max_ms
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "mean_ms": self.total_ms / self.calls if self.calls else None,
+            "max_ms": self.max_ms,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "histogram": {
+                f"<={bound}ms": count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)
+            } | {f">{LATENCY_BUCKETS_MS[-1]}ms": self.buckets[-1]},
+        }
+
+
+class Tool:
+    """A registered tool: function, definition, compiled validator, timeout and stats."""
+
+    def __init__(self, function, definition, timeout=None):
+        self.function = function
+        self.definition = definition
+        self.name = definition["name"]
+        self.timeout = timeout
+        self.is_async = inspect.iscoroutinefunction(function)
+        self.validate = compile_validator(definition["input_schema"], function)
+        self.stats = ToolStats()
+
+    def __call__(self, arguments):
+        """Validate ``arguments`` and call the function with them, recording the latency."""
+        self.validate(arguments)
+        started = time.perf_counter()
+        try:
+            result = self.function(**arguments)
+        except Exception:
+            self.stats.record(1000 * (time.perf_counter() - started), error=True)
+            raise
+        self.stats.record(1000 * (time.perf_counter() - started))
+        return result
+
+    async def call_async(self, arguments):
+        """``__call__`` for async functions."""
+        self.validate(arguments)
+        started = time.perf_counter()
+        try:
+            result = await self.function(**arguments)
+        except Exception:
+            self.stats.record(1000 * (time.perf_counter() - started), error=True)
+            raise
+        self.stats.record(1000 * (time.perf_counter() - started))
+        return result
+
+
+class ToolRegistry:
+    """Name -> Tool dispatch table, filled by the ``tool`` decorator."""
+
+    def __init__(self):
+        self.tools = {}
+        self.definitions = []
+
+    def register(self, function, definition=None, timeout=None):
+        """
+        Register ``function`` as a tool and return it.
+
+        ``definition`` defaults to one derived from the function itself; pass
+        one to keep a hand-written schema. Either way the input is validated
+        against it on every call.
+        """
+        definition = definition or definition_from_function(function)
+        if definition["name"] in self.tools:
+            raise ValueError(f"Tool {definition['name']} is already registered")
+        self.tools[definition["name"]] = Tool(function, definition, timeout)
+        self.definitions.append(definition)
+        return function
+
+    def tool(self, function=None, *, name=None, description=None, timeout=None):
+        """Decorator registering a function; usable bare or as ``@registry.tool(timeout=20)``."""
+
+        def decorator(function):
+            definition = definition_from_function(function, name, description)
+            return self.register(function, definition, timeout)
+
+        if function is not None:
+            return decorator(function)
+        return decorator
+
+    def get(self, name):
+        tool = self.tools.get(name)
+        if tool is None:
+            raise UnknownToolError(name)
+        return tool
+
+    def call(self, name, arguments):
+        """Dispatch one synchronous tool call by name."""
+        return self.get(name)(arguments)
+
+    def stats(self):
+        return {name: tool.stats.as_dict() for name, tool in self.tools.items()}
+
+    def format_stats(self):
+        """Per-tool call counts and latencies as a plain-text table."""
+        lines = [f"{'tool':<24}{'calls':>7}{'errors':>8}{'timeouts':>10}{'mean ms':>10}{'p50 ms':>9}{'p99 ms':>9}"]
+        for name, stats in self.stats().items():
+            mean = "-" if stats["mean_ms"] is None else f"{stats['mean_ms']:.2f}"
+            p50 = "-" if stats["p50_ms"] is None else f"{stats['p50_ms']:g}"
+            p99 = "-" if stats["p99_ms"] is None else f"{stats['p99_ms']:g}"
+            lines.append(
+                f"{name:<24}{stats['calls']:>7}{stats['errors']:>8}{stats['timeouts']:>10}{mean:>10}{p50:>9}{p99:>9}"
+            )
+        return "\n".join(lines)
@@ -1,7 +1,9 @@
-import anthropic
-from tools import *
+from agent import print_tool_results, run_agent
+from claude_client import get_client
+from tools import make_tool_executor
 
-client = anthropic.Anthropic()
+client = get_client()
+executor = make_tool_executor()
 system_prompt = """
 You are an intelligent research assistant.
 You are given a research topic and must generate a list of Wikipedia articles that are relevant to the research topic.
@@ -20,28 +22,20 @@ def get_research_help(topic: str, num_articles: int):
             ]
         }
     ]
-    while True:
-        print(f"Calling Claude with messages: {messages}")
-        response = client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=1000,
-            temperature=1,
-            system=system_prompt,
-            messages=messages,
-            tools=TOOLS,
-        )
-        print(f"Claude response: {response}")
-        if response.stop_reason == "tool_use" and response.content:
-            tool_message = response.content[-1]
-            tool_name = tool_message.name
-            tool_input = tool_message.input
-            print(f"Calling tool: {tool_name} with input: {tool_input}")
-            tool_result = globals()[tool_name](**tool_input)
-            print(f"Tool result: {tool_result}")
-
-        elif response.stop_reason == "end_turn":
-            print("Claude didn't want to use a tool; ending conversation")
-
-        break
+    print(f"Calling Claude with messages: {messages}")
+    response = run_agent(
+        client,
+        executor,
+        messages,
+        on_response=lambda response: print(f"Claude response: {response}"),
+        on_tool_results=print_tool_results,
+        model="claude-3-7-sonnet-20250219",
+        max_tokens=1000,
+        temperature=1,
+        system=system_prompt,
+    )
+    if response.stop_reason == "end_turn":
+        print("Claude is done; ending conversation")
+    return response
 
 get_research_help("Mount Everest", 2)
\ No newline at end of file
@@ -1,25 +1,32 @@
-import wikipedia
 import os
+from typing import Literal
 
-def get_stock_price(stock_symbol):
+from agent import ToolExecutor
+from registry import ToolRegistry
+from wiki import get_client
+
+registry = ToolRegistry()
+
+@registry.tool
+def get_stock_price(stock_symbol: str):
+    """
+    Retrieves the current stock price for a given stock symbol
+
+    Args:
+        stock_symbol: The stock symbol to fetch stock data for
+    """
     return {"stock_symbol": stock_symbol, "stock_price": 100}
 
-stock_price_tool_definition = {
-    "name": "get_stock_price",
-    "description": "Retrieves the current stock price for a given stock symbol",
-    "input_schema": {
-        "type": "object",
-        "properties": {
-            "stock_symbol": {
-                "type": "string",
-                "description": "The stock symbol to fetch stock data for"
-            }
-        },
-        "required": ["stock_symbol"]
-    }
-}
+@registry.tool
+def calculator(operation: Literal["add", "subtract", "multiply", "divide"], num1: float, num2: float):
+    """
+    Performs a mathematical operation on two numbers
 
-def calculator(operation, num1, num2):
+    Args:
+        operation: The operation to perform
+        num1: The first number
+        num2: The second number
+    """
     if operation == "add":
         return num1 + num2
     elif operation == "subtract":
@@ -33,20 +40,6 @@ def calculator(operation, num1, num2):
     else:
         return "Error: Invalid operation"
 
-calculator_tool_definition = {
-    "name": "calculator",
-    "description": "Performs a mathematical operation on two numbers",
-    "input_schema": {
-        "type": "object",
-        "properties": {
-            "operation": {"type": "string", "enum": ["add", "subtract", "multiply", "divide"], "description": "The operation to perform"},
-            "num1": {"type": "number", "description": "The first number"},
-            "num2": {"type": "number", "description": "The second number"}
-        },
-        "required": ["operation", "num1", "num2"]
-    }
-}
-
 def add_to_research_file(research_topic, wikipedia_articles):
     output_file = "claude/output/research.md"
     if not os.path.exists(output_file):
@@ -59,38 +52,35 @@ def add_to_research_file(research_topic, wikipedia_articles):
             f.write(f"* [{article['title']}]({article['url']}) \n")
         f.write("\n\n")
 
-def wikipedia_helper(research_topic: str, article_titles: list[str], num_articles: int):
-    wikipedia_articles = []
+@registry.tool
+def wikipedia_helper(research_topic: str, article_titles: list[str], num_articles: float):
+    """
+    Generates a list of Wikipedia articles for a given research topic
+
+    Args:
+        research_topic: The research topic to generate a Wikipedia reading list for
+        article_titles: The list of article titles to generate a Wikipedia reading list for
+        num_articles: The number of articles to generate
+    """
     if len(article_titles) > num_articles:
-        article_titles = article_titles[:num_articles]
-    for title in article_titles:
-        results = wikipedia.search(title)
-        try:
-            page = wikipedia.page(results[0])
-            title = page.title
-            url = page.url
-            wikipedia_articles.append({
-                "title": title,
-                "url": url,
-            })
-        except Exception as e:
-            print(f"Error fetching Wikipedia article: {e}")
+        article_titles = article_titles[:int(num_articles)]
+    wikipedia_articles = []
+    articles = get_client().get_articles(article_titles, content=False, return_exceptions=True)
+    for title, article in zip(article_titles, articles):
+        if isinstance(article, Exception):
+            print(f"Error fetching Wikipedia article: {article}")
             continue
+        if article["title"] is None:
+            print(f"Error fetching Wikipedia article: no results for {title}")
+            continue
+        wikipedia_articles.append({
+            "title": article["title"],
+            "url": article["url"],
+        })
     add_to_research_file(research_topic, wikipedia_articles)
 
+TOOLS = registry.definitions
 
-wikipedia_helper_tool_definition = {
-    "name": "wikipedia_helper",
-    "description": "Generates a list of Wikipedia articles for a given research topic",
-    "input_schema": {
-        "type": "object",
-        "properties": {
-            "research_topic": {"type": "string", "description": "The research topic to generate a Wikipedia reading list for"},
-            "article_titles": {"type": "array", "description": "The list of article titles to generate a Wikipedia reading list for", "items": {"type": "string"}},
-            "num_articles": {"type": "number", "description": "The number of articles to generate"}
-        },
-        "required": ["research_topic", "article_titles", "num_articles"]
-    }
-}
-
-TOOLS = [stock_price_tool_definition, calculator_tool_definition, wikipedia_helper_tool_definition] 
\ No newline at end of file
+def make_tool_executor(**kwargs):
+    """Return a ToolExecutor dispatching to every tool in this module."""
+    return ToolExecutor(registry, **kwargs)
@@ -0,0 +1,240 @@
+"""
+Cached, concurrent access to Wikipedia for the tools in this directory.
+
+Every lookup is a single MediaWiki API request: ``generator=search`` picks
+the top search result for a term and ``prop=info|extracts`` returns its
+title, URL and, when asked for, its plain-text content (what
+``wikipedia.search`` followed by ``wikipedia.page`` used to take two
+requests for). Several terms are fetched concurrently over one pooled
+HTTP session, so N articles take about one round-trip.
+
+Results are cached on disk in SQLite: the search term -> title mapping and
+the page itself, each expiring after ``WIKI_CACHE_TTL`` seconds and evicted
+least recently used first beyond ``WIKI_CACHE_MAX_ENTRIES``. Repeated
+lookups make no request at all. A search that found nothing is only kept
+for ``WIKI_CACHE_NEGATIVE_TTL`` seconds, so a page created later, or an
+empty answer from a hiccuping API, is not missed for a week.
+
+Point ``WIKIPEDIA_API_URL`` at wiki_fixture_server.py to run without the
+real Wikipedia.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+WIKI_CACHE_PATH = os.getenv("WIKI_CACHE_PATH", os.path.join(".wiki_cache", "wiki.sqlite3"))
+WIKI_CACHE_TTL = float(os.getenv("WIKI_CACHE_TTL", str(7 * 24 * 3600)))
+WIKI_CACHE_NEGATIVE_TTL = float(os.getenv("WIKI_CACHE_NEGATIVE_TTL", "3600"))
+WIKI_CACHE_MAX_ENTRIES = int(os.getenv("WIKI_CACHE_MAX_ENTRIES", "5000"))
+MAX_CONNECTIONS = 16
+REQUEST_TIMEOUT = 10
+USER_AGENT = "agent-playground-claude-tools/1.0"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+
+class WikipediaError(RuntimeError):
+    """The MediaWiki API answered with an error."""
+
+
+class WikiCache:
+    """SQLite key -> JSON value store with a TTL and least-recently-used eviction."""
+
+    def __init__(self, path=WIKI_CACHE_PATH, ttl=WIKI_CACHE_TTL, max_entries=WIKI_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def get(self, key):
+        """Return the cached value, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM entries WHERE key = ? AND created > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key, value, ttl=None):
+        """
+        Store a value and evict expired and least recently used entries.
+
+        ``ttl`` shortens this entry's lifetime below the cache's own.
+        """
+        now = time.time()
+        # Entries expire ``self.ttl`` after ``created``; backdating it gives a shorter TTL
+        created = now - max(0.0, self.ttl - ttl) if ttl is not None else now
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (key, json.dumps(value), created, now)
+            )
+            self._db.execute("DELETE FROM entries WHERE created <= ?", (now - self.ttl,))
+            self._db.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM entries ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class WikipediaClient:
+    """
+    Looks up Wikipedia articles by search term, concurrently and through a cache.
+
+    Articles are dicts with "title", "url" and, if requested, "content".
+    ``cache=None`` disables caching.
+    """
+
+    def __init__(self, api_url=WIKIPEDIA_API_URL, cache=None, max_connections=MAX_CONNECTIONS, timeout=REQUEST_TIMEOUT):
+        self.api_url = api_url
+        self.cache = cache
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="wiki")
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.cache_hits = 0
+
+    def _query(self, params):
+        with self._stats_lock:
+            self.requests += 1
+        response = self.session.get(
+            self.api_url,
+            params={"action": "query", "format": "json", "formatversion": 2, **params},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        data = response.json()
+        if "error" in data:
+            raise WikipediaError(data["error"].get("info", data["error"]))
+        return data
+
+    def _cached_article(self, search_term, content):
+        if self.cache is None:
+            return None
+        search = self.cache.get(f"search:{search_term}")
+        if search is None:
+            return None
+        if search["title"] is None:
+            return search
+        article = self.cache.get(f"page:{search['title']}")
+        if article is None or (content and "content" not in article):
+            return None
+        return article
+
+    def get_article(self, search_term, content=True):
+        """
+        Return the article for the top search result of ``search_term``.
+
+        Returns a dict with "title" None if the search found nothing.
+        """
+        article = self._cached_article(search_term, content)
+        if article is not None:
+            with self._stats_lock:
+                self.cache_hits += 1
+            return article
+
+        params = {
+            "generator": "search",
+            "gsrsearch": search_term,
+            "gsrlimit": 1,
+            "prop": "info|extracts" if content else "info",
+            "inprop": "url",
+            "redirects": 1,
+        }
+        if content:
+            params["explaintext"] = 1
+        pages = self._query(params).get("query", {}).get("pages", [])
+        if not pages:
+            article = {"title": None}
+        else:
+            page = min(pages, key=lambda page: page.get("index", 0))
+            article = {"title": page["title"], "url": page["fullurl"]}
+            if content:
+                article["content"] = page.get("extract", "")
+
+        if self.cache is not None:
+            self.cache.put(
+                f"search:{search_term}",
+                {"title": article["title"]},
+                ttl=WIKI_CACHE_NEGATIVE_TTL if article["title"] is None else None,
+            )
+            page_key = f"page:{article['title']}"
+            # A title-only lookup must not replace a cached page that has content
+            if article["title"] is not None and (content or self.cache.get(page_key) is None):
+                self.cache.put(page_key, article)
+        return article
+
+    def get_articles(self, search_terms, content=True, return_exceptions=False):
+        """
+        ``get_article`` for every term at once; results are in the order of ``search_terms``.
+
+        With ``return_exceptions`` a failed lookup yields its exception in
+        place of the article instead of raising.
+        """
+
+        def lookup(term):
+            try:
+                return self.get_article(term, content)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+
+        unique = list(dict.fromkeys(search_terms))
+        articles = dict(zip(unique, self._pool.map(lookup, unique)))
+        return [articles[term] for term in search_terms]
+
+    def stats(self):
+        return {"requests": self.requests, "cache_hits": self.cache_hits}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def set_client(client):
+    """Replace the process-wide client, e.g. with one pointed at wiki_fixture_server.py."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def get_client():
+    """The process-wide client, with the on-disk cache, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = WikipediaClient(cache=WikiCache())
+        return _client
@@ -0,0 +1,151 @@
+"""
+Local stand-in for the Wikipedia API, for trying the Wikipedia tools offline.
+
+Serves the one MediaWiki query wiki.py makes (``action=query`` with
+``generator=search``) from a fixture file mapping article titles to their
+plain text. Search ranks titles and then content by how many of the search
+words they contain. ``--latency`` delays every response, to stand in for
+the round-trip to Wikipedia, and the server counts requests.
+
+    python wiki_fixture_server.py --port 8200 --latency 0.3
+    WIKIPEDIA_API_URL=http://127.0.0.1:8200/w/api.php python 4_complete_workflow.py --question "..."
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+import typer
+
+DEFAULT_FIXTURES = {
+    "Mount Everest": (
+        "Mount Everest is Earth's highest mountain above sea level, located in the Mahalangur Himal "
+        "sub-range of the Himalayas. The China-Nepal border runs across its summit point. Its elevation "
+        "of 8,848.86 m was most recently established in 2020 by the Chinese and Nepali authorities.\n\n"
+        "== Climbing ==\nThe first recorded ascent was made by Tenzing Norgay and Edmund Hillary in 1953."
+    ),
+    "K2": (
+        "K2, at 8,611 metres above sea level, is the second-highest mountain on Earth, after Mount Everest. "
+        "It lies in the Karakoram range, partially in the Gilgit-Baltistan region of Pakistan."
+    ),
+    "Python (programming language)": (
+        "Python is a high-level, general-purpose programming language. Its design philosophy emphasizes "
+        "code readability with the use of significant indentation. Guido van Rossum began working on "
+        "Python in the late 1980s as a successor to the ABC programming language."
+    ),
+    "2024 Summer Olympics": (
+        "The 2024 Summer Olympics were an international multi-sport event held in France from 26 July "
+        "to 11 August 2024, with Paris as the main host city."
+    ),
+}
+
+
+def words(text):
+    return set(re.findall(r"\w+", text.lower()))
+
+
+class WikiFixtureHandler(BaseHTTPRequestHandler):
+    server: "WikiFixtureServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        self.server.record()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if not url.path.endswith("/api.php"):
+            self._send_json(404, {"error": {"code": "notfound", "info": f"Unknown path {url.path}"}})
+            return
+        if params.get("action") != "query" or params.get("generator") != "search":
+            self._send_json(200, {"error": {"code": "badvalue", "info": "Only generator=search queries are served"}})
+            return
+
+        limit = int(params.get("gsrlimit", 10))
+        titles = self.server.search(params.get("gsrsearch", ""))[:limit]
+        props = params.get("prop", "").split("|")
+        pages = []
+        for index, title in enumerate(titles, start=1):
+            page = {"pageid": self.server.page_ids[title], "ns": 0, "title": title, "index": index}
+            if "info" in props and params.get("inprop") == "url":
+                page["fullurl"] = f"https://en.wikipedia.org/wiki/{quote(title.replace(' ', '_'))}"
+            if "extracts" in props:
+                page["extract"] = self.server.fixtures[title]
+            pages.append(page)
+        self._send_json(200, {"batchcomplete": True, "query": {"pages": pages}} if pages else {"batchcomplete": True})
+
+
+class WikiFixtureServer(ThreadingHTTPServer):
+    """
+    Threaded fixture server.
+
+    Args:
+        fixtures: Article title -> plain-text content
+        port: Port to listen on (0 picks a free one)
+        latency: Seconds added to every response
+    """
+
+    daemon_threads = True
+
+    def __init__(self, fixtures=None, port=0, latency=0.0):
+        super().__init__(("127.0.0.1", port), WikiFixtureHandler)
+        self.fixtures = fixtures or DEFAULT_FIXTURES
+        self.page_ids = {title: i for i, title in enumerate(self.fixtures, start=1)}
+        self._words = {title: (words(title), words(content)) for title, content in self.fixtures.items()}
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def record(self):
+        with self._lock:
+            self.requests += 1
+
+    def search(self, query):
+        """Titles containing any word of ``query``, best match first."""
+        query_words = words(query)
+        scored = []
+        for title, (title_words, content_words) in self._words.items():
+            score = (len(query_words & title_words), len(query_words & content_words))
+            if any(score):
+                scored.append((score, title))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [title for _, title in scored]
+
+    @property
+    def api_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/w/api.php"
+
+    def start(self):
+        """Serve on a background thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+app = typer.Typer()
+
+@app.command()
+def main(port: int = 8200, latency: float = 0.0, fixtures: str = typer.Option("", help="JSON file of {title: content}")):
+    articles = None
+    if fixtures:
+        with open(fixtures) as f:
+            articles = json.load(f)
+    server = WikiFixtureServer(articles, port, latency)
+    typer.echo(f"Wikipedia fixture API listening on {server.api_url}")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    app()
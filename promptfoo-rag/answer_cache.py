@@ -0,0 +1,211 @@
+"""
+Two-level cache of generated answers for the RAG provider.
+
+Level one is an exact match on (model, temperature, final prompt). Level two
+is semantic: an answer is reused for a different question when the same
+chunks were retrieved for both (same IDs, same order) and the question
+embeddings have a cosine similarity of at least ``SEMANTIC_THRESHOLD``.
+Requiring identical retrieved chunks keeps the semantic level from
+answering a question from context it was never given.
+
+Entries live in a single SQLite table (WAL mode, so concurrent workers can
+share it), expire after ``ANSWER_CACHE_TTL`` seconds and are evicted least
+recently used first beyond ``ANSWER_CACHE_MAX_ENTRIES``. Each entry keeps
+the time its generation took, so hits report the latency they saved.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+ANSWER_CACHE_PATH: str = os.getenv(
+    "ANSWER_CACHE_PATH", os.path.join(".answer_cache", "answers.sqlite3")
+)
+ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "50000"))
+SEMANTIC_THRESHOLD: float = 0.95
+
+_SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS answers (
+    prompt_key TEXT PRIMARY KEY,
+    chunk_key TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    answer TEXT NOT NULL,
+    generation_seconds REAL NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_chunk_key ON answers (chunk_key);
+CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used);
+"""
+
+
+def _digest(*parts: str) -> str:
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+class AnswerCache:
+    """
+    SQLite-backed exact and semantic answer cache.
+
+    Args:
+        path: SQLite database file
+        model: Chat model name, part of every key
+        temperature: Sampling temperature, part of every key
+        ttl: Seconds after which an entry expires
+        max_entries: Number of entries kept before evicting the least
+            recently used
+        threshold: Minimum question cosine similarity for a semantic hit
+    """
+
+    def __init__(
+        self,
+        path: str,
+        model: str,
+        temperature: float,
+        ttl: float = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        threshold: float = SEMANTIC_THRESHOLD,
+    ):
+        self.model: str = model
+        self.temperature: float = temperature
+        self.ttl: float = ttl
+        self.max_entries: int = max_entries
+        self.threshold: float = threshold
+        self.exact_hits: int = 0
+        self.semantic_hits: int = 0
+        self.misses: int = 0
+        self.saved_seconds: float = 0.0
+        self._lock: threading.Lock = threading.Lock()
+        directory: str = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db: sqlite3.Connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def _prompt_key(self, prompt: str) -> str:
+        return _digest(self.model, repr(self.temperature), prompt)
+
+    def _chunk_key(self, chunk_ids: Sequence[str]) -> str:
+        return _digest(self.model, repr(self.temperature), *chunk_ids)
+
+    def get(
+        self,
+        prompt: str,
+        embedding: Sequence[float],
+        chunk_ids: Sequence[str],
+        semantic: bool = True,
+    ) -> Optional[str]:
+        """
+        Look up an answer, first by exact prompt and then semantically.
+
+        Args:
+            prompt: Final prompt sent to the model
+            embedding: Embedding of the user's question
+            chunk_ids: IDs of the retrieved chunks, in rank order
+            semantic: Whether to fall back to the semantic level
+
+        Returns:
+            The cached answer, or None on a miss
+        """
+        now: float = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answer, generation_seconds FROM answers "
+                "WHERE prompt_key = ? AND created > ?",
+                (self._prompt_key(prompt), now - self.ttl),
+            ).fetchone()
+            if row is not None:
+                self.exact_hits += 1
+                key: str = self._prompt_key(prompt)
+            elif semantic:
+                query: np.ndarray = np.asarray(embedding, dtype=np.float32)
+                query /= max(float(np.linalg.norm(query)), 1e-12)
+                best: float = self.threshold
+                for prompt_key, vector, answer, seconds in self._db.execute(
+                    "SELECT prompt_key, embedding, answer, generation_seconds "
+                    "FROM answers WHERE chunk_key = ? AND created > ?",
+                    (self._chunk_key(chunk_ids), now - self.ttl),
+                ):
+                    similarity: float = float(
+                        np.frombuffer(vector, dtype=np.float32) @ query
+                    )
+                    if similarity >= best:
+                        best, key, row = similarity, prompt_key, (answer, seconds)
+                if row is not None:
+                    self.semantic_hits += 1
+            if row is None:
+                self.misses += 1
+                return None
+            self.saved_seconds += row[1]
+            self._db.execute(
+                "UPDATE answers SET last_used = ? WHERE prompt_key = ?", (now, key)
+            )
+            return row[0]
+
+    def put(
+        self,
+        prompt: str,
+        embedding: Sequence[float],
+        chunk_ids: Sequence[str],
+        answer: str,
+        generation_seconds: float,
+    ) -> None:
+        """Store an answer and evict expired and least recently used entries."""
+        vector: np.ndarray = np.asarray(embedding, dtype=np.float32)
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        now: float = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._prompt_key(prompt),
+                    self._chunk_key(chunk_ids),
+                    vector.tobytes(),
+                    answer,
+                    generation_seconds,
+                    now,
+                    now,
+                ),
+            )
+            self._db.execute(
+                "DELETE FROM answers WHERE created <= ?", (now - self.ttl,)
+            )
+            self._db.execute(
+                "DELETE FROM answers WHERE prompt_key IN ("
+                "SELECT prompt_key FROM answers ORDER BY last_used DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit counts, hit rate and generation time saved by hits."""
+        lookups: int = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (
+                (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0
+            ),
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
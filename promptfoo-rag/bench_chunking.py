@@ -0,0 +1,111 @@
+"""
+Benchmark chunking strategies on a local directory of PDFs.
+
+For each strategy reports chunking speed (chunks/sec, pages parsed once up
+front), the token-length distribution of the chunks (total tokens is the
+embedding bill), and the retrieval hit-rate on dataset.jsonl: the share of
+labelled questions for which a top-k chunk contains an asserted answer.
+
+Embeddings go through the shared on-disk cache, so repeated runs are free;
+point OPENAI_BASE_URL at mock_openai_server.py to run without the API (the
+hit-rate is then meaningless). Use --no-retrieval to measure speed only.
+
+Usage:
+    python bench_chunking.py path/to/pdfs [--strategies recursive sentence table]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_openai import OpenAIEmbeddings
+
+from bench_parsing import load_directory
+from chunking import CHUNKERS, get_chunker
+from dataset import DATASET_PATH, LabeledQuestion, load_labeled_questions
+from embedding_batcher import token_counter
+from embedding_cache import cached_embeddings
+from parsing import parse_pdf
+
+OPENAI_AI_EMBEDDING_MODEL: str = "text-embedding-3-large"
+
+
+def hit_rate(
+    chunks: List[Document], questions: List[LabeledQuestion], embeddings, k: int
+) -> float:
+    """Return the share of questions with a relevant chunk in the top ``k``."""
+    matrix: np.ndarray = np.asarray(
+        embeddings.embed_documents([chunk.page_content for chunk in chunks]),
+        dtype=np.float32,
+    )
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    queries: np.ndarray = np.asarray(
+        embeddings.embed_documents([q.question for q in questions]), dtype=np.float32
+    )
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    top: np.ndarray = np.argsort(-(queries @ matrix.T), axis=1)[:, :k]
+    hits: int = sum(
+        any(question.is_relevant(chunks[i].page_content) for i in row)
+        for question, row in zip(questions, top)
+    )
+    return hits / len(questions)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", help="Directory of PDF files")
+    parser.add_argument(
+        "--strategies", nargs="+", default=sorted(CHUNKERS), choices=sorted(CHUNKERS)
+    )
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--no-retrieval", action="store_true")
+    args = parser.parse_args()
+
+    pages: List[Document] = []
+    for name, data in load_directory(args.directory):
+        pages.extend(parse_pdf(data, os.path.join(args.directory, name)))
+    print(f"{len(pages)} pages")
+
+    count_tokens = token_counter(OPENAI_AI_EMBEDDING_MODEL)
+    questions: List[LabeledQuestion] = load_labeled_questions(args.dataset)
+    embeddings = None
+    if not args.no_retrieval:
+        embeddings = cached_embeddings(
+            OpenAIEmbeddings(
+                model=OPENAI_AI_EMBEDDING_MODEL,
+                openai_api_key=os.getenv("OPENAI_API_KEY"),
+            ),
+            OPENAI_AI_EMBEDDING_MODEL,
+        )
+
+    print(
+        f"{'strategy':<10} {'chunks':>7} {'chunks/s':>10} {'tokens':>9} "
+        f"{'mean':>6} {'stdev':>6} {'hit@' + str(args.k):>7}"
+    )
+    for strategy in args.strategies:
+        chunker = get_chunker(strategy)
+        started: float = time.perf_counter()
+        chunks: List[Document] = chunker.split_documents(pages)
+        elapsed: float = time.perf_counter() - started
+        lengths: List[int] = count_tokens([chunk.page_content for chunk in chunks])
+        hits: str = (
+            f"{hit_rate(chunks, questions, embeddings, args.k):7.2f}"
+            if embeddings is not None and questions
+            else f"{'-':>7}"
+        )
+        print(
+            f"{strategy:<10} {len(chunks):>7} {len(chunks) / elapsed:>10.0f} "
+            f"{sum(lengths):>9} {statistics.mean(lengths):>6.1f} "
+            f"{statistics.pstdev(lengths):>6.1f} {hits}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Report the prompt tokens saved by context packing on dataset.jsonl.
+
+Retrieves chunks for every labelled question as the RAG service does and
+prints, per question, the context tokens of the plain top-k join and of the
+packed context, followed by totals. The "answer" columns show whether an
+asserted answer is still in the context, so a budget that cuts relevant
+text shows up next to the tokens it saves.
+
+Usage:
+    python bench_context.py [--top-k 10] [--budget 1500] [--vector-store numpy]
+"""
+
+from __future__ import annotations
+
+import argparse
+from typing import Any, Dict, List
+
+import rag_service
+from context_packing import CONTEXT_SEPARATOR, PackedContext
+from dataset import DATASET_PATH, LabeledQuestion, load_labeled_questions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=rag_service.context_packer.budget)
+    parser.add_argument(
+        "--vector-store",
+        choices=rag_service.VECTOR_STORES,
+        default=rag_service.DEFAULT_VECTOR_STORE,
+    )
+    args = parser.parse_args()
+
+    questions: List[LabeledQuestion] = load_labeled_questions(args.dataset)
+    texts: List[str] = [question.question for question in questions]
+    config: Dict[str, Any] = {"topK": args.top_k, "vectorStore": args.vector_store}
+    chunks: List[List[rag_service.Chunk]] = rag_service.retrieve_chunks(
+        texts, rag_service.embeddings.embed_documents(texts), config
+    )
+
+    print(f"{'before':>7} {'after':>7} {'saved':>6} {'answer':>9}  question")
+    kept: int = 0
+    found: int = 0
+    for question, row in zip(questions, chunks):
+        packed: PackedContext = rag_service.context_packer.pack(row, args.budget)
+        had_answer: bool = question.is_relevant(
+            CONTEXT_SEPARATOR.join(chunk[1] for chunk in row)
+        )
+        has_answer: bool = question.is_relevant(packed.text)
+        found += had_answer
+        kept += had_answer and has_answer
+        saved: float = (
+            1 - packed.tokens / packed.unpacked_tokens if packed.unpacked_tokens else 0
+        )
+        answer: str = f"{'y' if had_answer else 'n'} -> {'y' if has_answer else 'n'}"
+        print(
+            f"{packed.unpacked_tokens:>7} {packed.tokens:>7} {saved:>6.1%} "
+            f"{answer:>9}  {question.question[:60]}"
+        )
+
+    stats: Dict[str, Any] = rag_service.context_packer.stats()
+    print(
+        f"total: {stats['tokens_before']} -> {stats['tokens_after']} tokens "
+        f"({stats['saved_rate']:.1%} saved), {stats['duplicates_dropped']} "
+        f"duplicate and {stats['chunks_merged']} merged chunks of {stats['chunks']}; "
+        f"answer kept in {kept} of {found} contexts that had it"
+    )
+
+
+if __name__ == "__main__":
+    main()
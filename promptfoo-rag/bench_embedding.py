@@ -0,0 +1,125 @@
+"""
+Benchmark embedding throughput against the local mock OpenAI server.
+
+Compares the old fixed 100-document sequential batches with
+BatchedEmbeddings (token-packed, concurrent, adaptive on 429s) under a
+tokens-per-minute quota, and reports achieved tokens/sec. The mock's
+bucket starts full, so the steady-state figure leaves out the ``--burst``
+seconds of quota it holds; only that one is comparable with the quota.
+
+Usage:
+    python bench_embedding.py [--texts 5000] [--tpm 3000000] [--latency 0.2] [--burst 1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import openai
+from langchain_openai import OpenAIEmbeddings
+
+from embedding_batcher import MAX_BATCH_INPUTS, BatchedEmbeddings
+from mock_openai_server import MockOpenAIServer
+
+MODEL: str = "text-embedding-3-large"
+WORDS: List[str] = (
+    "net sales revenue operating income gross margin quarter fiscal year "
+    "services products cloud segment million increase decrease compared"
+).split()
+
+
+def make_texts(count: int, seed: int = 0) -> List[str]:
+    """Return ``count`` distinct chunk-sized texts of varying length."""
+    rng: random.Random = random.Random(seed)
+    return [
+        f"{i} " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 110)))
+        for i in range(count)
+    ]
+
+
+def openai_embeddings(base_url: str, **kwargs) -> OpenAIEmbeddings:
+    # Send raw strings so the benchmark does not need tiktoken's encoding files
+    return OpenAIEmbeddings(
+        model=MODEL,
+        openai_api_key="test",
+        openai_api_base=base_url,
+        check_embedding_ctx_length=False,
+        **kwargs,
+    )
+
+
+def report(label: str, server: MockOpenAIServer, elapsed: float) -> None:
+    """Print the achieved and steady-state (burst excluded) throughput of a run."""
+    burst: float = server.bucket.capacity if server.bucket else 0.0
+    steady: float = max(0.0, server.stats["tokens"] - burst) / elapsed
+    print(
+        f"{label:<22}{elapsed:6.2f}s "
+        f"{server.stats['tokens'] / elapsed:10.0f} tokens/sec "
+        f"{steady:10.0f} steady-state "
+        f"requests={server.stats['requests']} 429s={server.stats['rate_limited']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--tpm", type=float, default=3_000_000)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--burst", type=float, default=1.0)
+    args = parser.parse_args()
+    texts: List[str] = make_texts(args.texts)
+
+    server = MockOpenAIServer(
+        tokens_per_minute=args.tpm,
+        latency=args.latency,
+        dimensions=args.dimensions,
+        burst_seconds=args.burst,
+    ).start()
+    started: float = time.perf_counter()
+    baseline: OpenAIEmbeddings = openai_embeddings(server.base_url)
+    try:
+        for i in range(0, len(texts), 100):
+            baseline.embed_documents(texts[i : i + 100])
+    except openai.OpenAIError as e:
+        # Under a tight quota the SDK's own retries can run out; still compare
+        print(f"fixed batches of 100: failed after {i} texts: {type(e).__name__}")
+    else:
+        elapsed: float = time.perf_counter() - started
+        report("fixed batches of 100:", server, elapsed)
+    server.shutdown()
+
+    server = MockOpenAIServer(
+        tokens_per_minute=args.tpm,
+        latency=args.latency,
+        dimensions=args.dimensions,
+        burst_seconds=args.burst,
+    ).start()
+    batched: BatchedEmbeddings = BatchedEmbeddings(
+        openai_embeddings(
+            server.base_url, max_retries=0, chunk_size=MAX_BATCH_INPUTS
+        ),
+        MODEL,
+    )
+    started = time.perf_counter()
+    # Several callers at once, as the ingest embed stage does
+    step: int = max(1, len(texts) // 8)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(
+            executor.map(
+                batched.embed_documents,
+                [texts[i : i + step] for i in range(0, len(texts), step)],
+            )
+        )
+    elapsed = time.perf_counter() - started
+    report("batched (adaptive):", server, elapsed)
+    print(f"quota: {args.tpm / 60:.0f} tokens/sec; {batched.report()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Compare dense, BM25 and hybrid retrieval on the labelled questions in dataset.jsonl.
+
+Runs the RAG service's retrieval step in-process against the ingested store
+and, for each mode, reports recall@k (the share of questions with a chunk
+containing an asserted answer in the top k) and the mean number of context
+tokens sent to the model at the largest k. Needs the BM25 index that
+ingest.py writes next to the vector store.
+
+Usage:
+    python bench_hybrid.py [--vector-store numpy] [--k 1 3 5 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Any, Dict, List
+
+import rag_service
+from dataset import DATASET_PATH, LabeledQuestion, load_labeled_questions
+from embedding_batcher import token_counter
+
+MODES: Dict[str, Dict[str, Any]] = {
+    "dense": {"retrieval": "dense", "metadataFilters": False},
+    "dense+filters": {"retrieval": "dense", "metadataFilters": True},
+    "bm25": {"retrieval": "lexical", "metadataFilters": False},
+    "hybrid": {"retrieval": "hybrid", "metadataFilters": False},
+    "hybrid+filters": {"retrieval": "hybrid", "metadataFilters": True},
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument(
+        "--vector-store",
+        choices=rag_service.VECTOR_STORES,
+        default=rag_service.DEFAULT_VECTOR_STORE,
+    )
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 2, 3, 5, 10])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    args = parser.parse_args()
+
+    questions: List[LabeledQuestion] = load_labeled_questions(args.dataset)
+    texts: List[str] = [question.question for question in questions]
+    vectors: List[List[float]] = rag_service.embeddings.embed_documents(texts)
+    count_tokens = token_counter(rag_service.OPENAI_AI_MODEL)
+    top: int = max(args.k)
+    print(f"{len(questions)} labelled questions, {args.vector_store} store")
+
+    print(
+        f"{'mode':<15} "
+        + " ".join(f"{'R@' + str(k):>6}" for k in args.k)
+        + f" {'tokens@' + str(top):>10} {'ms/query':>9}"
+    )
+    for mode in args.modes:
+        config: Dict[str, Any] = {
+            "topK": top,
+            "vectorStore": args.vector_store,
+            **MODES[mode],
+        }
+        started: float = time.perf_counter()
+        chunks: List[List[rag_service.Chunk]] = rag_service.retrieve_chunks(
+            texts, vectors, config
+        )
+        elapsed: float = time.perf_counter() - started
+        recalls: List[float] = [
+            sum(
+                any(question.is_relevant(chunk[1]) for chunk in retrieved[:k])
+                for question, retrieved in zip(questions, chunks)
+            )
+            / len(questions)
+            for k in args.k
+        ]
+        tokens: float = statistics.mean(
+            sum(count_tokens([chunk[1] for chunk in retrieved])) for retrieved in chunks
+        )
+        print(
+            f"{mode:<15} "
+            + " ".join(f"{recall:>6.2f}" for recall in recalls)
+            + f" {tokens:>10.0f} {1000 * elapsed / len(questions):>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
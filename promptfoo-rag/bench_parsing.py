@@ -0,0 +1,92 @@
+"""
+Benchmark PDF parsing and splitting: thread pool vs process pool.
+
+Reads every PDF in a local directory into memory, then parses and splits
+them with the thread-based path and with the process-pool path used by
+``ingest.py --parse-mode process``, and reports pages/sec for each.
+
+Usage:
+    python bench_parsing.py path/to/pdfs [--threads 5] [--processes 8]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+from parsing import (
+    PackedChunks,
+    parse_and_split_packed,
+    parse_pdf,
+    split_pages,
+    unpack_chunks,
+)
+
+
+def load_directory(directory: str) -> List[Tuple[str, bytes]]:
+    """Return (name, content) for every PDF in ``directory``."""
+    files: List[Tuple[str, bytes]] = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(".pdf"):
+            with open(os.path.join(directory, name), "rb") as f:
+                files.append((name, f.read()))
+    return files
+
+
+def thread_path(files: List[Tuple[str, bytes]], threads: int) -> Tuple[int, int]:
+    """Parse and split on a thread pool, as ingest.py --parse-mode thread does."""
+
+    def work(item: Tuple[str, bytes]) -> Tuple[int, int]:
+        name, data = item
+        pages = parse_pdf(data, name)
+        return len(pages), len(split_pages(pages))
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results: List[Tuple[int, int]] = list(executor.map(work, files))
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+
+def process_path(files: List[Tuple[str, bytes]], processes: int) -> Tuple[int, int]:
+    """Parse and split in a process pool, as ingest.py --parse-mode process does."""
+    pages: int = 0
+    chunks: int = 0
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            (name, executor.submit(parse_and_split_packed, data, name))
+            for name, data in files
+        ]
+        for name, future in futures:
+            packed: PackedChunks = future.result()
+            pages += packed[0]
+            chunks += len(unpack_chunks(packed, name))
+    return pages, chunks
+
+
+def run(label: str, fn: Callable[[], Tuple[int, int]]) -> None:
+    started: float = time.perf_counter()
+    pages, chunks = fn()
+    elapsed: float = time.perf_counter() - started
+    print(
+        f"{label:<22} pages={pages:<7} chunks={chunks:<8} "
+        f"time={elapsed:7.2f}s pages/sec={pages / elapsed:9.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", help="Directory of PDF files")
+    parser.add_argument("--threads", type=int, default=5)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    files: List[Tuple[str, bytes]] = load_directory(args.directory)
+    print(f"{len(files)} PDFs, {sum(len(d) for _, d in files) / 1e6:.1f} MB")
+    run(f"threads ({args.threads})", lambda: thread_path(files, args.threads))
+    run(f"processes ({args.processes})", lambda: process_path(files, args.processes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Offline retrieval benchmark: recall@k, MRR and query latency per configuration.
+
+Measures the retrieval half of the RAG pipeline on its own, without
+promptfoo or any LLM call. The string assertions in dataset.jsonl are the
+relevance labels (see dataset.py): a retrieved chunk is relevant to a
+question if it contains an asserted value. For every chunking configuration
+the PDFs are chunked, embedded and loaded into a temporary NumpyVectorStore,
+which is then searched exactly (flat) and, with --nlist, through an IVF
+index at each --nprobe. Reported per configuration:
+
+    R@k        share of questions with a relevant chunk in the top k
+    MRR        mean reciprocal rank of the first relevant chunk (0 if none
+               within the largest k)
+    p50/p95/p99  single-query search latency over --repeats rounds
+
+Embeddings come from the shared on-disk cache only, and a cache miss is an
+error. Fill the cache once with --online (which calls the embeddings API
+for the missing texts); later runs are fully offline. Chunks produced by
+ingest.py with the same chunking configuration are already cached.
+
+Usage:
+    python bench_retrieval.py path/to/pdfs [--configs recursive:500:50 sentence:128:16]
+        [--k 1 3 5 10] [--nlist 64 --nprobe 1 4 16] [--output retrieval_benchmark.md]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from bench_parsing import load_directory
+from chunking import CHUNKERS, get_chunker
+from dataset import DATASET_PATH, LabeledQuestion, load_labeled_questions
+from embedding_cache import EmbeddingCacheMiss, OfflineEmbeddings, cached_embeddings
+from parsing import parse_pdf
+from vector_store import NumpyVectorStore
+
+OPENAI_AI_EMBEDDING_MODEL: str = "text-embedding-3-large"
+DEFAULT_CONFIGS: List[str] = [
+    "recursive:500:50",
+    "recursive:1000:100",
+    "sentence:128:16",
+    "table:128:16",
+]
+
+
+def parse_config(spec: str) -> Tuple[str, Optional[int], Optional[int]]:
+    """Parse "strategy[:chunk_size[:chunk_overlap]]"; omitted sizes use defaults."""
+    parts: List[str] = spec.split(":")
+    if parts[0] not in CHUNKERS or len(parts) > 3:
+        raise ValueError(
+            f"Bad configuration {spec!r}, expected strategy[:size[:overlap]] "
+            f"with a strategy from {sorted(CHUNKERS)}"
+        )
+    sizes: List[Optional[int]] = [int(part) for part in parts[1:]]
+    sizes += [None] * (2 - len(sizes))
+    return parts[0], sizes[0], sizes[1]
+
+
+def evaluate(
+    store: NumpyVectorStore,
+    questions: List[LabeledQuestion],
+    queries: np.ndarray,
+    k: int,
+    nprobe: Optional[int],
+    repeats: int,
+) -> Tuple[List[Optional[int]], List[float]]:
+    """
+    Search the store once per question and time single-query searches.
+
+    Returns:
+        The 1-based rank of the first relevant chunk per question (None if
+        none is in the top ``k``), and per-query latencies in milliseconds
+    """
+    ranks: List[Optional[int]] = []
+    for question, (rows, _scores) in zip(questions, store.search(queries, k, nprobe)):
+        records: List[Dict[str, Any]] = store.get_rows(rows)
+        ranks.append(
+            next(
+                (
+                    rank
+                    for rank, record in enumerate(records, start=1)
+                    if question.is_relevant(record["text"])
+                ),
+                None,
+            )
+        )
+    latencies: List[float] = []
+    for _ in range(repeats):
+        for query in queries:
+            started: float = time.perf_counter()
+            store.search(query[None, :], k, nprobe)
+            latencies.append(1000 * (time.perf_counter() - started))
+    return ranks, latencies
+
+
+def format_table(rows: List[Dict[str, Any]], ks: List[int]) -> str:
+    """Render result rows as a Markdown table."""
+    headers: List[str] = (
+        ["config", "chunks", "index"]
+        + [f"R@{k}" for k in ks]
+        + [f"MRR@{max(ks)}", "p50 ms", "p95 ms", "p99 ms"]
+    )
+    lines: List[str] = [
+        "| " + " | ".join(headers) + " |",
+        "|" + "|".join("---" for _ in headers) + "|",
+    ]
+    for row in rows:
+        cells: List[str] = (
+            [row["config"], str(row["chunks"]), row["index"]]
+            + [f"{row['recall'][k]:.2f}" for k in ks]
+            + [f"{row['mrr']:.3f}"]
+            + [f"{row[name]:.3f}" for name in ("p50", "p95", "p99")]
+        )
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Run the benchmark for parsed command-line arguments."""
+    configs: List[Tuple[str, Optional[int], Optional[int]]] = [
+        parse_config(spec) for spec in args.configs
+    ]
+    questions: List[LabeledQuestion] = load_labeled_questions(args.dataset)
+    if not questions:
+        raise SystemExit(f"No labelled questions in {args.dataset}")
+    underlying: Embeddings = OfflineEmbeddings()
+    if args.online:
+        from langchain_openai import OpenAIEmbeddings
+
+        underlying = OpenAIEmbeddings(
+            model=OPENAI_AI_EMBEDDING_MODEL, openai_api_key=os.getenv("OPENAI_API_KEY")
+        )
+    embeddings = cached_embeddings(underlying, OPENAI_AI_EMBEDDING_MODEL)
+    queries: np.ndarray = np.asarray(
+        embeddings.embed_documents([question.question for question in questions]),
+        dtype=np.float32,
+    )
+
+    pages: List[Document] = []
+    for name, data in load_directory(args.directory):
+        pages.extend(parse_pdf(data, os.path.join(args.directory, name)))
+    print(f"{len(pages)} pages, {len(questions)} labelled questions")
+
+    k: int = max(args.k)
+    rows: List[Dict[str, Any]] = []
+    for strategy, chunk_size, chunk_overlap in configs:
+        chunker = get_chunker(strategy, chunk_size, chunk_overlap)
+        label: str = f"{strategy}:{chunker.chunk_size}:{chunker.chunk_overlap}"
+        chunks: List[Document] = chunker.split_documents(pages)
+        texts: List[str] = [chunk.page_content for chunk in chunks]
+        vectors: List[List[float]] = embeddings.embed_documents(texts)
+
+        # nlist 0 keeps the store flat (exact search) whatever its size
+        indexes: List[Tuple[str, int, Optional[int]]] = [("flat", 0, None)]
+        if args.nlist:
+            indexes += [
+                (f"ivf{args.nlist}/nprobe{nprobe}", args.nlist, nprobe)
+                for nprobe in args.nprobe
+            ]
+        with tempfile.TemporaryDirectory() as directory:
+            stores: Dict[int, NumpyVectorStore] = {}
+            for index, nlist, nprobe in indexes:
+                if nlist not in stores:
+                    stores[nlist] = NumpyVectorStore(
+                        os.path.join(directory, str(nlist))
+                    )
+                    stores[nlist].upsert(
+                        [str(i) for i in range(len(chunks))],
+                        vectors,
+                        texts,
+                        [chunk.metadata for chunk in chunks],
+                    )
+                    stores[nlist].save(nlist)
+                ranks, latencies = evaluate(
+                    stores[nlist], questions, queries, k, nprobe, args.repeats
+                )
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                rows.append(
+                    {
+                        "config": label,
+                        "chunks": len(chunks),
+                        "index": index,
+                        "recall": {
+                            at: sum(rank is not None and rank <= at for rank in ranks)
+                            / len(ranks)
+                            for at in args.k
+                        },
+                        "mrr": sum(1 / rank for rank in ranks if rank) / len(ranks),
+                        "p50": p50,
+                        "p95": p95,
+                        "p99": p99,
+                    }
+                )
+        print(f"{label}: {len(chunks)} chunks done")
+
+    table: str = format_table(rows, sorted(args.k))
+    print(table)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(table + "\n")
+        print(f"Wrote {args.output}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", help="Directory of PDF files")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument(
+        "--configs",
+        nargs="+",
+        default=DEFAULT_CONFIGS,
+        help="Chunking configurations as strategy[:chunk_size[:chunk_overlap]]",
+    )
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--nlist", type=int, help="Also search through an IVF index")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--online", action="store_true")
+    parser.add_argument("--output", default="retrieval_benchmark.md")
+    args = parser.parse_args()
+    try:
+        run(args)
+    except EmbeddingCacheMiss as e:
+        raise SystemExit(f"{e}; run once with --online to fill the cache")
+
+
+if __name__ == "__main__":
+    main()
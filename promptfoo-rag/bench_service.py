@@ -0,0 +1,74 @@
+"""
+Measure promptfoo provider startup and per-call overhead.
+
+Compares what every promptfoo test case paid before the RAG worker existed
+(a fresh interpreter importing and initializing the whole pipeline) with the
+import-light retrieve.py shim calling a warm rag_service.py worker. No API
+calls are made: the per-call numbers use the worker's /ping endpoint, i.e.
+pure transport overhead on top of the retrieval and generation work.
+
+Usage:
+    python bench_service.py [--calls 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+import retrieve
+
+IN_PROCESS_SCRIPT: str = (
+    "import rag_service; rag_service.get_vector_store(rag_service.DEFAULT_VECTOR_STORE)"
+)
+SHIM_SCRIPT: str = "import retrieve; retrieve._request('/ping', {})"
+
+
+def fresh_interpreter(script: str) -> float:
+    """Return the wall time of running ``script`` in a new Python process."""
+    started: float = time.perf_counter()
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=retrieve.SERVICE_DIR)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    # Clients are only constructed, never called
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+    if retrieve._is_running():
+        retrieve._request("/shutdown", {})
+        while retrieve._is_running():
+            time.sleep(0.1)
+    started: float = time.perf_counter()
+    retrieve.ensure_service()
+    print(f"worker startup (spawn to ready): {time.perf_counter() - started:.2f}s")
+
+    in_process: float = min(
+        fresh_interpreter(IN_PROCESS_SCRIPT) for _ in range(args.runs)
+    )
+    shim: float = min(fresh_interpreter(SHIM_SCRIPT) for _ in range(args.runs))
+    print(f"per test case, in-process pipeline:  {in_process * 1000:8.1f} ms")
+    print(f"per test case, shim + warm worker:   {shim * 1000:8.1f} ms")
+
+    latencies: List[float] = []
+    for _ in range(args.calls):
+        call_started: float = time.perf_counter()
+        retrieve._request("/ping", {})
+        latencies.append((time.perf_counter() - call_started) * 1000)
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"shim round trip to warm worker: p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+    print(f"worker stats: {retrieve._request('/stats')}")
+
+
+if __name__ == "__main__":
+    main()
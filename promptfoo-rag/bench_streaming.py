@@ -0,0 +1,88 @@
+"""
+Measure time-to-first-token of streamed RAG answers against blocking calls.
+
+Every question in dataset.jsonl is answered twice through retrieve.py: once
+streamed (``stream_api``), timing the first piece and the whole answer as
+the caller sees them, and once with ``stream`` off, where the first token
+arrives with the whole answer. The worker's own retrieval, TTFT and
+generation times are reported alongside. The answer cache is bypassed.
+
+With --mock, a mock_openai_server.py instance with the given first-token
+delay and token interval stands in for the OpenAI API and the pipeline runs
+in-process, so no API key or running worker is needed (the answers and the
+retrieved chunks are then meaningless).
+
+Usage:
+    python bench_streaming.py [--mock --ttft 0.3 --token-interval 0.02]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from dataset import DATASET_PATH, load_questions
+
+
+def summary(name: str, values: List[float]) -> str:
+    p50, p99 = np.percentile(values, [50, 99])
+    return f"{name:<28} p50 {p50:8.1f} ms  p99 {p99:8.1f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--mock", action="store_true")
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--token-interval", type=float, default=0.02)
+    args = parser.parse_args()
+
+    if args.mock:
+        from mock_openai_server import MockOpenAIServer
+
+        server = MockOpenAIServer(ttft=args.ttft, token_interval=args.token_interval)
+        server.start()
+        # Read when retrieve.py and rag_service.py are imported below
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "test")
+        os.environ["RAG_SERVICE"] = "inprocess"
+    import retrieve
+
+    questions: List[str] = load_questions(args.dataset)
+    config: Dict[str, Any] = {"topK": args.top_k, "answerCache": False}
+    client: Dict[str, List[float]] = {"stream_ttft": [], "stream_total": []}
+    worker: Dict[str, List[float]] = {}
+    blocking: List[float] = []
+    for question in questions:
+        started: float = time.perf_counter()
+        stream = retrieve.stream_api(question, {"config": config})
+        first: Optional[float] = None
+        for _ in stream:
+            if first is None:
+                first = time.perf_counter() - started
+        client["stream_total"].append(1000 * (time.perf_counter() - started))
+        if first is not None:
+            client["stream_ttft"].append(1000 * first)
+        for name, ms in stream.metadata.items():
+            if ms is not None:
+                worker.setdefault(name, []).append(ms)
+
+        started = time.perf_counter()
+        retrieve.call_api(question, {"config": {**config, "stream": False}}, {})
+        blocking.append(1000 * (time.perf_counter() - started))
+
+    print(f"{len(questions)} questions")
+    print(summary("blocking: first token", blocking))
+    print(summary("streamed: first token", client["stream_ttft"]))
+    print(summary("streamed: whole answer", client["stream_total"]))
+    for name, values in worker.items():
+        print(summary(f"worker: {name}", values))
+
+
+if __name__ == "__main__":
+    main()
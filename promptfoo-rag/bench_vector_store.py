@@ -0,0 +1,217 @@
+"""
+Benchmark NumpyVectorStore against Chroma: cold start, query latency, recall.
+
+By default the vectors of the ingested Chroma collection under db/ are
+exported into temporary NumpyVectorStores; with ``--synthetic N`` both a
+Chroma collection and the numpy stores are filled with N clustered random
+vectors instead, to measure behaviour at sizes the real corpus does not
+reach. Queries are stored vectors with added noise, so no embedding API is
+needed.
+
+For Chroma (HNSW), the brute-force numpy store and the IVF numpy store at
+several ``nprobe`` values it reports p50/p99 single-query latency and
+recall@k against exact brute-force search. Cold start is the time for a
+fresh interpreter to import the backend, open the store and answer one query.
+
+Usage:
+    python bench_vector_store.py [--synthetic 200000 --dim 256] [--k 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from vector_store import NumpyVectorStore, normalize
+
+CHROMA_PATH: str = "db"
+COLLECTION_NAME: str = "rag_collection"
+EXPORT_PAGE_SIZE: int = 5000
+
+COLD_START_SCRIPTS: Dict[str, str] = {
+    "chroma": (
+        "import chromadb, numpy as np;"
+        "c = chromadb.PersistentClient(path={path!r}).get_collection({name!r});"
+        "c.query(query_embeddings=[np.load({query!r}).tolist()], n_results={k})"
+    ),
+    "numpy": (
+        "import numpy as np; from vector_store import NumpyVectorStore;"
+        "NumpyVectorStore({path!r}).search(np.load({query!r}), {k})"
+    ),
+}
+
+
+def export_chroma(collection) -> Tuple[List[str], np.ndarray, List[str], List[Dict]]:
+    """Read every id, embedding, document and metadata from a Chroma collection."""
+    ids: List[str] = []
+    vectors: List[np.ndarray] = []
+    documents: List[str] = []
+    metadatas: List[Dict] = []
+    for offset in range(0, collection.count(), EXPORT_PAGE_SIZE):
+        page = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=EXPORT_PAGE_SIZE,
+            offset=offset,
+        )
+        ids.extend(page["ids"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+    return ids, np.concatenate(vectors), documents, metadatas
+
+
+def synthetic_vectors(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Return ``count`` normalized vectors drawn around random cluster centres."""
+    rng = np.random.default_rng(seed)
+    centres: np.ndarray = rng.normal(size=(max(1, count // 500), dim))
+    vectors: np.ndarray = centres[rng.integers(0, len(centres), count)]
+    return normalize(vectors + 0.5 * rng.normal(size=(count, dim)))
+
+
+def build_chroma(path: str, ids: List[str], vectors: np.ndarray):
+    """Create a cosine-space Chroma collection holding ``vectors``."""
+    import chromadb
+
+    client = chromadb.PersistentClient(path=path)
+    collection = client.create_collection(
+        COLLECTION_NAME, metadata={"hnsw:space": "cosine"}
+    )
+    step: int = client.get_max_batch_size()
+    for i in range(0, len(ids), step):
+        collection.add(
+            ids=ids[i : i + step],
+            embeddings=vectors[i : i + step],
+            documents=[""] * len(ids[i : i + step]),
+        )
+    return collection
+
+
+def measure(
+    search: Callable[[np.ndarray], List[int]],
+    queries: np.ndarray,
+    truth: List[Set[int]],
+    k: int,
+) -> Tuple[float, float, float]:
+    """Return p50 and p99 latency in ms and mean recall@k of ``search``."""
+    latencies: List[float] = []
+    recalls: List[float] = []
+    for query, expected in zip(queries, truth):
+        started: float = time.perf_counter()
+        found: List[int] = search(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(len(expected.intersection(found)) / k)
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return float(p50), float(p99), float(np.mean(recalls))
+
+
+def cold_start(backend: str, path: str, query_path: str, k: int) -> float:
+    """Return the wall time of a fresh interpreter opening and querying a store."""
+    script: str = COLD_START_SCRIPTS[backend].format(
+        path=path, name=COLLECTION_NAME, query=query_path, k=k
+    )
+    started: float = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", script],
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--synthetic", type=int, help="Use N random vectors instead of db/"
+    )
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlist", type=int, help="IVF clusters (default sqrt(N))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    args = parser.parse_args()
+
+    workdir: str = tempfile.mkdtemp(prefix="bench_vector_store_")
+    if args.synthetic:
+        vectors: np.ndarray = synthetic_vectors(args.synthetic, args.dim)
+        ids: List[str] = [str(i) for i in range(len(vectors))]
+        documents: List[str] = [""] * len(ids)
+        metadatas: List[Dict] = [{}] * len(ids)
+        chroma_path: str = os.path.join(workdir, "chroma")
+        started: float = time.perf_counter()
+        collection = build_chroma(chroma_path, ids, vectors)
+        print(f"chroma build: {time.perf_counter() - started:.1f}s")
+    else:
+        import chromadb
+
+        chroma_path = CHROMA_PATH
+        collection = chromadb.PersistentClient(path=chroma_path).get_collection(
+            COLLECTION_NAME
+        )
+        ids, vectors, documents, metadatas = export_chroma(collection)
+    print(f"{len(ids)} vectors of dimension {vectors.shape[1]}")
+
+    brute: NumpyVectorStore = NumpyVectorStore(os.path.join(workdir, "brute"))
+    brute.upsert(ids, vectors, documents, metadatas)
+    brute.save(nlist=0)
+    ivf: NumpyVectorStore = NumpyVectorStore(os.path.join(workdir, "ivf"))
+    ivf.upsert(ids, vectors, documents, metadatas)
+    started = time.perf_counter()
+    ivf.save(nlist=args.nlist or int(np.sqrt(len(ids))))
+    print(f"numpy IVF build: {time.perf_counter() - started:.1f}s, {ivf.nlist} lists")
+
+    rng = np.random.default_rng(1)
+    picks: np.ndarray = rng.choice(len(ids), min(args.queries, len(ids)), replace=False)
+    queries: np.ndarray = normalize(
+        vectors[picks] + 0.1 * rng.normal(size=(len(picks), vectors.shape[1]))
+    )
+    # Ground truth as chunk ids; the stores order rows differently
+    truth_ids: List[Set[str]] = []
+    for rows, _ in brute.search(queries, args.k):
+        truth_ids.append({record["id"] for record in brute.get_rows(rows)})
+    id_index: Dict[str, int] = {chunk_id: i for i, chunk_id in enumerate(ids)}
+    truth: List[Set[int]] = [{id_index[i] for i in group} for group in truth_ids]
+
+    def store_search(store: NumpyVectorStore, nprobe: Optional[int]):
+        row_ids: List[int] = [
+            id_index[record["id"]] for record in store.get_rows(range(len(store)))
+        ]
+        return lambda query: [
+            row_ids[row] for row in store.search(query, args.k, nprobe)[0][0]
+        ]
+
+    def chroma_search(query: np.ndarray) -> List[int]:
+        result = collection.query(query_embeddings=[query], n_results=args.k)
+        return [id_index[i] for i in result["ids"][0]]
+
+    runs: List[Tuple[str, Callable[[np.ndarray], List[int]]]] = [
+        ("chroma (hnsw)", chroma_search),
+        ("numpy brute force", store_search(brute, None)),
+    ]
+    runs.extend(
+        (f"numpy ivf nprobe={nprobe}", store_search(ivf, nprobe))
+        for nprobe in args.nprobe
+    )
+    print(f"{'backend':<24} {'p50 ms':>8} {'p99 ms':>8} {'recall@' + str(args.k):>9}")
+    for label, search in runs:
+        p50, p99, recall = measure(search, queries, truth, args.k)
+        print(f"{label:<24} {p50:>8.2f} {p99:>8.2f} {recall:>9.3f}")
+
+    query_path: str = os.path.join(workdir, "query.npy")
+    np.save(query_path, queries[0])
+    print(
+        f"cold start: chroma {cold_start('chroma', chroma_path, query_path, args.k):.2f}s, "
+        f"numpy {cold_start('numpy', ivf.path, query_path, args.k):.2f}s"
+    )
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Compact on-disk BM25 inverted index over the ingested chunks.
+
+Built by ingest.py next to the vector store and used by the RAG service
+for hybrid retrieval: lexical matches catch exact figures, tickers and
+quarter labels that dense embeddings blur, and the two rankings are merged
+with reciprocal-rank fusion.
+
+The index is a single .npz of flat NumPy arrays:
+    terms            sorted vocabulary
+    offsets          start of each term's postings (len(terms) + 1 entries)
+    postings_doc     document number of each posting
+    postings_tf      term frequency of each posting
+    doc_length       token count per document
+    ids              chunk ID per document
+    sources          distinct source names
+    doc_source       index into ``sources`` per document
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from vector_store import top_k
+
+BM25_K1: float = 1.2
+BM25_B: float = 0.75
+# Default k of reciprocal-rank fusion, 1 / (k + rank)
+RRF_K: int = 60
+# Numbers keep their thousands separators and decimals: "82,959", "1.5"
+TOKEN_PATTERN: re.Pattern = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase ``text`` and split it into word and number tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def index_path(store: str, directory: str = "db") -> str:
+    """Return where the BM25 index for vector store ``store`` is kept."""
+    return os.path.join(directory, f"bm25_{store}.npz")
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[str]], k: int = RRF_K
+) -> List[str]:
+    """
+    Merge several rankings of IDs into one with reciprocal-rank fusion.
+
+    Args:
+        rankings: Lists of IDs, each best first
+        k: Smoothing constant; larger values flatten the rank weights
+
+    Returns:
+        All IDs ordered by their summed 1 / (k + rank) score
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: -scores[item])
+
+
+class BM25Index:
+    """
+    BM25 ranking over an inverted index held in flat NumPy arrays.
+
+    Use ``build`` to create one from chunks and ``load`` to open a saved one.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.terms: np.ndarray = arrays["terms"]
+        self.offsets: np.ndarray = arrays["offsets"]
+        self.postings_doc: np.ndarray = arrays["postings_doc"]
+        self.postings_tf: np.ndarray = arrays["postings_tf"]
+        self.doc_length: np.ndarray = arrays["doc_length"]
+        self.ids: np.ndarray = arrays["ids"]
+        self.sources: np.ndarray = arrays["sources"]
+        self.doc_source: np.ndarray = arrays["doc_source"]
+        self.term_ids: Dict[str, int] = {term: i for i, term in enumerate(self.terms)}
+        self.avg_length: float = float(self.doc_length.mean()) if len(self) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, chunks: Iterable[Tuple[str, str, str]]) -> "BM25Index":
+        """
+        Index chunks given as (chunk ID, text, source) triples.
+        """
+        ids: List[str] = []
+        source_numbers: Dict[str, int] = {}
+        doc_source: List[int] = []
+        doc_length: List[int] = []
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, (chunk_id, text, source) in enumerate(chunks):
+            ids.append(chunk_id)
+            doc_source.append(source_numbers.setdefault(source, len(source_numbers)))
+            tokens: List[str] = tokenize(text)
+            doc_length.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        terms: List[str] = sorted(postings)
+        offsets: List[int] = [0]
+        for term in terms:
+            offsets.append(offsets[-1] + len(postings[term]))
+        flat: List[Tuple[int, int]] = [
+            item for term in terms for item in postings[term]
+        ]
+        return cls(
+            {
+                "terms": np.array(terms, dtype=str),
+                "offsets": np.array(offsets, dtype=np.int64),
+                "postings_doc": np.array([doc for doc, _ in flat], dtype=np.int32),
+                "postings_tf": np.array([tf for _, tf in flat], dtype=np.float32),
+                "doc_length": np.array(doc_length, dtype=np.float32),
+                "ids": np.array(ids, dtype=str),
+                "sources": np.array(list(source_numbers), dtype=str),
+                "doc_source": np.array(doc_source, dtype=np.int32),
+            }
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Open an index written by ``save``."""
+        with np.load(path) as arrays:
+            return cls({name: arrays[name] for name in arrays.files})
+
+    def save(self, path: str) -> None:
+        """Atomically write the index to ``path``."""
+        directory: str = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # np.savez appends .npz to names without it
+        tmp_path: str = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            terms=self.terms,
+            offsets=self.offsets,
+            postings_doc=self.postings_doc,
+            postings_tf=self.postings_tf,
+            doc_length=self.doc_length,
+            ids=self.ids,
+            sources=self.sources,
+            doc_source=self.doc_source,
+        )
+        os.replace(tmp_path, path)
+
+    def source_mask(self, sources: Set[str]) -> np.ndarray:
+        """Return a boolean mask of the documents that come from ``sources``."""
+        allowed: np.ndarray = np.array([source in sources for source in self.sources])
+        return allowed[self.doc_source]
+
+    def search(
+        self, query: str, k: int, mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank documents for ``query`` with BM25.
+
+        Args:
+            query: Query text
+            k: Maximum number of results
+            mask: Optional boolean mask of the documents allowed in results
+
+        Returns:
+            (chunk ID, score) pairs, best first; documents sharing no term
+            with the query are never returned
+        """
+        scores: np.ndarray = np.zeros(len(self), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id: Optional[int] = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs: np.ndarray = self.postings_doc[start:end]
+            tf: np.ndarray = self.postings_tf[start:end]
+            idf: float = float(
+                np.log(1 + (len(self) - len(docs) + 0.5) / (len(docs) + 0.5))
+            )
+            norm: np.ndarray = BM25_K1 * (
+                1 - BM25_B + BM25_B * self.doc_length[docs] / self.avg_length
+            )
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        if mask is not None:
+            scores[~mask] = 0.0
+        best: np.ndarray = top_k(scores, k)
+        return [(str(self.ids[i]), float(scores[i])) for i in best if scores[i] > 0]
@@ -0,0 +1,276 @@
+"""
+Pluggable chunking strategies for ingestion.
+
+Strategies:
+    recursive  LangChain's RecursiveCharacterTextSplitter, sized in characters
+               (the original behaviour)
+    sentence   Single-pass splitter that packs whole sentences into chunks of
+               a token budget, with sentence-aligned overlap
+    table      Like ``sentence``, but keeps runs of numeric table rows (as in
+               10-Q financial statements) together with their caption,
+               splitting large tables by rows and repeating the caption
+
+Every strategy splits page by page, so chunks keep their page metadata.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from embedding_batcher import token_counter
+
+DEFAULT_STRATEGY: str = "recursive"
+# Default (chunk_size, chunk_overlap); characters for recursive, tokens otherwise
+DEFAULT_SIZES: Dict[str, Tuple[int, int]] = {
+    "recursive": (500, 50),
+    "sentence": (128, 16),
+    "table": (128, 16),
+}
+TOKENIZER_MODEL: str = "text-embedding-3-large"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+(?=[\"'(\[A-Z0-9$])|\n\s*\n")
+_NUMBER = re.compile(r"\(?\$?\d[\d,]*(?:\.\d+)?\)?%?")
+_MIN_TABLE_ROWS: int = 3
+_MAX_CAPTION_LINES: int = 2
+
+
+class Chunker:
+    """Base class: split page Documents into chunk Documents."""
+
+    name: str = ""
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size: int = chunk_size
+        self.chunk_overlap: int = chunk_overlap
+
+    def split_text(self, text: str) -> List[Tuple[str, Dict[str, object]]]:
+        """Return (chunk text, extra metadata) pairs for one page of text."""
+        raise NotImplementedError
+
+    def split_documents(self, pages: List[Document]) -> List[Document]:
+        chunks: List[Document] = []
+        for page in pages:
+            for text, extra in self.split_text(page.page_content):
+                chunks.append(
+                    Document(page_content=text, metadata={**page.metadata, **extra})
+                )
+        return chunks
+
+
+class RecursiveChunker(Chunker):
+    """Character-based recursive splitting via LangChain."""
+
+    name = "recursive"
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        super().__init__(chunk_size, chunk_overlap)
+        self.splitter: RecursiveCharacterTextSplitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+
+    def split_text(self, text: str) -> List[Tuple[str, Dict[str, object]]]:
+        return [(chunk, {}) for chunk in self.splitter.split_text(text)]
+
+    def split_documents(self, pages: List[Document]) -> List[Document]:
+        return self.splitter.split_documents(pages)
+
+
+class SentenceChunker(Chunker):
+    """
+    Token-budgeted chunks made of whole sentences.
+
+    Sentences are found with one regex pass and counted with one batched
+    tokenizer call per page; chunks are then packed greedily. Consecutive
+    chunks share trailing sentences worth up to ``chunk_overlap`` tokens.
+    A sentence longer than the budget is cut at word boundaries.
+    """
+
+    name = "sentence"
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        super().__init__(chunk_size, chunk_overlap)
+        self.count_tokens: Callable[[List[str]], List[int]] = token_counter(
+            TOKENIZER_MODEL
+        )
+
+    def sentences(self, text: str) -> List[str]:
+        return [" ".join(s.split()) for s in _SENTENCE_END.split(text) if s.strip()]
+
+    def _cut_long(self, sentence: str, tokens: int) -> List[Tuple[str, int]]:
+        """Cut an over-long sentence into word-aligned pieces within budget."""
+        words: List[str] = sentence.split()
+        per_piece: int = max(1, len(words) * self.chunk_size // max(tokens, 1))
+        pieces: List[str] = [
+            " ".join(words[i : i + per_piece]) for i in range(0, len(words), per_piece)
+        ]
+        return list(zip(pieces, self.count_tokens(pieces)))
+
+    def pack(self, units: List[Tuple[str, int]]) -> List[str]:
+        """Greedily pack (text, token count) units into overlapping chunks."""
+        chunks: List[str] = []
+        current: List[Tuple[str, int]] = []
+        current_tokens: int = 0
+        for text, tokens in units:
+            if current and current_tokens + tokens > self.chunk_size:
+                chunks.append(" ".join(t for t, _ in current))
+                # Carry trailing units over as overlap
+                overlap: List[Tuple[str, int]] = []
+                overlap_tokens: int = 0
+                for unit in reversed(current):
+                    if overlap_tokens + unit[1] > self.chunk_overlap:
+                        break
+                    overlap.insert(0, unit)
+                    overlap_tokens += unit[1]
+                if overlap_tokens + tokens > self.chunk_size:
+                    overlap, overlap_tokens = [], 0
+                current, current_tokens = overlap, overlap_tokens
+            current.append((text, tokens))
+            current_tokens += tokens
+        if current:
+            chunks.append(" ".join(t for t, _ in current))
+        return chunks
+
+    def units(self, text: str) -> List[Tuple[str, int]]:
+        """Return the sentences of ``text`` with their token counts."""
+        sentences: List[str] = self.sentences(text)
+        units: List[Tuple[str, int]] = []
+        for sentence, tokens in zip(sentences, self.count_tokens(sentences)):
+            if tokens > self.chunk_size:
+                units.extend(self._cut_long(sentence, tokens))
+            else:
+                units.append((sentence, tokens))
+        return units
+
+    def split_text(self, text: str) -> List[Tuple[str, Dict[str, object]]]:
+        return [(chunk, {}) for chunk in self.pack(self.units(text))]
+
+
+def is_table_row(line: str) -> bool:
+    """Return True if ``line`` looks like a row of a financial table."""
+    return len(_NUMBER.findall(line)) >= 2 and len(line) < 300
+
+
+class TableChunker(SentenceChunker):
+    """
+    SentenceChunker that keeps financial tables intact.
+
+    A run of at least three table-looking lines, plus up to two caption
+    lines before it, becomes its own chunk (flagged ``table: True``). Tables
+    over the token budget are split by rows, repeating the caption.
+    """
+
+    name = "table"
+
+    def _blocks(self, text: str) -> List[Tuple[bool, List[str]]]:
+        """Group lines into alternating (is_table, lines) blocks."""
+        lines: List[str] = [line.strip() for line in text.splitlines()]
+        blocks: List[Tuple[bool, List[str]]] = []
+        i: int = 0
+        while i < len(lines):
+            j: int = i
+            while j < len(lines) and is_table_row(lines[j]):
+                j += 1
+            if j - i >= _MIN_TABLE_ROWS:
+                blocks.append((True, lines[i:j]))
+                i = j
+                continue
+            end: int = max(j, i + 1)
+            if blocks and not blocks[-1][0]:
+                blocks[-1][1].extend(lines[i:end])
+            else:
+                blocks.append((False, lines[i:end]))
+            i = end
+        return blocks
+
+    def _split_table(self, caption: List[str], rows: List[str]) -> List[str]:
+        header: str = "\n".join(caption)
+        header_tokens: int = self.count_tokens([header])[0] if header else 0
+        budget: int = max(self.chunk_size - header_tokens, 1)
+        pieces: List[str] = []
+        current: List[str] = []
+        current_tokens: int = 0
+        for row, tokens in zip(rows, self.count_tokens(rows)):
+            if current and current_tokens + tokens > budget:
+                pieces.append("\n".join(filter(None, [header, *current])))
+                current, current_tokens = [], 0
+            current.append(row)
+            current_tokens += tokens
+        if current:
+            pieces.append("\n".join(filter(None, [header, *current])))
+        return pieces
+
+    def split_text(self, text: str) -> List[Tuple[str, Dict[str, object]]]:
+        results: List[Tuple[str, Dict[str, object]]] = []
+        prose: List[str] = []
+        for is_table, lines in self._blocks(text):
+            if not is_table:
+                prose = lines
+                continue
+            # The last non-empty prose lines before a table are its caption
+            prose = [line for line in prose if line]
+            caption: List[str] = prose[-_MAX_CAPTION_LINES:]
+            body: List[str] = prose[: len(prose) - len(caption)]
+            results.extend(self._split_prose(body))
+            results.extend(
+                (chunk, {"table": True}) for chunk in self._split_table(caption, lines)
+            )
+            prose = []
+        results.extend(self._split_prose(prose))
+        return results
+
+    def _split_prose(self, lines: List[str]) -> List[Tuple[str, Dict[str, object]]]:
+        if not lines:
+            return []
+        return [(chunk, {}) for chunk in self.pack(self.units("\n".join(lines)))]
+
+
+CHUNKERS: Dict[str, Callable[[int, int], Chunker]] = {
+    "recursive": RecursiveChunker,
+    "sentence": SentenceChunker,
+    "table": TableChunker,
+}
+
+# One chunker per configuration per process
+_chunkers: Dict[Tuple[str, int, int], Chunker] = {}
+
+
+def get_chunker(
+    strategy: str = DEFAULT_STRATEGY,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+) -> Chunker:
+    """
+    Return a (cached) chunker for a strategy name.
+
+    Args:
+        strategy: One of ``CHUNKERS``
+        chunk_size: Chunk size, in the strategy's unit; defaults per strategy
+        chunk_overlap: Chunk overlap, in the strategy's unit
+
+    Returns:
+        The chunker
+    """
+    if strategy not in CHUNKERS:
+        raise ValueError(
+            f"Unknown chunking strategy {strategy!r}; choose from {sorted(CHUNKERS)}"
+        )
+    default_size, default_overlap = DEFAULT_SIZES[strategy]
+    key: Tuple[str, int, int] = (
+        strategy,
+        chunk_size if chunk_size is not None else default_size,
+        chunk_overlap if chunk_overlap is not None else default_overlap,
+    )
+    if key not in _chunkers:
+        _chunkers[key] = CHUNKERS[strategy](key[1], key[2])
+    return _chunkers[key]
+
+
+def chunker_config(chunker: Chunker) -> str:
+    """Return a string identifying a chunker's settings, for the manifest."""
+    return f"{chunker.name}:{chunker.chunk_size}:{chunker.chunk_overlap}"
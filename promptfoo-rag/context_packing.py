@@ -0,0 +1,230 @@
+"""
+Context assembly for the RAG prompt.
+
+Retrieved chunks overlap by construction (chunkers repeat the end of a
+chunk at the start of the next one) and consecutive quarterly filings
+repeat whole paragraphs, so joining the top-k chunks as they are wastes
+prompt tokens. ``ContextPacker.pack`` turns the ranked chunks into context
+blocks in three steps:
+
+1. Chunks contained in a block already kept are dropped, and so are near
+   duplicates: chunks whose words overlap a kept block by at least
+   ``NEAR_DUPLICATE_THRESHOLD`` (Jaccard) and that mention exactly the same
+   numbers. Boilerplate repeated across filings goes; the same sentence
+   with another quarter's figures stays.
+2. Chunks from the same page whose ends overlap are merged into one block,
+   with the shared text written once.
+3. Blocks are packed most relevant first into a token budget, skipping
+   blocks that no longer fit. A first block larger than the whole budget
+   is cut to size.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from embedding_batcher import token_counter
+
+# Default prompt token budget for the retrieved context
+CONTEXT_TOKEN_BUDGET: int = 1500
+NEAR_DUPLICATE_THRESHOLD: float = 0.9
+# Shortest shared text taken as an overlap between adjacent chunks
+MIN_OVERLAP_CHARS: int = 20
+CONTEXT_SEPARATOR: str = "\n\n"
+
+_WORD = re.compile(r"\w+")
+_NUMBER = re.compile(r"\d[\d,.]*")
+
+
+def overlap_length(left: str, right: str, minimum: int = MIN_OVERLAP_CHARS) -> int:
+    """
+    Return the length of the longest suffix of ``left`` that starts ``right``.
+
+    Overlaps shorter than ``minimum`` characters count as none.
+    """
+    if min(len(left), len(right)) < minimum:
+        return 0
+    probe: str = right[:minimum]
+    position: int = left.find(probe, max(0, len(left) - len(right)))
+    while position != -1:
+        if right.startswith(left[position:]):
+            return len(left) - position
+        position = left.find(probe, position + 1)
+    return 0
+
+
+@dataclass
+class ContextBlock:
+    """Consecutive text from one page, made of one or more retrieved chunks."""
+
+    text: str
+    chunk_ids: List[str]
+    source: Any
+    page: Any
+    words: Set[str] = field(default_factory=set)
+    numbers: Set[str] = field(default_factory=set)
+
+    def __post_init__(self) -> None:
+        self.index_text()
+
+    def index_text(self) -> None:
+        self.words = set(_WORD.findall(self.text.lower()))
+        self.numbers = set(_NUMBER.findall(self.text))
+
+
+@dataclass
+class PackedContext:
+    """Result of ``ContextPacker.pack``."""
+
+    text: str
+    # Chunks whose text (or a merged or cut version of it) is in ``text``
+    chunk_ids: List[str]
+    tokens: int
+    # Tokens of the chunks joined as retrieved
+    unpacked_tokens: int
+
+
+class ContextPacker:
+    """
+    De-duplicates, merges and budgets retrieved chunks; keeps running totals.
+
+    Args:
+        model: Chat model whose tokenizer measures the budget
+        budget: Default token budget per context
+        threshold: Word Jaccard similarity above which chunks with the same
+            numbers are near duplicates
+    """
+
+    def __init__(
+        self,
+        model: str,
+        budget: int = CONTEXT_TOKEN_BUDGET,
+        threshold: float = NEAR_DUPLICATE_THRESHOLD,
+    ):
+        self.count_tokens: Callable[[List[str]], List[int]] = token_counter(model)
+        self.budget: int = budget
+        self.threshold: float = threshold
+        self.calls: int = 0
+        self.chunks_in: int = 0
+        self.chunks_dropped: int = 0
+        self.chunks_merged: int = 0
+        self.tokens_in: int = 0
+        self.tokens_out: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    def _is_near_duplicate(self, block: ContextBlock, kept: ContextBlock) -> bool:
+        if block.numbers != kept.numbers:
+            return False
+        union: int = len(block.words | kept.words)
+        return union > 0 and len(block.words & kept.words) / union >= self.threshold
+
+    def blocks(
+        self, chunks: Sequence[Tuple[str, str, Dict[str, Any]]]
+    ) -> Tuple[List[ContextBlock], int, int]:
+        """
+        De-duplicate and merge ranked chunks into context blocks.
+
+        Args:
+            chunks: (chunk ID, text, metadata) triples, best first
+
+        Returns:
+            Blocks ordered by their best chunk, the number of chunks dropped
+            as duplicates and the number merged into another chunk's block
+        """
+        kept: List[ContextBlock] = []
+        dropped: int = 0
+        merged: int = 0
+        for chunk_id, text, metadata in chunks:
+            block = ContextBlock(
+                text, [chunk_id], metadata.get("source"), metadata.get("page")
+            )
+            if any(
+                text in other.text or self._is_near_duplicate(block, other)
+                for other in kept
+            ):
+                dropped += 1
+                continue
+            for other in kept:
+                if (other.source, other.page) != (block.source, block.page):
+                    continue
+                after: int = overlap_length(other.text, block.text)
+                before: int = 0 if after else overlap_length(block.text, other.text)
+                if other.text in block.text:
+                    other.text = block.text
+                elif after:
+                    other.text += block.text[after:]
+                elif before:
+                    other.text = block.text + other.text[before:]
+                else:
+                    continue
+                other.chunk_ids.append(chunk_id)
+                other.index_text()
+                merged += 1
+                break
+            else:
+                kept.append(block)
+        return kept, dropped, merged
+
+    def pack(
+        self,
+        chunks: Sequence[Tuple[str, str, Dict[str, Any]]],
+        budget: Optional[int] = None,
+    ) -> PackedContext:
+        """
+        Build the prompt context from ranked chunks.
+
+        Args:
+            chunks: (chunk ID, text, metadata) triples, best first
+            budget: Token budget; the packer's default if omitted
+
+        Returns:
+            The packed context and its token counts before and after packing
+        """
+        budget = self.budget if budget is None else budget
+        blocks, dropped, merged = self.blocks(chunks)
+        unpacked_tokens: int = sum(self.count_tokens([text for _, text, _ in chunks]))
+        lengths: List[int] = self.count_tokens([block.text for block in blocks])
+
+        texts: List[str] = []
+        chunk_ids: List[str] = []
+        tokens: int = 0
+        for block, length in zip(blocks, lengths):
+            if tokens + length > budget:
+                if texts:
+                    continue
+                # Even the best block alone is over budget: keep its start
+                words: List[str] = block.text.split(" ")
+                block.text = " ".join(words[: len(words) * budget // length])
+                length = self.count_tokens([block.text])[0]
+            texts.append(block.text)
+            chunk_ids.extend(block.chunk_ids)
+            tokens += length
+
+        with self._lock:
+            self.calls += 1
+            self.chunks_in += len(chunks)
+            self.chunks_dropped += dropped
+            self.chunks_merged += merged
+            self.tokens_in += unpacked_tokens
+            self.tokens_out += tokens
+        return PackedContext(
+            CONTEXT_SEPARATOR.join(texts), chunk_ids, tokens, unpacked_tokens
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return chunk and token totals and the share of tokens saved."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "chunks": self.chunks_in,
+                "duplicates_dropped": self.chunks_dropped,
+                "chunks_merged": self.chunks_merged,
+                "tokens_before": self.tokens_in,
+                "tokens_after": self.tokens_out,
+                "saved_rate": (
+                    1 - self.tokens_out / self.tokens_in if self.tokens_in else 0.0
+                ),
+            }
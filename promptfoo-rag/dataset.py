@@ -0,0 +1,71 @@
+"""
+Helpers for using the promptfoo test set (dataset.jsonl) offline.
+
+The string assertions of each test (``contains``, ``icontains`` and their
+``-all`` / ``-any`` variants) double as relevance labels: a retrieved chunk
+counts as relevant to a question if it contains one of the asserted values.
+Tests with only model-graded assertions carry no label and are skipped.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+DATASET_PATH: str = "dataset.jsonl"
+_STRING_ASSERTIONS = {
+    "contains",
+    "icontains",
+    "contains-all",
+    "icontains-all",
+    "contains-any",
+    "icontains-any",
+}
+
+
+@dataclass
+class LabeledQuestion:
+    """A dataset question with the strings a relevant chunk should contain."""
+
+    question: str
+    answers: List[str]
+    case_sensitive: List[bool]
+
+    def is_relevant(self, text: str) -> bool:
+        """Return True if ``text`` contains any of the labelled answers."""
+        lowered: str = text.lower()
+        return any(
+            answer in text if sensitive else answer.lower() in lowered
+            for answer, sensitive in zip(self.answers, self.case_sensitive)
+        )
+
+
+def load_questions(path: str = DATASET_PATH) -> List[str]:
+    """Return every question in the dataset, labelled or not."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line)["vars"]["question"] for line in f if line.strip()]
+
+
+def load_labeled_questions(path: str = DATASET_PATH) -> List[LabeledQuestion]:
+    """Return the questions that have string assertions, with their labels."""
+    labeled: List[LabeledQuestion] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            test: Dict[str, Any] = json.loads(line)
+            answers: List[str] = []
+            sensitive: List[bool] = []
+            for assertion in test.get("assert", []):
+                if assertion.get("type") not in _STRING_ASSERTIONS:
+                    continue
+                values = assertion["value"]
+                values = values if isinstance(values, list) else [values]
+                answers.extend(str(value) for value in values)
+                sensitive.extend([not assertion["type"].startswith("i")] * len(values))
+            if answers:
+                labeled.append(
+                    LabeledQuestion(test["vars"]["question"], answers, sensitive)
+                )
+    return labeled
@@ -0,0 +1,288 @@
+"""
+Rate-limit-aware batched embedding.
+
+``BatchedEmbeddings`` wraps an Embeddings model and packs texts into
+requests by token count rather than document count, keeps several requests
+in flight at once, and adapts how many it allows to the provider's rate
+limit: every 429 halves the in-flight limit and pauses new requests for the
+server's Retry-After (or an exponential backoff with jitter), while a run of
+successes raises it again one step at a time. Other transient failures
+(408, 409, 5xx, connection errors and timeouts) are retried with the same
+backoff but leave the limit alone.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken ships with langchain-openai
+    tiktoken = None
+
+try:
+    import openai
+except ImportError:  # pragma: no cover - openai ships with langchain-openai
+    openai = None
+
+MAX_BATCH_TOKENS: int = 20_000
+MAX_BATCH_INPUTS: int = 2048
+INITIAL_CONCURRENCY: int = 4
+MAX_CONCURRENCY: int = 32
+MAX_RETRIES: int = 8
+BACKOFF_BASE: float = 1.0
+BACKOFF_MAX: float = 60.0
+
+
+def token_counter(model: str) -> Callable[[List[str]], List[int]]:
+    """
+    Return a function counting tokens per text for ``model``.
+
+    Falls back to a four-characters-per-token estimate if tiktoken or its
+    encoding files are unavailable (e.g. offline).
+    """
+    estimate: Callable[[List[str]], List[int]] = lambda texts: [
+        len(text) // 4 + 1 for text in texts
+    ]
+    if tiktoken is None:
+        return estimate
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logging.warning(f"Could not load tokenizer, estimating token counts: {str(e)}")
+        return estimate
+    return lambda texts: [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+def pack_batches(
+    token_counts: List[int], max_tokens: int, max_inputs: int
+) -> List[List[int]]:
+    """
+    Group text indices into batches of at most ``max_tokens`` tokens.
+
+    Texts keep their order; a single text larger than ``max_tokens`` gets a
+    batch of its own.
+
+    Args:
+        token_counts: Token count of each text
+        max_tokens: Token budget per batch
+        max_inputs: Maximum number of texts per batch
+
+    Returns:
+        List of batches, each a list of indices into ``token_counts``
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens: int = 0
+    for i, count in enumerate(token_counts):
+        if current and (
+            current_tokens + count > max_tokens or len(current) >= max_inputs
+        ):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += count
+    if current:
+        batches.append(current)
+    return batches
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Return True if ``error`` is an HTTP 429 from the provider."""
+    return getattr(error, "status_code", None) == 429
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Return True if ``error`` is worth retrying.
+
+    That is a 429, 408, 409 or any 5xx from the provider, or a connection
+    error or timeout (``openai.APITimeoutError`` is an APIConnectionError).
+    """
+    if openai is not None and isinstance(error, openai.APIConnectionError):
+        return True
+    status: Optional[int] = getattr(error, "status_code", None)
+    return status is not None and (status in (408, 409, 429) or status >= 500)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Return the Retry-After delay the provider sent with ``error``, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value: Optional[str] = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    Additive-increase / multiplicative-decrease limit on in-flight requests.
+
+    Args:
+        initial: Starting limit
+        maximum: Upper bound for the limit
+    """
+
+    def __init__(self, initial: int = INITIAL_CONCURRENCY, maximum: int = MAX_CONCURRENCY):
+        self.limit: int = min(initial, maximum)
+        self.maximum: int = maximum
+        self.in_flight: int = 0
+        self.paused_until: float = 0.0
+        self._successes: int = 0
+        self._cond: threading.Condition = threading.Condition()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        with self._cond:
+            while True:
+                wait: float = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, rate_limited: bool = False, pause: float = 0.0) -> None:
+        """Report the outcome of a request and free its slot."""
+        with self._cond:
+            self.in_flight -= 1
+            if rate_limited:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that packs, parallelises and rate-limits requests.
+
+    The underlying model should have its own retries disabled: transient
+    failures are retried here, and only 429s reach the adaptive limiter.
+
+    Args:
+        underlying: Embedding model to call
+        model: Model name, used to pick the tokenizer
+        max_batch_tokens: Token budget per request
+        max_batch_inputs: Maximum texts per request
+        initial_concurrency: Starting number of requests in flight
+        max_concurrency: Upper bound on requests in flight
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model: str,
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+        max_batch_inputs: int = MAX_BATCH_INPUTS,
+        initial_concurrency: int = INITIAL_CONCURRENCY,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ):
+        self.underlying: Embeddings = underlying
+        self.count_tokens: Callable[[List[str]], List[int]] = token_counter(model)
+        self.max_batch_tokens: int = max_batch_tokens
+        self.max_batch_inputs: int = max_batch_inputs
+        self.limiter: AdaptiveLimiter = AdaptiveLimiter(initial_concurrency, max_concurrency)
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="embed"
+        )
+        self._stats_lock: threading.Lock = threading.Lock()
+        self.tokens: int = 0
+        self.requests: int = 0
+        self.rate_limited: int = 0
+        self.retried: int = 0
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def _embed_batch(self, texts: List[str], tokens: int) -> List[List[float]]:
+        for attempt in range(MAX_RETRIES + 1):
+            self.limiter.acquire()
+            try:
+                vectors: List[List[float]] = self.underlying.embed_documents(texts)
+            except Exception as e:
+                if not is_transient(e) or attempt == MAX_RETRIES:
+                    self.limiter.release()
+                    raise
+                delay: float = retry_after(e) or min(
+                    BACKOFF_MAX, BACKOFF_BASE * 2**attempt
+                )
+                delay *= random.uniform(1.0, 1.5)
+                if is_rate_limited(e):
+                    with self._stats_lock:
+                        self.rate_limited += 1
+                    self.limiter.release(rate_limited=True, pause=delay)
+                    logging.debug(
+                        f"Embedding rate limited; retrying in {delay:.1f}s "
+                        f"with concurrency {self.limiter.limit}"
+                    )
+                else:
+                    with self._stats_lock:
+                        self.retried += 1
+                    # Not a quota problem: keep the limit, back off this request only
+                    self.limiter.release()
+                    logging.warning(
+                        f"Embedding request failed ({str(e)}); retrying in {delay:.1f}s"
+                    )
+                    time.sleep(delay)
+                continue
+            self.limiter.release()
+            with self._stats_lock:
+                self.tokens += tokens
+                self.requests += 1
+                self.finished = time.perf_counter()
+            return vectors
+        raise RuntimeError("unreachable")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        with self._stats_lock:
+            if self.started is None:
+                self.started = time.perf_counter()
+        counts: List[int] = self.count_tokens(texts)
+        futures: List[Future] = [
+            self._executor.submit(
+                self._embed_batch,
+                [texts[i] for i in batch],
+                sum(counts[i] for i in batch),
+            )
+            for batch in pack_batches(counts, self.max_batch_tokens, self.max_batch_inputs)
+        ]
+        results: List[List[float]] = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    @property
+    def tokens_per_second(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        elapsed: float = self.finished - self.started
+        return self.tokens / elapsed if elapsed > 0 else 0.0
+
+    def report(self) -> str:
+        """Return a one-line summary of achieved embedding throughput."""
+        return (
+            f"{self.tokens} tokens in {self.requests} requests, "
+            f"{self.tokens_per_second:.0f} tokens/sec, {self.rate_limited} rate-limited, "
+            f"{self.retried} retried, "
+            f"final concurrency {self.limiter.limit}"
+        )
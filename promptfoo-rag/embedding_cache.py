@@ -0,0 +1,309 @@
+"""
+Persistent on-disk embedding cache shared by ingest.py and retrieve.py.
+
+Vectors are stored as a float32 matrix in a memory-mapped file, one row per
+cached text, alongside a JSON index that maps a key derived from
+(model name, text hash) to its row. The cache is capped in size and evicts
+the least recently used rows once full.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+EMBEDDING_CACHE_DIR: str = os.getenv("EMBEDDING_CACHE_DIR", ".embedding_cache")
+EMBEDDING_CACHE_MAX_MB: int = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))
+INDEX_VERSION: int = 1
+_MIN_CAPACITY: int = 1024
+
+
+def cache_key(model: str, text: str) -> str:
+    """Return the cache key for ``text`` embedded with ``model``."""
+    hasher = hashlib.sha256(model.encode("utf-8"))
+    hasher.update(b"\0")
+    hasher.update(text.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+class _FileLock:
+    """Advisory inter-process lock so concurrent promptfoo workers share one cache."""
+
+    def __init__(self, path: str):
+        self.path: str = path
+
+    def __enter__(self) -> "_FileLock":
+        self._file = open(self.path, "a+")
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+class EmbeddingCache:
+    """
+    Size-capped LRU cache of embedding vectors backed by a memory-mapped matrix.
+
+    Files under ``directory``:
+        vectors.f32  float32 matrix of shape (capacity, dim)
+        index.json   {"dim", "capacity", "tick", "entries": {key: [row, last_used]}}
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory: str = directory
+        self.max_bytes: int = max_bytes
+        self.index_path: str = os.path.join(directory, "index.json")
+        self.vectors_path: str = os.path.join(directory, "vectors.f32")
+        self._lock: threading.Lock = threading.Lock()
+        self._file_lock: _FileLock = _FileLock(os.path.join(directory, ".lock"))
+        self._index_mtime: float = -1.0
+        self._dirty: bool = False
+        self.dim: Optional[int] = None
+        self.capacity: int = 0
+        self.tick: int = 0
+        self.entries: Dict[str, List[int]] = {}
+        self._vectors: Optional[np.memmap] = None
+        os.makedirs(directory, exist_ok=True)
+        with self._file_lock:
+            self._reload()
+        atexit.register(self.close)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _reload(self) -> None:
+        """Re-read the index if another process has written it since we last did."""
+        try:
+            mtime: float = os.path.getmtime(self.index_path)
+        except FileNotFoundError:
+            return
+        if mtime == self._index_mtime:
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            logging.warning(
+                f"Ignoring embedding cache with unknown version in {self.directory}"
+            )
+            return
+        self.dim = data["dim"]
+        self.capacity = data["capacity"]
+        self.tick = max(self.tick, data["tick"])
+        # Keep any more recent in-memory access times
+        for key, (row, last_used) in data["entries"].items():
+            current = self.entries.get(key)
+            if current is not None and current[0] == row:
+                last_used = max(last_used, current[1])
+            data["entries"][key] = [row, last_used]
+        self.entries = data["entries"]
+        self._index_mtime = mtime
+        self._vectors = None
+
+    def _save(self) -> None:
+        tmp_path: str = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "dim": self.dim,
+                    "capacity": self.capacity,
+                    "tick": self.tick,
+                    "entries": self.entries,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.index_path)
+        self._index_mtime = os.path.getmtime(self.index_path)
+        self._dirty = False
+
+    def _matrix(self) -> np.memmap:
+        if self._vectors is None or self._vectors.shape[0] != self.capacity:
+            self._vectors = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r+",
+                shape=(self.capacity, self.dim),
+            )
+        return self._vectors
+
+    def _max_rows(self) -> int:
+        return max(1, self.max_bytes // (4 * self.dim))
+
+    def _grow(self, needed: int) -> None:
+        """Extend the matrix file so it can hold ``needed`` rows, up to the size cap."""
+        target: int = min(
+            self._max_rows(), max(needed, 2 * self.capacity, _MIN_CAPACITY)
+        )
+        if target <= self.capacity:
+            return
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(target * self.dim * 4)
+        self.capacity = target
+        self._vectors = None
+
+    def _allocate_rows(self, count: int) -> List[int]:
+        """Return ``count`` free row numbers, evicting least recently used entries if needed."""
+        self._grow(len(self.entries) + count)
+        used = {row for row, _ in self.entries.values()}
+        free: List[int] = [row for row in range(self.capacity) if row not in used][
+            :count
+        ]
+        if len(free) < count:
+            victims = sorted(self.entries.items(), key=lambda item: item[1][1])
+            for key, (row, _) in victims[: count - len(free)]:
+                del self.entries[key]
+                free.append(row)
+        return free
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return the cached vector for each key, or None where it is missing."""
+        # The file lock keeps another process from reusing a row between reload and read
+        with self._lock, self._file_lock:
+            self._reload()
+            if self.dim is None or not self.entries:
+                return [None] * len(keys)
+            matrix: np.memmap = self._matrix()
+            results: List[Optional[np.ndarray]] = []
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is None:
+                    results.append(None)
+                    continue
+                self.tick += 1
+                entry[1] = self.tick
+                self._dirty = True
+                results.append(np.array(matrix[entry[0]]))
+            return results
+
+    def put_many(self, items: Sequence[Tuple[str, Sequence[float]]]) -> None:
+        """Store vectors under their keys, evicting old entries if the cache is full."""
+        if not items:
+            return
+        with self._lock, self._file_lock:
+            self._reload()
+            if self.dim is None:
+                self.dim = len(items[0][1])
+            new_items = [
+                (key, vector) for key, vector in items if key not in self.entries
+            ]
+            new_items = new_items[-self._max_rows() :]
+            if new_items:
+                rows: List[int] = self._allocate_rows(len(new_items))
+                matrix: np.memmap = self._matrix()
+                for row, (key, vector) in zip(rows, new_items):
+                    matrix[row] = np.asarray(vector, dtype=np.float32)
+                    self.tick += 1
+                    self.entries[key] = [row, self.tick]
+                matrix.flush()
+                self._save()
+
+    def close(self) -> None:
+        """Persist recency updates from reads."""
+        if not self._dirty:
+            return
+        try:
+            with self._lock, self._file_lock:
+                self._reload()
+                self._save()
+        except OSError as e:
+            logging.warning(f"Could not persist embedding cache index: {str(e)}")
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from an EmbeddingCache.
+
+    Only texts that miss the cache are sent to the underlying model, in a
+    single ``embed_documents`` call per request.
+    """
+
+    def __init__(self, underlying: Embeddings, model: str, cache: EmbeddingCache):
+        self.underlying: Embeddings = underlying
+        self.model: str = model
+        self.cache: EmbeddingCache = cache
+        self.hits: int = 0
+        self.misses: int = 0
+        self._stats_lock: threading.Lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys: List[str] = [cache_key(self.model, text) for text in texts]
+        cached: List[Optional[np.ndarray]] = self.cache.get_many(keys)
+        missing: List[int] = [i for i, vector in enumerate(cached) if vector is None]
+        with self._stats_lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        results: List[List[float]] = [
+            vector.tolist() if vector is not None else [] for vector in cached
+        ]
+        if missing:
+            # Embed each distinct missing text once
+            unique: Dict[str, int] = {}
+            for i in missing:
+                unique.setdefault(keys[i], i)
+            fresh: List[List[float]] = self.underlying.embed_documents(
+                [texts[i] for i in unique.values()]
+            )
+            by_key: Dict[str, List[float]] = dict(zip(unique.keys(), fresh))
+            self.cache.put_many(list(by_key.items()))
+            for i in missing:
+                results[i] = by_key[keys[i]]
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class EmbeddingCacheMiss(LookupError):
+    """Raised by ``OfflineEmbeddings`` for texts missing from the cache."""
+
+
+class OfflineEmbeddings(Embeddings):
+    """
+    Stand-in model for running from the cache alone, without API calls.
+
+    Wrapped by ``cached_embeddings``, every cache miss raises
+    ``EmbeddingCacheMiss`` instead of calling the embeddings API.
+    """
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise EmbeddingCacheMiss(
+            f"{len(texts)} texts are not in the embedding cache, e.g. {texts[0][:80]!r}"
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def cached_embeddings(
+    underlying: Embeddings,
+    model: str,
+    directory: str = EMBEDDING_CACHE_DIR,
+    max_mb: int = EMBEDDING_CACHE_MAX_MB,
+) -> CachedEmbeddings:
+    """
+    Wrap ``underlying`` with the shared on-disk cache for ``model``.
+
+    Each model gets its own sub-directory, since vector dimensions differ.
+    """
+    model_dir: str = os.path.join(directory, model.replace("/", "_"))
+    return CachedEmbeddings(
+        underlying, model, EmbeddingCache(model_dir, max_mb * 1024 * 1024)
+    )
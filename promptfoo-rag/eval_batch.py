@@ -0,0 +1,92 @@
+"""
+Run every question in dataset.jsonl through the RAG provider and report throughput.
+
+Questions go through the batch API (``call_api_batch``) in batches of
+``--batch-size``: one embeddings request and one k-NN query per batch, with
+up to ``--concurrency`` generation requests in flight. ``--sequential``
+runs them one ``call_api`` at a time instead, for comparison. Requests go to
+the rag_service.py worker unless RAG_SERVICE=inprocess is set.
+
+Usage:
+    python eval_batch.py [--batch-size 64] [--concurrency 8] [--output answers.jsonl]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import retrieve
+from dataset import DATASET_PATH, load_questions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--vector-store", choices=["chroma", "numpy"])
+    parser.add_argument("--sequential", action="store_true")
+    parser.add_argument("--output", help="Write question/result pairs as JSONL")
+    args = parser.parse_args()
+
+    questions: List[str] = load_questions(args.dataset)
+    config: Dict[str, Any] = {"topK": args.top_k}
+    if args.vector_store:
+        config["vectorStore"] = args.vector_store
+    options: Dict[str, Any] = {"config": config}
+
+    started: float = time.perf_counter()
+    results: List[Dict[str, str]] = []
+    if args.sequential:
+        for question in questions:
+            try:
+                results.append(retrieve.call_api(question, options, {}))
+            except Exception as e:
+                results.append({"error": str(e)})
+    else:
+        for i in range(0, len(questions), args.batch_size):
+            results.extend(
+                retrieve.call_api_batch(
+                    questions[i : i + args.batch_size], options, args.concurrency
+                )
+            )
+    elapsed: float = time.perf_counter() - started
+
+    errors: int = sum("error" in result for result in results)
+    mode: str = (
+        "sequential"
+        if args.sequential
+        else f"batch={args.batch_size} concurrency={args.concurrency}"
+    )
+    print(
+        f"{mode}: {len(questions)} questions in {elapsed:.2f}s "
+        f"({len(questions) / elapsed:.2f} questions/sec), {errors} errors"
+    )
+    stats: Dict[str, Any] = retrieve.service_stats()
+    context: Dict[str, Any] = stats["context"]
+    if context["calls"]:
+        print(
+            f"context: {context['tokens_before'] / context['calls']:.0f} -> "
+            f"{context['tokens_after'] / context['calls']:.0f} tokens per call "
+            f"({context['saved_rate']:.1%} saved, "
+            f"{context['duplicates_dropped']} duplicate and "
+            f"{context['chunks_merged']} merged chunks)"
+        )
+    cache: Dict[str, Any] = stats["answer_cache"]
+    print(
+        f"answer cache: {cache['hit_rate']:.1%} hit rate "
+        f"({cache['exact_hits']} exact, {cache['semantic_hits']} semantic, "
+        f"{cache['misses']} misses), {cache['saved_seconds']:.1f}s generation saved"
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for question, result in zip(questions, results):
+                f.write(json.dumps({"question": question, **result}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
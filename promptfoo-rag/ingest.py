@@ -1,24 +1,52 @@
 """
 PDF document ingestion script for RAG implementation.
-Loads PDF files from a remote source in parallel, splits them into chunks,
-and stores them in a Chroma vector database.
+Loads PDF files from a remote source (or a local directory, glob or URL
+list), splits them into chunks, and stores them in a Chroma vector database
+or, with ``--vector-store numpy``, in the lightweight NumpyVectorStore.
+
+Ingestion runs as a streaming pipeline of stages (fetch, parse, split, embed,
+write) connected by bounded queues, each with its own concurrency, so memory
+stays flat regardless of corpus size and all stages overlap.
+
+Ingestion is incremental: a manifest next to the vector store records a
+content hash per PDF and per chunk, so re-runs only embed what changed.
+After any change a BM25 inverted index over all stored chunks is rebuilt
+for hybrid retrieval.
 """
 
 from __future__ import annotations
 
+import argparse
 import logging
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, List, Optional, Tuple
-from urllib.parse import quote
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 from langchain.docstore.document import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_openai import OpenAIEmbeddings
 from tqdm import tqdm
 
+from embedding_batcher import MAX_BATCH_INPUTS, BatchedEmbeddings
+from bm25_index import BM25Index, index_path
+from chunking import CHUNKERS, DEFAULT_STRATEGY, Chunker, chunker_config, get_chunker
+from embedding_cache import CachedEmbeddings, cached_embeddings
+from manifest import IngestManifest, assign_chunk_ids, content_digest
+from parsing import chunk_metadata, parse_and_split_packed, parse_pdf, unpack_chunks
+from pipeline import Pipeline, Stage
+from sources import (
+    BlobCache,
+    GlobSource,
+    LocalDirectorySource,
+    PdfSource,
+    UrlListSource,
+    create_session,
+)
+from vector_store import VECTOR_STORE_PATH, NumpyVectorStore
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -30,10 +58,23 @@ if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY environment variable is not set")
 
 CHROMA_PATH: str = "db"
+COLLECTION_NAME: str = "rag_collection"
+MANIFEST_PATH: str = os.path.join(CHROMA_PATH, "ingest_manifest.json")
+# The numpy store keeps its own manifest, as it is ingested separately
+NUMPY_MANIFEST_PATH: str = os.path.join(CHROMA_PATH, "vectors_manifest.json")
 BASE_URL: str = "https://storage.googleapis.com/promptfoo-public-1/examples/rag-sec/"
-CHUNK_SIZE: int = 500
-CHUNK_OVERLAP: int = 50
-MAX_WORKERS: int = 5
+CHUNKING_STRATEGY: str = DEFAULT_STRATEGY
+# Chunks per Chroma upsert; writes are buffered across files up to this size
+WRITE_BATCH_SIZE: int = 4000
+QUEUE_SIZE: int = 8
+# Per-stage concurrency
+FETCH_WORKERS: int = 8
+PARSE_WORKERS: int = 2
+SPLIT_WORKERS: int = 2
+# Size of the process pool used by the "process" parse mode
+PROCESS_WORKERS: int = os.cpu_count() or 1
+EMBED_WORKERS: int = 4
+WRITE_WORKERS: int = 1
 OPENAI_AI_EMBEDDING_MODEL: str = "text-embedding-3-large"
 
 # List of PDF files to process
@@ -61,105 +102,434 @@ PDF_FILES: List[str] = [
 ]
 
 
-def process_single_pdf(pdf_file: str) -> Tuple[str, List[Document]]:
-    """
-    Process a single PDF file and return its chunks.
+@dataclass
+class PdfWork:
+    """A source file moving through the ingestion pipeline."""
 
-    Args:
-        pdf_file: Name of the PDF file to process
+    source: str
+    digest: str = ""
+    data: Optional[bytes] = None
+    pages: Optional[List[Document]] = None
+    chunks: Optional[List[Document]] = None
+    chunk_ids: List[str] = field(default_factory=list)
+    stale_ids: List[str] = field(default_factory=list)
+    pending: List[Tuple[str, Document]] = field(default_factory=list)
+    vectors: Optional[np.ndarray] = None
 
-    Returns:
-        Tuple containing filename and list of document chunks
-    """
-    doc_url: str = BASE_URL + quote(pdf_file)
-    try:
-        loader: PyPDFLoader = PyPDFLoader(doc_url)
-        pages: List[Document] = loader.load()
-        text_splitter: RecursiveCharacterTextSplitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
-        )
-        chunks: List[Document] = text_splitter.split_documents(pages)
-        return pdf_file, chunks
-    except Exception as e:
-        logging.error(f"Error processing {pdf_file}: {str(e)}")
-        return pdf_file, []
+    def __str__(self) -> str:
+        return self.source
 
 
-def process_pdfs() -> List[Document]:
+class PdfIngestor:
     """
-    Process PDF files from the remote source in parallel and split them into chunks.
+    Stage functions of the ingestion pipeline.
 
-    Returns:
-        List of document chunks
-    """
-    all_chunks: List[Document] = []
-
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # Submit all PDF processing tasks
-        future_to_pdf: Dict[
-            concurrent.futures.Future[Tuple[str, List[Document]]], str
-        ] = {
-            executor.submit(process_single_pdf, pdf_file): pdf_file
-            for pdf_file in PDF_FILES
-        }
-
-        # Process completed tasks with progress bar
-        with tqdm(total=len(PDF_FILES), desc="Processing PDFs") as pbar:
-            for future in as_completed(future_to_pdf):
-                pdf_file: str = future_to_pdf[future]
-                try:
-                    _, chunks = future.result()
-                    all_chunks.extend(chunks)
-                    pbar.update(1)
-                except Exception as e:
-                    logging.error(f"Failed to process {pdf_file}: {str(e)}")
-                    pbar.update(1)
-
-    logging.info(f"Processed {len(all_chunks)} chunks from {len(PDF_FILES)} files")
-    return all_chunks
-
-
-def create_vector_store(chunks: List[Document], batch_size: int = 100) -> None:
-    """
-    Create and persist the vector store from document chunks in batches.
+    Each stage takes a PdfWork, fills in its own fields, drops the ones later
+    stages no longer need, and yields it on (or yields nothing to skip it).
 
     Args:
-        chunks: List of document chunks to embed
-        batch_size: Number of documents to process in each batch
+        pdf_source: Where the PDF files come from
+        manifest: Manifest of previously ingested files
+        db: Vector store to write to
+        embeddings: Embedding model used for new chunks
+        chunker: Chunking strategy; the default strategy if omitted
+        write_batch_size: Number of chunks per bulk upsert
+        processes: If given, parsing and splitting run as a single stage in
+            a process pool of this size instead of on the parse/split threads
     """
-    embeddings: OpenAIEmbeddings = OpenAIEmbeddings(
-        model=OPENAI_AI_EMBEDDING_MODEL, openai_api_key=OPENAI_API_KEY
-    )
 
-    logging.info("Creating vector store...")
+    def __init__(
+        self,
+        pdf_source: PdfSource,
+        manifest: IngestManifest,
+        db: Union[Chroma, NumpyVectorStore],
+        embeddings: CachedEmbeddings,
+        chunker: Optional[Chunker] = None,
+        write_batch_size: int = WRITE_BATCH_SIZE,
+        processes: Optional[int] = None,
+    ):
+        self.pdf_source: PdfSource = pdf_source
+        self.manifest: IngestManifest = manifest
+        self.db: Union[Chroma, NumpyVectorStore] = db
+        self.embeddings: CachedEmbeddings = embeddings
+        self.chunker: Chunker = chunker or get_chunker(CHUNKING_STRATEGY)
+        self.chunker_config: str = chunker_config(self.chunker)
+        self.write_batch_size: int = write_batch_size
+        self.processes: Optional[int] = processes
+        self.parse_pool: Optional[ProcessPoolExecutor] = None
+        self.unchanged: int = 0
+        self.skipped_chunks: int = 0
+        self.written: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._write_buffer: List[PdfWork] = []
+        self._buffered_chunks: int = 0
+        self._progress: tqdm = tqdm(total=0, desc="Ingesting PDFs")
 
-    # Process first batch
-    current_batch: List[Document] = chunks[:batch_size]
-    db: Chroma = Chroma.from_documents(
-        current_batch,
-        embeddings,
-        persist_directory=CHROMA_PATH,
-        collection_name="rag_collection",
+    def fetch(self, work: PdfWork) -> Iterator[PdfWork]:
+        """Fetch a file and skip it if its hash matches the manifest."""
+        work.data = self.pdf_source.fetch(work.source)
+        work.digest = content_digest(work.data)
+        if self.manifest.is_unchanged(work.source, work.digest, self.chunker_config):
+            with self._lock:
+                self.unchanged += 1
+            self._progress.update(1)
+            return
+        yield work
+
+    def parse(self, work: PdfWork) -> Iterator[PdfWork]:
+        """Extract one Document per PDF page."""
+        work.pages = parse_pdf(work.data, self.pdf_source.location(work.source))
+        work.data = None
+        yield work
+
+    def split(self, work: PdfWork) -> Iterator[PdfWork]:
+        """Split pages into chunks and assign their stable IDs."""
+        work.chunks = self.chunker.split_documents(work.pages)
+        work.pages = None
+        doc_url: str = self.pdf_source.location(work.source)
+        for chunk in work.chunks:
+            # As unpack_chunks does, so --parse-mode does not change the index
+            chunk.metadata = chunk_metadata(doc_url, chunk.metadata)
+        work.chunk_ids = assign_chunk_ids(work.source, work.chunks)
+        yield work
+
+    def parse_and_split(self, work: PdfWork) -> Iterator[PdfWork]:
+        """Parse and split in the process pool, receiving compact chunks back."""
+        doc_url: str = self.pdf_source.location(work.source)
+        packed = self.parse_pool.submit(
+            parse_and_split_packed,
+            work.data,
+            doc_url,
+            self.chunker.name,
+            self.chunker.chunk_size,
+            self.chunker.chunk_overlap,
+        ).result()
+        work.data = None
+        work.chunks = unpack_chunks(packed, doc_url)
+        work.chunk_ids = assign_chunk_ids(work.source, work.chunks)
+        yield work
+
+    def embed(self, work: PdfWork) -> Iterator[PdfWork]:
+        """Embed the chunks that are not already stored under the same ID."""
+        old_ids = set(self.manifest.chunk_ids(work.source))
+        work.stale_ids = sorted(old_ids.difference(work.chunk_ids))
+        work.pending = [
+            (chunk_id, chunk)
+            for chunk_id, chunk in zip(work.chunk_ids, work.chunks)
+            if chunk_id not in old_ids
+        ]
+        with self._lock:
+            self.skipped_chunks += len(work.chunks) - len(work.pending)
+        work.chunks = None
+        # The embedding model packs these into token-sized concurrent requests
+        work.vectors = np.asarray(
+            self.embeddings.embed_documents(
+                [chunk.page_content for _, chunk in work.pending]
+            ),
+            dtype=np.float32,
+        )
+        yield work
+
+    def write(self, work: PdfWork) -> List[PdfWork]:
+        """Delete stale chunks and buffer new ones for the next bulk upsert."""
+        if work.stale_ids:
+            self.db.delete(ids=work.stale_ids)
+        with self._lock:
+            self._write_buffer.append(work)
+            self._buffered_chunks += len(work.pending)
+            full: bool = self._buffered_chunks >= self.write_batch_size
+        if full:
+            self.flush()
+        return []
+
+    def flush(self) -> None:
+        """Upsert all buffered chunks and record their files in the manifest."""
+        with self._lock:
+            buffered: List[PdfWork] = self._write_buffer
+            self._write_buffer = []
+            self._buffered_chunks = 0
+        pending: List[Tuple[str, Document]] = [
+            item for work in buffered for item in work.pending
+        ]
+        if pending:
+            vectors: np.ndarray = np.concatenate(
+                [work.vectors for work in buffered if len(work.pending)]
+            )
+            # NumpyVectorStore.upsert mirrors the Chroma collection's signature
+            collection = (
+                self.db
+                if isinstance(self.db, NumpyVectorStore)
+                else self.db._collection
+            )
+            for i in range(0, len(pending), self.write_batch_size):
+                batch: List[Tuple[str, Document]] = pending[
+                    i : i + self.write_batch_size
+                ]
+                collection.upsert(
+                    ids=[chunk_id for chunk_id, _ in batch],
+                    embeddings=vectors[i : i + self.write_batch_size],
+                    documents=[chunk.page_content for _, chunk in batch],
+                    metadatas=[chunk.metadata for _, chunk in batch],
+                )
+        with self._lock:
+            for work in buffered:
+                self.manifest.update(
+                    work.source, work.digest, work.chunk_ids, self.chunker_config
+                )
+            self.written += len(buffered)
+        self._progress.update(len(buffered))
+
+    def stages(self) -> List[Stage]:
+        """Return the pipeline stages with their configured concurrency."""
+        if self.processes:
+            parse_stages: List[Stage] = [
+                # One thread per pool process keeps every process busy
+                Stage(
+                    "parse",
+                    self.parse_and_split,
+                    self.processes,
+                    unit=lambda work: len(work.data) / 1e6,
+                    unit_name="MB",
+                )
+            ]
+        else:
+            parse_stages = [
+                Stage(
+                    "parse",
+                    self.parse,
+                    PARSE_WORKERS,
+                    unit=lambda work: len(work.data) / 1e6,
+                    unit_name="MB",
+                ),
+                Stage(
+                    "split",
+                    self.split,
+                    SPLIT_WORKERS,
+                    unit=lambda work: len(work.pages),
+                    unit_name="pages",
+                ),
+            ]
+        return [
+            Stage("fetch", self.fetch, FETCH_WORKERS),
+            *parse_stages,
+            Stage(
+                "embed",
+                self.embed,
+                EMBED_WORKERS,
+                unit=lambda work: len(work.chunks),
+                unit_name="chunks",
+            ),
+            Stage(
+                "write",
+                self.write,
+                WRITE_WORKERS,
+                unit=lambda work: len(work.pending),
+                unit_name="chunks",
+            ),
+        ]
+
+    def run(self, sources: List[str]) -> Pipeline:
+        """Ingest ``sources`` and return the finished pipeline for reporting."""
+        self._progress.reset(total=len(sources))
+        if self.processes:
+            self.parse_pool = ProcessPoolExecutor(max_workers=self.processes)
+        try:
+            pipeline: Pipeline = Pipeline(self.stages(), queue_size=QUEUE_SIZE)
+            pipeline.run(PdfWork(source) for source in sources)
+            self.flush()
+        finally:
+            if self.parse_pool is not None:
+                self.parse_pool.shutdown()
+                self.parse_pool = None
+            self._progress.close()
+        return pipeline
+
+
+def remove_deleted_sources(
+    manifest: IngestManifest, db: Union[Chroma, NumpyVectorStore], names: List[str]
+) -> int:
+    """Delete the vectors of files that are no longer part of the corpus."""
+    removed: List[str] = manifest.removed_sources(names)
+    for source in removed:
+        stale_ids: List[str] = manifest.chunk_ids(source)
+        if stale_ids:
+            db.delete(ids=stale_ids)
+        manifest.remove(source)
+        logging.info(f"Removed {len(stale_ids)} chunks of {source}")
+    return len(removed)
+
+
+def stored_chunks(
+    db: Union[Chroma, NumpyVectorStore],
+) -> Iterator[Tuple[str, str, str]]:
+    """Yield (chunk ID, text, source) for every chunk in the vector store."""
+    if isinstance(db, NumpyVectorStore):
+        for record in db.records():
+            yield record["id"], record["text"], record["metadata"].get("source", "")
+        return
+    for offset in range(0, db._collection.count(), WRITE_BATCH_SIZE):
+        page = db._collection.get(
+            include=["documents", "metadatas"], limit=WRITE_BATCH_SIZE, offset=offset
+        )
+        for chunk_id, text, metadata in zip(
+            page["ids"], page["documents"], page["metadatas"]
+        ):
+            yield chunk_id, text, (metadata or {}).get("source", "")
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--source-dir", help="Ingest all PDFs under a local directory")
+    source.add_argument("--source-glob", help="Ingest local PDFs matching a glob")
+    source.add_argument(
+        "--source-urls", help="Ingest the PDFs listed in a file, one URL per line"
+    )
+    parser.add_argument(
+        "--chunker",
+        choices=sorted(CHUNKERS),
+        default=CHUNKING_STRATEGY,
+        help="Chunking strategy (see chunking.py)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Chunk size: characters for recursive, tokens for the others",
+    )
+    parser.add_argument(
+        "--chunk-overlap", type=int, help="Chunk overlap, in the same unit"
+    )
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        default=0.0,
+        help="Seconds a cached download is trusted without revalidation",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Serve remote files only from the local blob cache",
+    )
+    parser.add_argument(
+        "--vector-store",
+        choices=["chroma", "numpy"],
+        default="chroma",
+        help="Write to the Chroma database or to the NumpyVectorStore",
+    )
+    parser.add_argument(
+        "--nlist",
+        type=int,
+        help="IVF clusters for the numpy store (0 for brute force); "
+        "chosen from the store size by default",
+    )
+    parser.add_argument(
+        "--parse-mode",
+        choices=["thread", "process"],
+        default="process",
+        help="Run PDF parsing and splitting on threads or in a process pool",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=PROCESS_WORKERS,
+        help="Size of the process pool in process parse mode",
     )
+    return parser.parse_args()
 
-    # Process remaining batches
-    with tqdm(
-        total=len(chunks), initial=batch_size, desc="Embedding documents"
-    ) as pbar:
-        for i in range(batch_size, len(chunks), batch_size):
-            current_batch = chunks[i : i + batch_size]
-            db.add_documents(current_batch)
-            pbar.update(len(current_batch))
 
-    logging.info(f"Vector store created and persisted to {CHROMA_PATH}")
+def build_source(args: argparse.Namespace) -> PdfSource:
+    """Create the PDF source selected on the command line."""
+    if args.source_dir:
+        return LocalDirectorySource(args.source_dir)
+    if args.source_glob:
+        return GlobSource(args.source_glob)
+    remote_options = dict(
+        cache=BlobCache(),
+        session=create_session(FETCH_WORKERS),
+        max_age=args.max_age,
+        offline=args.offline,
+    )
+    if args.source_urls:
+        return UrlListSource.from_file(args.source_urls, **remote_options)
+    return UrlListSource.from_base_url(BASE_URL, PDF_FILES, **remote_options)
 
 
 def main() -> None:
     """Main execution function."""
-    chunks: List[Document] = process_pdfs()
-    if chunks:
-        create_vector_store(chunks)
+    args: argparse.Namespace = parse_args()
+    pdf_source: PdfSource = build_source(args)
+    names: List[str] = pdf_source.names()
+    manifest: IngestManifest = IngestManifest.load(
+        NUMPY_MANIFEST_PATH if args.vector_store == "numpy" else MANIFEST_PATH
+    )
+    # Retries are left to BatchedEmbeddings: it retries every transient failure
+    # and lets only 429s cut its concurrency
+    batched: BatchedEmbeddings = BatchedEmbeddings(
+        OpenAIEmbeddings(
+            model=OPENAI_AI_EMBEDDING_MODEL,
+            openai_api_key=OPENAI_API_KEY,
+            max_retries=0,
+            chunk_size=MAX_BATCH_INPUTS,
+        ),
+        OPENAI_AI_EMBEDDING_MODEL,
+    )
+    embeddings: CachedEmbeddings = cached_embeddings(batched, OPENAI_AI_EMBEDDING_MODEL)
+    db: Union[Chroma, NumpyVectorStore]
+    if args.vector_store == "numpy":
+        db = NumpyVectorStore(VECTOR_STORE_PATH, embedding_function=embeddings)
+    else:
+        db = Chroma(
+            collection_name=COLLECTION_NAME,
+            embedding_function=embeddings,
+            persist_directory=CHROMA_PATH,
+        )
+
+    removed: int = remove_deleted_sources(manifest, db, names)
+    ingestor: PdfIngestor = PdfIngestor(
+        pdf_source,
+        manifest,
+        db,
+        embeddings,
+        chunker=get_chunker(args.chunker, args.chunk_size, args.chunk_overlap),
+        processes=args.processes if args.parse_mode == "process" else None,
+    )
+    pipeline: Pipeline = ingestor.run(names)
+    # Save the store before the manifest, so a crash never records unsaved chunks
+    if isinstance(db, NumpyVectorStore):
+        db.save(args.nlist)
+    manifest.save()
+    # The BM25 index covers the whole store, so it is rebuilt on any change
+    lexical_path: str = index_path(args.vector_store)
+    if ingestor.written or removed or not os.path.exists(lexical_path):
+        lexical: BM25Index = BM25Index.build(stored_chunks(db))
+        lexical.save(lexical_path)
+        logging.info(
+            f"BM25 index of {len(lexical)} chunks, {len(lexical.terms)} terms "
+            f"written to {lexical_path}"
+        )
+
+    logging.info(
+        f"Ingested {len(names)} files: {ingestor.unchanged} unchanged, "
+        f"{pipeline.stages[-1].items_in - pipeline.stages[-1].errors} written, "
+        f"{ingestor.skipped_chunks} unchanged chunks skipped"
+    )
+    logging.info(f"Embedding cache: {embeddings.hits} hits, {embeddings.misses} misses")
+    logging.info(f"Embedding throughput: {batched.report()}")
+    if isinstance(pdf_source, UrlListSource):
+        logging.info(
+            f"Downloads: {pdf_source.downloaded} fetched, "
+            f"{pdf_source.not_modified} not modified"
+        )
+    logging.info("Per-stage throughput:\n" + pipeline.report())
+    if isinstance(db, NumpyVectorStore):
+        logging.info(
+            f"Vector store persisted to {VECTOR_STORE_PATH}: {len(db)} chunks, "
+            f"{db.nlist or 'no'} IVF clusters"
+        )
+    else:
+        logging.info(f"Vector store persisted to {CHROMA_PATH}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,136 @@
+"""
+Ingestion manifest for incremental re-ingestion.
+Records a content hash per source PDF and per chunk so that unchanged files
+and chunks can be skipped, changed ones upserted under stable IDs, and
+vectors belonging to removed files deleted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+
+MANIFEST_VERSION: int = 1
+
+
+def content_digest(data: bytes) -> str:
+    """Return the hex SHA-256 digest of raw file content."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk_digest(chunk: Document) -> str:
+    """
+    Return the content hash of a chunk.
+
+    The page number is part of the hash so a chunk that moves to a different
+    page is re-written with fresh metadata.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(str(chunk.metadata.get("page", "")).encode("utf-8"))
+    hasher.update(b"\0")
+    hasher.update(chunk.page_content.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def assign_chunk_ids(source: str, chunks: List[Document]) -> List[str]:
+    """
+    Derive stable vector IDs for the chunks of one source file.
+
+    IDs depend only on the source name and the chunk content, so an unchanged
+    chunk keeps its ID across runs even when other parts of the file change.
+    Identical chunks within one file are disambiguated by occurrence number.
+
+    Args:
+        source: Name of the source file the chunks came from
+        chunks: Chunks of that file, in document order
+
+    Returns:
+        List of IDs, one per chunk
+    """
+    source_key: str = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+    seen: Dict[str, int] = {}
+    ids: List[str] = []
+    for chunk in chunks:
+        digest: str = chunk_digest(chunk)[:32]
+        occurrence: int = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(f"{source_key}-{digest}-{occurrence}")
+    return ids
+
+
+class IngestManifest:
+    """
+    JSON-backed record of what has already been ingested.
+
+    Layout::
+
+        {"version": 1,
+         "files": {"2023 Q1 AAPL.pdf": {"sha256": "...", "chunker": "...",
+                                        "chunk_ids": [...]}}}
+
+    ``chunker`` identifies the chunking settings the file was split with, so
+    changing them re-processes files whose content did not change.
+    """
+
+    def __init__(self, path: str, files: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.path: str = path
+        self.files: Dict[str, Dict[str, Any]] = files or {}
+
+    @classmethod
+    def load(cls, path: str) -> "IngestManifest":
+        """Load the manifest at ``path``, or return an empty one if it is missing."""
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data: Dict[str, Any] = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(
+                f"Unsupported manifest version {data.get('version')} in {path}"
+            )
+        return cls(path, data.get("files", {}))
+
+    def save(self) -> None:
+        """Atomically write the manifest back to disk."""
+        directory: str = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path: str = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def is_unchanged(self, source: str, digest: str, chunker: str = "") -> bool:
+        """Return True if ``source`` was ingested with the same hash and chunker."""
+        entry: Optional[Dict[str, Any]] = self.files.get(source)
+        return (
+            entry is not None
+            and entry.get("sha256") == digest
+            and entry.get("chunker", "") == chunker
+        )
+
+    def chunk_ids(self, source: str) -> List[str]:
+        """Return the vector IDs currently stored for ``source``."""
+        return list(self.files.get(source, {}).get("chunk_ids", []))
+
+    def update(
+        self, source: str, digest: str, chunk_ids: List[str], chunker: str = ""
+    ) -> None:
+        """Record that ``source`` is now stored with the given hash and chunk IDs."""
+        self.files[source] = {
+            "sha256": digest,
+            "chunker": chunker,
+            "chunk_ids": chunk_ids,
+        }
+
+    def remove(self, source: str) -> None:
+        """Forget ``source``."""
+        self.files.pop(source, None)
+
+    def removed_sources(self, current: Iterable[str]) -> List[str]:
+        """Return sources in the manifest that are no longer in ``current``."""
+        current_set = set(current)
+        return sorted(source for source in self.files if source not in current_set)
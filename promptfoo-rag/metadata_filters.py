@@ -0,0 +1,97 @@
+"""
+Metadata pre-filters for retrieval.
+
+The corpus files are named "<year> <quarter> <ticker>.pdf" (e.g.
+"2023 Q1 AAPL.pdf"). ``source_metadata`` recovers those fields from a
+chunk's source, and ``query_filters`` detects the companies, quarters and
+years a question mentions, so retrieval can be restricted to the matching
+filings before ranking.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Dict, Iterable, List, Set
+from urllib.parse import unquote
+
+SOURCE_PATTERN: re.Pattern = re.compile(
+    r"(?P<year>\d{4})\s+(?P<quarter>Q[1-4])\s+(?P<company>[A-Z]{1,5})\b"
+)
+# Names a question may use for each ticker in the corpus
+COMPANY_NAMES: Dict[str, List[str]] = {
+    "AAPL": ["apple", "aapl"],
+    "AMZN": ["amazon", "amzn"],
+    "INTC": ["intel", "intc"],
+    "MSFT": ["microsoft", "msft"],
+    "NVDA": ["nvidia", "nvda"],
+}
+_QUARTER_WORDS: Dict[str, str] = {
+    "first": "Q1",
+    "second": "Q2",
+    "third": "Q3",
+    "fourth": "Q4",
+}
+
+
+def source_metadata(source: str) -> Dict[str, str]:
+    """
+    Parse year, quarter and company from a source file name or URL.
+
+    Returns:
+        Dict with "year", "quarter" and "company", or an empty dict if the
+        name does not follow the corpus naming scheme
+    """
+    match = SOURCE_PATTERN.search(os.path.basename(unquote(source)))
+    return match.groupdict() if match else {}
+
+
+def query_filters(question: str) -> Dict[str, Set[str]]:
+    """
+    Detect the metadata values a question refers to.
+
+    Args:
+        question: The user's question
+
+    Returns:
+        Allowed values per field, only for fields the question mentions;
+        e.g. {"company": {"AAPL", "MSFT"}, "quarter": {"Q1"}}
+    """
+    text: str = question.lower()
+    filters: Dict[str, Set[str]] = {}
+    companies: Set[str] = {
+        ticker
+        for ticker, names in COMPANY_NAMES.items()
+        if any(re.search(rf"\b{name}\b", text) for name in names)
+    }
+    if companies:
+        filters["company"] = companies
+    quarters: Set[str] = {f"Q{q}" for q in re.findall(r"\bq([1-4])\b", text)}
+    quarters.update(
+        quarter
+        for word, quarter in _QUARTER_WORDS.items()
+        if re.search(rf"\b{word} quarter\b", text)
+    )
+    if quarters:
+        filters["quarter"] = quarters
+    years: Set[str] = set(re.findall(r"\b(20\d\d)\b", text))
+    if years:
+        filters["year"] = years
+    return filters
+
+
+def matching_sources(sources: Iterable[str], filters: Dict[str, Set[str]]) -> Set[str]:
+    """
+    Return the sources whose metadata satisfies every filter.
+
+    Sources that do not follow the naming scheme never match a filter. If
+    no source matches, the filters are presumably wrong (e.g. a fiscal year
+    that is not a file year) and all sources are returned.
+    """
+    sources = list(sources)
+    matched: Set[str] = set()
+    for source in sources:
+        metadata: Dict[str, str] = source_metadata(source)
+        if all(metadata.get(key) in values for key, values in filters.items()):
+            matched.add(source)
+    return matched or set(sources)
@@ -0,0 +1,320 @@
+"""
+Local stand-in for the OpenAI API, for testing and benchmarking offline.
+
+Serves ``POST /v1/embeddings`` with deterministic pseudo-random unit vectors
+derived from the input, enforcing a tokens-per-minute budget with 429
+responses and a Retry-After header, like the real endpoint.
+
+``POST /v1/chat/completions`` answers with words drawn deterministically
+from the last message, optionally streamed as server-sent events. The first
+token is delayed by ``--ttft`` seconds and each further one by
+``--token-interval``, so time-to-first-token can be measured offline.
+
+Usage:
+    python mock_openai_server.py --port 8100 --tpm 1000000 --latency 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=test python ingest.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+DEFAULT_DIMENSIONS: int = 3072
+DEFAULT_COMPLETION_TOKENS: int = 64
+
+
+class TokenBucket:
+    """
+    Tokens-per-minute budget refilled continuously.
+
+    Bursts are capped at ``burst_seconds`` worth of tokens, so a quota cannot
+    be used up in the first instant of a minute. The bucket starts full, so
+    a run shorter than a few bursts mostly measures the burst, not the rate.
+    """
+
+    def __init__(self, tokens_per_minute: float, burst_seconds: float = 1.0):
+        self.rate: float = tokens_per_minute / 60.0
+        self.capacity: float = self.rate * burst_seconds
+        self.available: float = self.capacity
+        self.updated: float = time.monotonic()
+        self._lock: threading.Lock = threading.Lock()
+
+    def take(self, tokens: int) -> Optional[float]:
+        """Consume ``tokens``; return None on success or seconds to wait if over budget."""
+        with self._lock:
+            now: float = time.monotonic()
+            self.available = min(
+                self.capacity, self.available + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            # A request larger than the whole bucket goes through once it is
+            # full, leaving it in debt, instead of never
+            if tokens <= self.available or self.available >= self.capacity:
+                self.available -= tokens
+                return None
+            return (min(tokens, self.capacity) - self.available) / self.rate
+
+
+def fake_embedding(item: Union[str, List[int]], dimensions: int) -> np.ndarray:
+    """Return a deterministic unit vector for a text or token list."""
+    key: bytes = (item if isinstance(item, str) else json.dumps(item)).encode("utf-8")
+    seed: int = int.from_bytes(hashlib.sha256(key).digest()[:8], "little")
+    vector: np.ndarray = np.random.default_rng(seed).standard_normal(dimensions)
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+def count_tokens(item: Union[str, List[int]]) -> int:
+    return len(item) // 4 + 1 if isinstance(item, str) else len(item)
+
+
+def fake_completion(prompt: str, tokens: int) -> List[str]:
+    """Return ``tokens`` answer pieces drawn deterministically from ``prompt``."""
+    words: List[str] = prompt.split() or ["answer"]
+    seed: int = int.from_bytes(
+        hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "little"
+    )
+    picks: np.ndarray = np.random.default_rng(seed).integers(0, len(words), tokens)
+    return [("" if i == 0 else " ") + words[pick] for i, pick in enumerate(picks)]
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Request handler; configuration lives on the server object."""
+
+    server: "MockOpenAIServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(
+        self,
+        status: int,
+        body: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        payload: bytes = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length: int = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self) -> None:
+        if self.path.rstrip("/").endswith("/embeddings"):
+            self._embeddings(self._read_json())
+        elif self.path.rstrip("/").endswith("/chat/completions"):
+            self._chat_completions(self._read_json())
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _embeddings(self, request: Dict[str, Any]) -> None:
+        inputs = request.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        tokens: int = sum(count_tokens(item) for item in inputs)
+        self.server.record("requests")
+
+        wait: Optional[float] = (
+            self.server.bucket.take(tokens) if self.server.bucket else None
+        )
+        if wait is not None:
+            self.server.record("rate_limited")
+            error: Dict[str, str] = {
+                "message": "Rate limit reached",
+                "type": "tokens",
+                "code": "rate_limit_exceeded",
+            }
+            self._send_json(429, {"error": error}, {"Retry-After": f"{wait:.3f}"})
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        dimensions: int = request.get("dimensions") or self.server.dimensions
+        data: List[Dict[str, Any]] = []
+        for index, item in enumerate(inputs):
+            vector: np.ndarray = fake_embedding(item, dimensions)
+            if request.get("encoding_format") == "base64":
+                embedding: Any = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        self.server.record("tokens", tokens)
+        self._send_json(
+            200,
+            {
+                "object": "list",
+                "data": data,
+                "model": request.get("model", "mock"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            },
+        )
+
+    def _send_event(self, data: str) -> None:
+        """Write one server-sent event as an HTTP chunk."""
+        payload: bytes = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _chat_completions(self, request: Dict[str, Any]) -> None:
+        self.server.record("chat_requests")
+        messages: List[Dict[str, Any]] = request.get("messages", [])
+        prompt: str = str(messages[-1].get("content", "")) if messages else ""
+        pieces: List[str] = fake_completion(prompt, self.server.completion_tokens)
+        usage: Dict[str, int] = {
+            "prompt_tokens": count_tokens(prompt),
+            "completion_tokens": len(pieces),
+            "total_tokens": count_tokens(prompt) + len(pieces),
+        }
+        digest: str = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        common: Dict[str, Any] = {
+            "id": f"chatcmpl-mock-{digest[:12]}",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+        }
+        if self.server.ttft:
+            time.sleep(self.server.ttft)
+        if not request.get("stream"):
+            time.sleep(self.server.token_interval * max(0, len(pieces) - 1))
+            message: Dict[str, str] = {"role": "assistant", "content": "".join(pieces)}
+            choice: Dict[str, Any] = {
+                "index": 0,
+                "message": message,
+                "finish_reason": "stop",
+            }
+            self._send_json(
+                200,
+                {
+                    **common,
+                    "object": "chat.completion",
+                    "choices": [choice],
+                    "usage": usage,
+                },
+            )
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunk: Dict[str, Any] = {**common, "object": "chat.completion.chunk"}
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(self.server.token_interval)
+            delta: Dict[str, str] = {"content": piece}
+            if i == 0:
+                delta["role"] = "assistant"
+            choice = {"index": 0, "delta": delta, "finish_reason": None}
+            self._send_event(json.dumps({**chunk, "choices": [choice]}))
+        choice = {"index": 0, "delta": {}, "finish_reason": "stop"}
+        self._send_event(json.dumps({**chunk, "choices": [choice]}))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._send_event(json.dumps({**chunk, "choices": [], "usage": usage}))
+        self._send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """
+    Threaded mock server.
+
+    Args:
+        port: Port to listen on (0 picks a free one)
+        tokens_per_minute: Embedding token budget, or None for unlimited
+        burst_seconds: Seconds of budget that can be spent at once
+        latency: Seconds added to every successful response
+        dimensions: Embedding size when the request does not specify one
+        ttft: Seconds before the first token of a chat completion
+        token_interval: Seconds between further chat completion tokens
+        completion_tokens: Length of every chat completion, in tokens
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        tokens_per_minute: Optional[float] = None,
+        latency: float = 0.0,
+        dimensions: int = DEFAULT_DIMENSIONS,
+        ttft: float = 0.0,
+        token_interval: float = 0.0,
+        completion_tokens: int = DEFAULT_COMPLETION_TOKENS,
+        burst_seconds: float = 1.0,
+    ):
+        super().__init__(("127.0.0.1", port), MockOpenAIHandler)
+        self.bucket: Optional[TokenBucket] = (
+            TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute else None
+        )
+        self.latency: float = latency
+        self.dimensions: int = dimensions
+        self.ttft: float = ttft
+        self.token_interval: float = token_interval
+        self.completion_tokens: int = completion_tokens
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "rate_limited": 0,
+            "tokens": 0,
+            "chat_requests": 0,
+        }
+        self._stats_lock: threading.Lock = threading.Lock()
+
+    def record(self, name: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self) -> "MockOpenAIServer":
+        """Serve on a background thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--tpm", type=float, default=None, help="Tokens per minute")
+    parser.add_argument(
+        "--burst", type=float, default=1.0, help="Seconds of quota usable at once"
+    )
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--dimensions", type=int, default=DEFAULT_DIMENSIONS)
+    parser.add_argument("--ttft", type=float, default=0.0)
+    parser.add_argument("--token-interval", type=float, default=0.0)
+    parser.add_argument(
+        "--completion-tokens", type=int, default=DEFAULT_COMPLETION_TOKENS
+    )
+    args = parser.parse_args()
+    server = MockOpenAIServer(
+        args.port,
+        args.tpm,
+        args.latency,
+        args.dimensions,
+        args.ttft,
+        args.token_interval,
+        args.completion_tokens,
+        args.burst,
+    )
+    print(f"Mock OpenAI API listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
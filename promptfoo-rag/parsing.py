@@ -0,0 +1,117 @@
+"""
+PDF parsing and chunking helpers shared by ingest.py and its benchmarks.
+Chunking is delegated to the strategies in chunking.py.
+
+Parsing and splitting are CPU-bound pure Python, so besides the in-thread
+functions this module provides ``parse_and_split_packed``, meant to run in a
+process pool. It returns chunks in a compact form (plain tuples of page
+number, text and extra metadata) instead of pickled Document objects, and
+``unpack_chunks`` turns them back into Documents in the parent process.
+
+Either way each chunk's metadata is built by ``chunk_metadata``, so what
+the index stores does not depend on where parsing ran.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+from langchain_community.document_loaders.blob_loaders import Blob
+from langchain_community.document_loaders.parsers.pdf import PyPDFParser
+from langchain_core.documents import Document
+
+from chunking import DEFAULT_STRATEGY, get_chunker
+
+# (number of pages, [(page number, chunk text, extra metadata), ...])
+PackedChunks = Tuple[int, List[Tuple[int, str, Dict[str, object]]]]
+# Metadata set by chunking strategies that is stored along with source and page
+CHUNK_EXTRA_KEYS: Tuple[str, ...] = ("table",)
+
+
+def chunk_metadata(source: str, metadata: Dict[str, object]) -> Dict[str, object]:
+    """
+    Return the metadata stored with a chunk.
+
+    That is its source, page and any ``CHUNK_EXTRA_KEYS`` the chunking
+    strategy set; whatever else the PDF parser attached to the page
+    (producer, creation date, ...) is dropped.
+
+    Args:
+        source: Source name of the chunk's file
+        metadata: Metadata of the chunk as split, or its packed page and extras
+    """
+    return {
+        "source": source,
+        "page": int(metadata.get("page", 0)),
+        **{key: metadata[key] for key in CHUNK_EXTRA_KEYS if key in metadata},
+    }
+
+
+def parse_pdf(data: bytes, source: str) -> List[Document]:
+    """
+    Extract one Document per page from raw PDF bytes.
+
+    Args:
+        data: PDF file content
+        source: Value stored in each page's ``source`` metadata
+
+    Returns:
+        List of page Documents
+    """
+    return list(PyPDFParser().lazy_parse(Blob.from_data(data, path=source)))
+
+
+def split_pages(
+    pages: List[Document],
+    strategy: str = DEFAULT_STRATEGY,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+) -> List[Document]:
+    """Split page Documents into chunks with the given chunking strategy."""
+    return get_chunker(strategy, chunk_size, chunk_overlap).split_documents(pages)
+
+
+def parse_and_split_packed(
+    data: bytes,
+    source: str,
+    strategy: str = DEFAULT_STRATEGY,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+) -> PackedChunks:
+    """
+    Parse and split a PDF, returning the chunks in compact form.
+
+    Intended to run in a worker process; only the page number, text and
+    strategy-specific metadata of each chunk cross the process boundary.
+
+    Args:
+        data: PDF file content
+        source: Source name used while parsing
+        strategy: Chunking strategy name (see chunking.py)
+        chunk_size: Chunk size in the strategy's unit, or None for its default
+        chunk_overlap: Chunk overlap in the strategy's unit, or None for its
+            default
+
+    Returns:
+        Tuple of page count and (page, text, extra metadata) triples
+    """
+    pages: List[Document] = parse_pdf(data, source)
+    chunks: List[Document] = split_pages(pages, strategy, chunk_size, chunk_overlap)
+    packed: List[Tuple[int, str, Dict[str, object]]] = []
+    for chunk in chunks:
+        metadata: Dict[str, object] = chunk_metadata(source, chunk.metadata)
+        del metadata["source"]
+        packed.append((metadata.pop("page"), chunk.page_content, metadata))
+    return len(pages), packed
+
+
+def unpack_chunks(packed: PackedChunks, source: str) -> List[Document]:
+    """Rebuild chunk Documents from ``parse_and_split_packed`` output."""
+    _, chunks = packed
+    return [
+        Document(
+            page_content=text,
+            metadata=chunk_metadata(source, {"page": page, **extra}),
+        )
+        for page, text, extra in chunks
+    ]
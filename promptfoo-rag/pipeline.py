@@ -0,0 +1,165 @@
+"""
+Minimal staged pipeline with bounded queues.
+
+Each stage runs a function over its input items on its own pool of worker
+threads and passes every value the function yields on to the next stage.
+Stages are connected by bounded queues, so a slow stage blocks the stages
+upstream of it instead of letting work pile up in memory.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+_STOP: object = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline.
+
+    Args:
+        name: Name used in logs and the throughput report
+        fn: Function called once per input item; returns an iterable of
+            outputs (empty to drop the item, several to fan out)
+        workers: Number of threads running ``fn`` concurrently
+        unit: Optional function returning how many units of work an input
+            item represents (e.g. pages or bytes), for the throughput report
+        unit_name: Name of the unit counted by ``unit``
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Iterable[Any]],
+        workers: int = 1,
+        unit: Optional[Callable[[Any], float]] = None,
+        unit_name: str = "items",
+    ):
+        if workers < 1:
+            raise ValueError(f"Stage {name} needs at least one worker")
+        self.name: str = name
+        self.fn: Callable[[Any], Iterable[Any]] = fn
+        self.workers: int = workers
+        self.unit: Optional[Callable[[Any], float]] = unit
+        self.unit_name: str = unit_name
+        self.items_in: int = 0
+        self.items_out: int = 0
+        self.units: float = 0.0
+        self.errors: int = 0
+        self.busy_seconds: float = 0.0
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def wall_seconds(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    def report(self) -> str:
+        """Return a one-line throughput summary of this stage."""
+        wall: float = self.wall_seconds
+        # Busy time divided by workers is what the stage would take on its own
+        active: float = self.busy_seconds / self.workers
+        rate: float = self.units / active if active > 0 else 0.0
+        return (
+            f"{self.name:<8} workers={self.workers:<3} in={self.items_in:<6} "
+            f"out={self.items_out:<7} errors={self.errors:<3} "
+            f"{self.unit_name}={self.units:<8.4g} busy={active:7.2f}s "
+            f"wall={wall:7.2f}s rate={rate:9.1f} {self.unit_name}/s"
+        )
+
+
+class Pipeline:
+    """
+    Chain of stages connected by bounded queues.
+
+    Args:
+        stages: Stages in processing order
+        queue_size: Capacity of each inter-stage queue
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 8):
+        self.stages: List[Stage] = stages
+        self.queues: List[queue.Queue] = [
+            queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)
+        ]
+        self.wall_seconds: float = 0.0
+
+    def _worker(self, index: int, remaining: List[int]) -> None:
+        stage: Stage = self.stages[index]
+        inbox: queue.Queue = self.queues[index]
+        outbox: queue.Queue = self.queues[index + 1]
+        is_last: bool = index == len(self.stages) - 1
+        while True:
+            item: Any = inbox.get()
+            if item is _STOP:
+                break
+            started: float = time.perf_counter()
+            with stage._lock:
+                if stage.started is None:
+                    stage.started = started
+            outputs: int = 0
+            units: float = 0.0
+            try:
+                # Inside the try: a worker that died here would never forward _STOP
+                units = stage.unit(item) if stage.unit else 1
+                for output in stage.fn(item):
+                    outputs += 1
+                    if not is_last:
+                        # Blocks while the next stage is behind: backpressure
+                        outbox.put(output)
+                failed: bool = False
+            except Exception as e:
+                logging.error(f"Stage {stage.name} failed on {item}: {str(e)}")
+                failed = True
+            elapsed: float = time.perf_counter() - started
+            with stage._lock:
+                stage.items_in += 1
+                stage.items_out += outputs
+                stage.units += units
+                stage.errors += int(failed)
+                stage.busy_seconds += elapsed
+        with stage._lock:
+            stage.finished = time.perf_counter()
+            remaining[index] -= 1
+            last_worker: bool = remaining[index] == 0
+        if last_worker and not is_last:
+            for _ in range(self.stages[index + 1].workers):
+                outbox.put(_STOP)
+
+    def run(self, items: Iterable[Any]) -> None:
+        """Feed ``items`` through every stage and wait until all have drained."""
+        started: float = time.perf_counter()
+        remaining: List[int] = [stage.workers for stage in self.stages]
+        threads: List[threading.Thread] = [
+            threading.Thread(
+                target=self._worker,
+                args=(index, remaining),
+                name=f"{stage.name}-{n}",
+                daemon=True,
+            )
+            for index, stage in enumerate(self.stages)
+            for n in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for item in items:
+            self.queues[0].put(item)
+        for _ in range(self.stages[0].workers):
+            self.queues[0].put(_STOP)
+        for thread in threads:
+            thread.join()
+        self.wall_seconds = time.perf_counter() - started
+
+    def report(self) -> str:
+        """Return a multi-line per-stage throughput report."""
+        lines: List[str] = [stage.report() for stage in self.stages]
+        lines.append(f"total wall time: {self.wall_seconds:.2f}s")
+        return "\n".join(lines)
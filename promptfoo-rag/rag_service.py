@@ -0,0 +1,842 @@
+"""
+Long-lived RAG worker behind the promptfoo provider in retrieve.py.
+
+promptfoo re-imports its Python provider for every test case, so loading
+langchain, the embeddings client and the vector store there is paid on
+every call. This module loads them once and serves requests over a local
+HTTP endpoint that the import-light shim in retrieve.py forwards to:
+
+    POST /call_api   {"prompt", "options", "context"} -> provider result
+    POST /call_api_batch  {"prompts", "options", "concurrency"}
+                     -> {"results": [provider result, ...]}
+    POST /stream_api {"prompt", "options"} -> JSON lines {"token"} as the
+                     answer is generated, then {"done", "metadata"}
+    POST /ping       empty round trip, for measuring per-call overhead
+    GET  /health     readiness probe
+    GET  /stats      startup time, call latency percentiles, retrieval, TTFT
+                     and generation percentiles, context tokens saved by
+                     packing and answer cache hit rate
+    POST /shutdown   stop the worker
+
+The worker exits by itself after ``IDLE_TIMEOUT`` seconds without requests.
+``call_api``, ``stream_api`` and ``call_api_batch`` can also be imported
+and called in-process.
+
+Usage:
+    python rag_service.py [--port 8731] [--idle-timeout 900]
+    python rag_service.py --stop
+"""
+
+import time
+
+# Measured before the heavy imports below, so startup time includes them
+PROCESS_STARTED: float = time.perf_counter()
+
+import argparse
+import json
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+from urllib.request import Request, urlopen
+
+import numpy as np
+from langchain.prompts import ChatPromptTemplate
+from langchain.schema import AIMessage, HumanMessage
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from answer_cache import ANSWER_CACHE_PATH, AnswerCache
+from bm25_index import RRF_K, BM25Index, index_path, reciprocal_rank_fusion
+from context_packing import CONTEXT_SEPARATOR, ContextPacker, PackedContext
+from embedding_cache import CachedEmbeddings, cached_embeddings
+from metadata_filters import matching_sources, query_filters
+from vector_store import VECTOR_STORE_PATH, NumpyVectorStore
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+# Constants
+CHROMA_PATH: str = "db"
+OPENAI_AI_MODEL: str = "gpt-4o-mini"
+OPENAI_AI_TEMPERATURE: float = 0.0
+ANTHROPIC_API_KEY: Optional[str] = os.getenv("ANTHROPIC_API_KEY")
+OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
+OPENAI_AI_EMBEDDING_MODEL: str = "text-embedding-3-large"
+# Vector store used unless the provider config sets "vectorStore"
+DEFAULT_VECTOR_STORE: str = "chroma"
+VECTOR_STORES: Tuple[str, ...] = ("chroma", "numpy")
+# "hybrid" (dense + BM25), "dense" or "lexical", unless the config sets "retrieval"
+DEFAULT_RETRIEVAL: str = "hybrid"
+# Candidates taken from each ranking before fusing them
+FUSION_CANDIDATES: int = 20
+SERVICE_HOST: str = "127.0.0.1"
+SERVICE_PORT: int = int(os.getenv("RAG_SERVICE_PORT", "8731"))
+# Generation requests in flight per batch
+GENERATION_CONCURRENCY: int = int(os.getenv("RAG_GENERATION_CONCURRENCY", "8"))
+# Seconds without requests after which the worker exits
+IDLE_TIMEOUT: float = float(os.getenv("RAG_SERVICE_IDLE_TIMEOUT", "900"))
+
+# A retrieved chunk: (chunk ID, text, metadata)
+Chunk = Tuple[str, str, Dict[str, Any]]
+
+# Initialize embeddings
+# Question embeddings are served from the shared on-disk cache when possible
+embeddings: CachedEmbeddings = cached_embeddings(
+    OpenAIEmbeddings(model=OPENAI_AI_EMBEDDING_MODEL, openai_api_key=OPENAI_API_KEY),
+    OPENAI_AI_EMBEDDING_MODEL,
+)
+# Vector stores are opened on first use, so only the selected one is loaded,
+# and reopened when ingest.py rewrites them. Each entry is (file version, store).
+_vector_stores: Dict[str, Tuple[Any, Any]] = {}
+_lexical_indexes: Dict[str, Tuple[Any, Optional[BM25Index]]] = {}
+_vector_stores_lock: threading.Lock = threading.Lock()
+
+
+def _file_version(path: str) -> Optional[Tuple[int, int]]:
+    """Return (inode, mtime) of ``path``, which changes when it is rewritten or replaced."""
+    try:
+        stat: os.stat_result = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def get_vector_store(name: str) -> Union["Chroma", NumpyVectorStore]:
+    """
+    Return the vector store backend called ``name``, opening it on first use.
+
+    The numpy store is reopened whenever its meta.json changes, so a
+    running worker serves what ingest.py last saved. Chroma reads its
+    database on every query and is opened once.
+
+    Args:
+        name: "chroma" for the Chroma database under db/, or "numpy" for the
+            memory-mapped NumpyVectorStore under db/vectors/
+
+    Returns:
+        The opened vector store
+    """
+    if name not in VECTOR_STORES:
+        raise ValueError(
+            f"Unknown vector store {name!r}, expected one of {VECTOR_STORES}"
+        )
+    version: Optional[Tuple[int, int]] = (
+        _file_version(os.path.join(VECTOR_STORE_PATH, "meta.json"))
+        if name == "numpy"
+        else None
+    )
+    with _vector_stores_lock:
+        if name not in _vector_stores or _vector_stores[name][0] != version:
+            if name in _vector_stores:
+                logging.info(f"Vector store {name!r} changed on disk, reopening it")
+            if name == "numpy":
+                db: Any = NumpyVectorStore(
+                    VECTOR_STORE_PATH, embedding_function=embeddings
+                )
+            else:
+                # Imported lazily: Chroma is slow to import and load
+                from langchain_chroma import Chroma
+
+                db = Chroma(
+                    collection_name="rag_collection",
+                    persist_directory=CHROMA_PATH,
+                    embedding_function=embeddings,
+                )
+            _vector_stores[name] = (version, db)
+        return _vector_stores[name][1]
+
+
+# Prompt template for generating answers
+PROMPT_TEMPLATE: str = """
+Answer the question based only on the following context:
+{context}
+Answer the question based on the above context: {question}.
+Provide a detailed answer.
+Don't justify your answers.
+Don't give information not mentioned in the CONTEXT INFORMATION.
+Do not say "according to the context" or "mentioned in the context" or similar.
+"""
+prompt_template: ChatPromptTemplate = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+# One chat client for all calls, so its HTTP connections are reused
+chat: ChatOpenAI = ChatOpenAI(
+    model_name=OPENAI_AI_MODEL,
+    temperature=OPENAI_AI_TEMPERATURE,
+    openai_api_key=OPENAI_API_KEY,
+)
+# Retrieved chunks are de-duplicated and fitted into a token budget
+context_packer: ContextPacker = ContextPacker(OPENAI_AI_MODEL)
+# Answers are reused for repeated and near-identical questions
+answer_cache: AnswerCache = AnswerCache(
+    ANSWER_CACHE_PATH, OPENAI_AI_MODEL, OPENAI_AI_TEMPERATURE
+)
+
+
+def get_lexical_index(name: str) -> Optional[BM25Index]:
+    """
+    Return the BM25 index built by ingest.py for vector store ``name``, if any.
+
+    The index is reloaded whenever ingest.py replaces its file.
+    """
+    path: str = index_path(name, CHROMA_PATH)
+    version: Optional[Tuple[int, int]] = _file_version(path)
+    with _vector_stores_lock:
+        if name not in _lexical_indexes or _lexical_indexes[name][0] != version:
+            if version is not None:
+                _lexical_indexes[name] = (version, BM25Index.load(path))
+            else:
+                logging.warning(f"No BM25 index at {path}, using dense retrieval only")
+                _lexical_indexes[name] = (None, None)
+        return _lexical_indexes[name][1]
+
+
+def dense_search(
+    db: Union["Chroma", NumpyVectorStore],
+    vectors: List[List[float]],
+    k: int,
+    sources: List[Optional[Set[str]]],
+    nprobe: Optional[int] = None,
+) -> List[List[Chunk]]:
+    """
+    Run one batched k-NN query, restricting each question to its sources.
+
+    Args:
+        db: Vector store to search
+        vectors: Question embeddings
+        k: Number of results per question
+        sources: Allowed chunk sources per question, or None for all
+        nprobe: IVF clusters scanned by the numpy store
+
+    Returns:
+        (chunk ID, text, metadata) triples for each question, best first
+    """
+    if isinstance(db, NumpyVectorStore):
+        masks: List[Optional[np.ndarray]] = [
+            None if allowed is None else db.where_in("source", allowed)
+            for allowed in sources
+        ]
+        return [
+            [
+                (record["id"], record["text"], record["metadata"])
+                for record in db.get_rows(rows)
+            ]
+            for rows, _scores in db.search(vectors, k, nprobe, masks)
+        ]
+    # Chroma takes one filter per query, so questions are grouped by filter
+    groups: Dict[Optional[FrozenSet[str]], List[int]] = {}
+    for i, allowed in enumerate(sources):
+        groups.setdefault(None if allowed is None else frozenset(allowed), []).append(i)
+    chunks: List[List[Chunk]] = [[] for _ in vectors]
+    for allowed, indices in groups.items():
+        results: Dict[str, Any] = db._collection.query(
+            query_embeddings=[vectors[i] for i in indices],
+            n_results=k,
+            where=None if allowed is None else {"source": {"$in": sorted(allowed)}},
+            include=["documents", "metadatas"],
+        )
+        for i, ids, documents, metadatas in zip(
+            indices, results["ids"], results["documents"], results["metadatas"]
+        ):
+            chunks[i] = [
+                (chunk_id, text, metadata or {})
+                for chunk_id, text, metadata in zip(ids, documents, metadatas)
+            ]
+    return chunks
+
+
+def get_chunks(db: Union["Chroma", NumpyVectorStore], ids: List[str]) -> List[Chunk]:
+    """Read chunks by ID; IDs not in the store are skipped."""
+    if isinstance(db, NumpyVectorStore):
+        return [
+            (record["id"], record["text"], record["metadata"])
+            for record in db.get_by_ids(ids)
+            if record is not None
+        ]
+    found: Dict[str, Any] = db._collection.get(
+        ids=ids, include=["documents", "metadatas"]
+    )
+    return [
+        (chunk_id, text, metadata or {})
+        for chunk_id, text, metadata in zip(
+            found["ids"], found["documents"], found["metadatas"]
+        )
+    ]
+
+
+def retrieve_chunks(
+    questions: List[str], vectors: List[List[float]], config: Dict[str, Any]
+) -> List[List[Chunk]]:
+    """
+    Retrieve the top-k chunks for a batch of questions.
+
+    With ``retrieval`` set to "hybrid" (the default) the dense ranking from
+    one batched k-NN query is fused with the BM25 ranking by reciprocal-rank
+    fusion; "dense" and "lexical" use one ranking only. Unless
+    ``metadataFilters`` is false, companies, quarters and years mentioned
+    in a question restrict both rankings to the matching filings.
+
+    Args:
+        questions: The user's questions
+        vectors: Question embeddings
+        config: Provider config (topK, vectorStore, nprobe, retrieval,
+            metadataFilters, candidates, rrfK)
+
+    Returns:
+        (chunk ID, text, metadata) triples for each question, best first
+    """
+    k: int = config.get("topK", 5)
+    store: str = config.get("vectorStore", DEFAULT_VECTOR_STORE)
+    db = get_vector_store(store)
+    mode: str = config.get("retrieval", DEFAULT_RETRIEVAL)
+    use_filters: bool = config.get("metadataFilters", True)
+    # The BM25 index also lists the ingested sources the filters select from
+    lexical: Optional[BM25Index] = (
+        get_lexical_index(store) if mode != "dense" or use_filters else None
+    )
+    sources: List[Optional[Set[str]]] = [None] * len(questions)
+    if lexical is not None and use_filters:
+        for i, question in enumerate(questions):
+            filters: Dict[str, Set[str]] = query_filters(question)
+            if filters:
+                sources[i] = matching_sources(lexical.sources, filters)
+    if mode == "dense" or lexical is None:
+        return dense_search(db, vectors, k, sources, config.get("nprobe"))
+
+    depth: int = max(k, config.get("candidates", FUSION_CANDIDATES))
+    dense: List[List[Chunk]] = (
+        [[] for _ in questions]
+        if mode == "lexical"
+        else dense_search(db, vectors, depth, sources, config.get("nprobe"))
+    )
+    rankings: List[List[str]] = []
+    found: Dict[str, Chunk] = {}
+    for question, allowed, dense_chunks in zip(questions, sources, dense):
+        mask: Optional[np.ndarray] = (
+            None if allowed is None else lexical.source_mask(allowed)
+        )
+        lexical_ids: List[str] = [
+            chunk_id for chunk_id, _score in lexical.search(question, depth, mask)
+        ]
+        found.update((chunk[0], chunk) for chunk in dense_chunks)
+        rankings.append(
+            reciprocal_rank_fusion(
+                [[chunk[0] for chunk in dense_chunks], lexical_ids],
+                config.get("rrfK", RRF_K),
+            )[:k]
+        )
+    missing: List[str] = sorted(
+        {chunk_id for ranking in rankings for chunk_id in ranking} - found.keys()
+    )
+    if missing:
+        found.update((chunk[0], chunk) for chunk in get_chunks(db, missing))
+    return [
+        [found[chunk_id] for chunk_id in ranking if chunk_id in found]
+        for ranking in rankings
+    ]
+
+
+def generate(final_prompt: str) -> Tuple[Union[str, Exception], float]:
+    """Return the model's answer (or the error raised) and the seconds it took."""
+    started: float = time.perf_counter()
+    try:
+        message: HumanMessage = HumanMessage(content=final_prompt)
+        response: AIMessage = chat.invoke([message])
+        return response.content, time.perf_counter() - started
+    except Exception as e:
+        return e, time.perf_counter() - started
+
+
+def build_prompts(
+    prompts: List[str], config: Dict[str, Any]
+) -> Tuple[List[List[float]], List[str], List[List[str]]]:
+    """
+    Embed and retrieve for a batch of questions and build their final prompts.
+
+    All questions are embedded in one embeddings request. Retrieved chunks
+    are de-duplicated, merged and packed into the ``contextTokens`` budget
+    unless ``contextPacking`` is false.
+
+    Args:
+        prompts: The user's questions
+        config: Provider config
+
+    Returns:
+        Question embeddings, final prompts and the IDs of the chunks in each
+        prompt's context
+    """
+    vectors: List[List[float]] = embeddings.embed_documents(prompts)
+    chunks: List[List[Chunk]] = retrieve_chunks(prompts, vectors, config)
+    if config.get("contextPacking", True):
+        packed: List[PackedContext] = [
+            context_packer.pack(row, config.get("contextTokens")) for row in chunks
+        ]
+        contexts: List[str] = [context.text for context in packed]
+        chunk_ids: List[List[str]] = [context.chunk_ids for context in packed]
+    else:
+        contexts = [CONTEXT_SEPARATOR.join(chunk[1] for chunk in row) for row in chunks]
+        chunk_ids = [[chunk[0] for chunk in row] for row in chunks]
+    final_prompts: List[str] = [
+        prompt_template.format(context=context, question=prompt)
+        for prompt, context in zip(prompts, contexts)
+    ]
+    return vectors, final_prompts, chunk_ids
+
+
+def answer_batch(
+    prompts: List[str],
+    options: Dict[str, Any],
+    concurrency: int = GENERATION_CONCURRENCY,
+) -> List[Union[str, Exception]]:
+    """
+    Answer a batch of questions with one retrieval pass and concurrent generation.
+
+    Prompts are built by ``build_prompts``. Answers found in the answer cache
+    are not generated again, unless the config sets ``answerCache`` to false
+    (or ``semanticCache`` to false to only reuse answers to identical
+    prompts).
+
+    Args:
+        prompts: The user's questions
+        options: Configuration options, as for ``call_api``
+        concurrency: Maximum number of generation requests in flight
+
+    Returns:
+        The answer, or the exception that prevented it, for each prompt in order
+    """
+    config: Dict[str, Any] = options.get("config", {})
+    use_cache: bool = config.get("answerCache", True)
+    vectors, final_prompts, chunk_ids = build_prompts(prompts, config)
+
+    answers: List[Optional[Union[str, Exception]]] = [None] * len(prompts)
+    if use_cache:
+        semantic: bool = config.get("semanticCache", True)
+        answers = [
+            answer_cache.get(final_prompt, vector, ids, semantic)
+            for final_prompt, vector, ids in zip(final_prompts, vectors, chunk_ids)
+        ]
+    # Identical prompts within the batch are generated once
+    missing: Dict[str, List[int]] = {}
+    for i, answer in enumerate(answers):
+        if answer is None:
+            missing.setdefault(final_prompts[i], []).append(i)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        generated: List[Tuple[Union[str, Exception], float]] = list(
+            executor.map(generate, missing)
+        )
+    for (final_prompt, indices), (answer, seconds) in zip(missing.items(), generated):
+        for i in indices:
+            answers[i] = answer
+        if use_cache and not isinstance(answer, Exception):
+            first: int = indices[0]
+            answer_cache.put(
+                final_prompt, vectors[first], chunk_ids[first], answer, seconds
+            )
+    return answers
+
+
+class LatencyStats:
+    """Thread-safe recent samples of named latencies, in milliseconds."""
+
+    def __init__(self, window: int = 10000):
+        self.window: int = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def record(self, latencies: Dict[str, Optional[float]]) -> None:
+        with self._lock:
+            for name, ms in latencies.items():
+                if ms is not None:
+                    self._samples.setdefault(name, deque(maxlen=self.window)).append(ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            samples: Dict[str, List[float]] = {
+                name: list(values) for name, values in self._samples.items()
+            }
+        stats: Dict[str, Dict[str, float]] = {}
+        for name, values in samples.items():
+            p50, p99 = np.percentile(values, [50, 99])
+            stats[name] = {"count": len(values), "p50": float(p50), "p99": float(p99)}
+        return stats
+
+
+# Retrieval, time-to-first-token and generation times of streamed calls
+call_timings: LatencyStats = LatencyStats()
+
+
+class AnswerStream:
+    """
+    Answer to one question, generated as a stream of text pieces.
+
+    Embedding, retrieval and the answer cache lookup run when the stream is
+    created; generation starts when it is iterated. A cached answer is
+    yielded as a single piece. Once the stream is exhausted, ``text`` holds
+    the whole answer and ``metadata`` the call's timings in milliseconds:
+    retrieval_ms, ttft_ms (from the start of generation to the first
+    piece) and generation_ms.
+
+    Args:
+        prompt: The user's question
+        options: Configuration options, as for ``call_api``
+    """
+
+    def __init__(self, prompt: str, options: Dict[str, Any]):
+        started: float = time.perf_counter()
+        config: Dict[str, Any] = options.get("config", {})
+        self.use_cache: bool = config.get("answerCache", True)
+        vectors, final_prompts, chunk_ids = build_prompts([prompt], config)
+        self.vector: List[float] = vectors[0]
+        self.final_prompt: str = final_prompts[0]
+        self.chunk_ids: List[str] = chunk_ids[0]
+        self.cached: Optional[str] = (
+            answer_cache.get(
+                self.final_prompt,
+                self.vector,
+                self.chunk_ids,
+                config.get("semanticCache", True),
+            )
+            if self.use_cache
+            else None
+        )
+        self.pieces: List[str] = []
+        self.retrieval_seconds: float = time.perf_counter() - started
+        self.ttft_seconds: Optional[float] = None
+        self.generation_seconds: Optional[float] = None
+
+    def __iter__(self) -> Iterator[str]:
+        started: float = time.perf_counter()
+        if self.cached is not None:
+            pieces: Iterator[str] = iter([self.cached])
+        else:
+            message: HumanMessage = HumanMessage(content=self.final_prompt)
+            pieces = (chunk.content for chunk in chat.stream([message]))
+        for piece in pieces:
+            if not piece:
+                continue
+            if self.ttft_seconds is None:
+                self.ttft_seconds = time.perf_counter() - started
+            self.pieces.append(piece)
+            yield piece
+        self.generation_seconds = time.perf_counter() - started
+        if self.use_cache and self.cached is None:
+            answer_cache.put(
+                self.final_prompt,
+                self.vector,
+                self.chunk_ids,
+                self.text,
+                self.generation_seconds,
+            )
+        call_timings.record(self.metadata)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.pieces)
+
+    @property
+    def metadata(self) -> Dict[str, Optional[float]]:
+        return {
+            name: None if seconds is None else round(seconds * 1000, 3)
+            for name, seconds in (
+                ("retrieval_ms", self.retrieval_seconds),
+                ("ttft_ms", self.ttft_seconds),
+                ("generation_ms", self.generation_seconds),
+            )
+        }
+
+
+def stream_api(prompt: str, options: Dict[str, Any]) -> AnswerStream:
+    """
+    Answer a prompt using RAG, yielding the answer as it is generated.
+
+    Args:
+        prompt: The user's question or prompt
+        options: Configuration options, as for ``call_api``
+
+    Returns:
+        An ``AnswerStream``; iterate it for the answer's text pieces
+    """
+    return AnswerStream(prompt, options)
+
+
+def call_api(
+    prompt: str, options: Dict[str, Any], context: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Process a prompt using RAG and return the response.
+
+    The answer is streamed and joined, so every call records its
+    time-to-first-token; set ``stream`` to false in the config to generate
+    it in one blocking request instead.
+
+    Args:
+        prompt: The user's question or prompt
+        options: Configuration options including topK, vectorStore
+            ("chroma" or "numpy"), nprobe (IVF clusters scanned by the
+            numpy store), retrieval ("hybrid", "dense" or "lexical"),
+            metadataFilters, contextPacking, contextTokens (context token
+            budget), stream, answerCache and semanticCache
+        context: Additional context for the request
+
+    Returns:
+        Dict containing the model's response and, when streamed, its
+        timings under "metadata"
+
+    Raises:
+        Exception: If there's an error during processing
+    """
+    try:
+        if options.get("config", {}).get("stream", True):
+            stream: AnswerStream = stream_api(prompt, options)
+            for _ in stream:
+                pass
+            return {"output": stream.text, "metadata": stream.metadata}
+
+        answer: Union[str, Exception] = answer_batch([prompt], options)[0]
+        if isinstance(answer, Exception):
+            raise answer
+
+        result: Dict[str, Any] = {
+            "output": answer,
+        }
+
+        return result
+    except Exception as e:
+        logging.error(f"Error in call_api: {str(e)}")
+        raise
+
+
+def call_api_batch(
+    prompts: List[str],
+    options: Dict[str, Any],
+    concurrency: int = GENERATION_CONCURRENCY,
+) -> List[Dict[str, str]]:
+    """
+    Batch counterpart of ``call_api`` for running many questions at once.
+
+    Args:
+        prompts: The user's questions
+        options: Configuration options, as for ``call_api``
+        concurrency: Maximum number of generation requests in flight
+
+    Returns:
+        One provider result per prompt, in order: {"output": ...} or, if that
+        question failed, {"error": ...}
+    """
+    return [
+        {"error": str(answer)} if isinstance(answer, Exception) else {"output": answer}
+        for answer in answer_batch(prompts, options, concurrency)
+    ]
+
+
+class ServiceStats:
+    """Thread-safe call counters and recent call latencies."""
+
+    def __init__(self, window: int = 10000):
+        self.startup_seconds: Optional[float] = None
+        self.calls: int = 0
+        self.errors: int = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock: threading.Lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.errors += 0 if ok else 1
+            self._latencies.append(seconds * 1000)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies: List[float] = list(self._latencies)
+        stats: Dict[str, Any] = {
+            "pid": os.getpid(),
+            "startup_seconds": self.startup_seconds,
+            "calls": self.calls,
+            "errors": self.errors,
+        }
+        if latencies:
+            p50, p99 = np.percentile(latencies, [50, 99])
+            stats.update(p50_ms=float(p50), p99_ms=float(p99))
+        return stats
+
+
+class RagRequestHandler(BaseHTTPRequestHandler):
+    """Routes the worker's HTTP endpoints."""
+
+    server: "RagService"
+
+    def _reply(self, status: int, payload: Dict[str, Any]) -> None:
+        body: bytes = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self.server.touch()
+        if self.path == "/health":
+            self._reply(200, {"ok": True})
+        elif self.path == "/stats":
+            self._reply(
+                200,
+                {
+                    **self.server.stats.snapshot(),
+                    "timings": call_timings.snapshot(),
+                    "context": context_packer.stats(),
+                    "answer_cache": answer_cache.stats(),
+                },
+            )
+        else:
+            self._reply(404, {"error": f"Unknown path {self.path}"})
+
+    def _stream(self, payload: Dict[str, Any]) -> None:
+        """Reply with one JSON line per answer piece, then the timings."""
+        started: float = time.perf_counter()
+        try:
+            stream: AnswerStream = stream_api(
+                payload["prompt"], payload.get("options") or {}
+            )
+        except Exception as e:
+            self.server.stats.record(time.perf_counter() - started, ok=False)
+            self._reply(500, {"error": str(e)})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for piece in stream:
+                self.wfile.write(json.dumps({"token": piece}).encode("utf-8") + b"\n")
+            event: Dict[str, Any] = {"done": True, "metadata": stream.metadata}
+        except Exception as e:
+            logging.error(f"Error in stream_api: {str(e)}")
+            event = {"error": str(e)}
+        self.server.stats.record(time.perf_counter() - started, ok="error" not in event)
+        self.wfile.write(json.dumps(event).encode("utf-8") + b"\n")
+
+    def do_POST(self) -> None:
+        self.server.touch()
+        length: int = int(self.headers.get("Content-Length", 0))
+        payload: Dict[str, Any] = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/ping":
+            self._reply(200, {})
+        elif self.path == "/call_api":
+            started: float = time.perf_counter()
+            try:
+                result: Dict[str, Any] = call_api(
+                    payload["prompt"],
+                    payload.get("options") or {},
+                    payload.get("context") or {},
+                )
+            except Exception as e:
+                self.server.stats.record(time.perf_counter() - started, ok=False)
+                self._reply(500, {"error": str(e)})
+                return
+            self.server.stats.record(time.perf_counter() - started, ok=True)
+            self._reply(200, result)
+        elif self.path == "/stream_api":
+            self._stream(payload)
+        elif self.path == "/call_api_batch":
+            started = time.perf_counter()
+            try:
+                results: List[Dict[str, str]] = call_api_batch(
+                    payload["prompts"],
+                    payload.get("options") or {},
+                    payload.get("concurrency") or GENERATION_CONCURRENCY,
+                )
+            except Exception as e:
+                self.server.stats.record(time.perf_counter() - started, ok=False)
+                self._reply(500, {"error": str(e)})
+                return
+            self.server.stats.record(
+                time.perf_counter() - started,
+                ok=not any("error" in result for result in results),
+            )
+            self._reply(200, {"results": results})
+        elif self.path == "/shutdown":
+            self._reply(200, {})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            self._reply(404, {"error": f"Unknown path {self.path}"})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug(format % args)
+
+
+class RagService(ThreadingHTTPServer):
+    """
+    HTTP server that shuts itself down after ``idle_timeout`` idle seconds.
+
+    Args:
+        port: Port to listen on, on localhost
+        idle_timeout: Seconds without requests before exiting; 0 disables it
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = SERVICE_PORT, idle_timeout: float = IDLE_TIMEOUT):
+        super().__init__((SERVICE_HOST, port), RagRequestHandler)
+        self.idle_timeout: float = idle_timeout
+        self.stats: ServiceStats = ServiceStats()
+        self.last_request: float = time.monotonic()
+        if idle_timeout:
+            threading.Thread(target=self._watch_idle, daemon=True).start()
+
+    def touch(self) -> None:
+        self.last_request = time.monotonic()
+
+    def _watch_idle(self) -> None:
+        while time.monotonic() - self.last_request < self.idle_timeout:
+            time.sleep(min(5.0, self.idle_timeout))
+        logging.info(f"Idle for {self.idle_timeout:.0f}s, shutting down")
+        self.shutdown()
+
+
+def main() -> None:
+    """Start the worker, or stop a running one with --stop."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT)
+    parser.add_argument(
+        "--stop", action="store_true", help="Stop the worker running on --port"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    if args.stop:
+        urlopen(
+            Request(f"http://{SERVICE_HOST}:{args.port}/shutdown", data=b"{}"),
+            timeout=10,
+        ).close()
+        return
+
+    # Load the default store now rather than on the first request
+    get_vector_store(DEFAULT_VECTOR_STORE)
+    service: RagService = RagService(args.port, args.idle_timeout)
+    service.stats.startup_seconds = time.perf_counter() - PROCESS_STARTED
+    logging.info(
+        f"RAG service ready on port {args.port} "
+        f"after {service.stats.startup_seconds:.2f}s (pid {os.getpid()})"
+    )
+    try:
+        service.serve_forever()
+    finally:
+        service.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,111 @@
+"""
+promptfoo provider for the RAG pipeline.
+
+promptfoo loads this file as a fresh module for every test case, so it only
+imports the standard library. ``call_api`` forwards each request over HTTP
+to the long-lived rag_service.py worker, which keeps langchain, the
+embeddings client, the vector store and the chat client loaded between
+calls. The worker is started on first use and exits after being idle for a
+while; set RAG_SERVICE=inprocess to run the pipeline in this process instead.
+"""
+
+import json
 import logging
 import os
-from typing import Any, Dict, List, Tuple
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Iterator, List, Optional
 
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema import AIMessage, HumanMessage
-from langchain_chroma import Chroma
-from langchain_core.documents import Document
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
 
 # Constants
-CHROMA_PATH: str = "db"
-OPENAI_AI_MODEL: str = "gpt-4o-mini"
-ANTHROPIC_API_KEY: str | None = os.getenv("ANTHROPIC_API_KEY")
-OPENAI_API_KEY: str | None = os.getenv("OPENAI_API_KEY")
-OPENAI_AI_EMBEDDING_MODEL: str = "text-embedding-3-large"
-
-# Initialize embeddings and load the Chroma database
-embeddings: OpenAIEmbeddings = OpenAIEmbeddings(
-    model=OPENAI_AI_EMBEDDING_MODEL, openai_api_key=OPENAI_API_KEY
-)
-db_chroma: Chroma = Chroma(
-    collection_name="rag_collection",
-    persist_directory=CHROMA_PATH,
-    embedding_function=embeddings,
-)
-
-# Prompt template for generating answers
-PROMPT_TEMPLATE: str = """
-Answer the question based only on the following context:
-{context}
-Answer the question based on the above context: {question}.
-Provide a detailed answer.
-Don't justify your answers.
-Don't give information not mentioned in the CONTEXT INFORMATION.
-Do not say "according to the context" or "mentioned in the context" or similar.
-"""
+SERVICE_HOST: str = "127.0.0.1"
+SERVICE_PORT: int = int(os.getenv("RAG_SERVICE_PORT", "8731"))
+SERVICE_URL: str = f"http://{SERVICE_HOST}:{SERVICE_PORT}"
+SERVICE_DIR: str = os.path.dirname(os.path.abspath(__file__))
+SERVICE_LOG: str = os.path.join(SERVICE_DIR, "rag_service.log")
+# Seconds to wait for a newly started worker to become ready
+STARTUP_TIMEOUT: float = 120.0
+REQUEST_TIMEOUT: float = 600.0
+
+
+class ServiceError(Exception):
+    """Raised when the RAG worker fails a request or cannot be started."""
+
+
+def _request(
+    path: str,
+    payload: Optional[Dict[str, Any]] = None,
+    timeout: float = REQUEST_TIMEOUT,
+) -> Dict[str, Any]:
+    """Send a request to the worker and return its decoded JSON reply."""
+    data: Optional[bytes] = (
+        None if payload is None else json.dumps(payload, default=str).encode("utf-8")
+    )
+    request = urllib.request.Request(
+        SERVICE_URL + path, data=data, headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise ServiceError(json.loads(e.read() or b"{}").get("error", str(e))) from e
+
+
+def _is_running() -> bool:
+    try:
+        _request("/health", timeout=2.0)
+        return True
+    except (OSError, ServiceError):
+        return False
+
+
+def ensure_service() -> None:
+    """
+    Start the worker unless it is already running, and wait until it is ready.
+
+    promptfoo runs several providers concurrently, so a lock file makes sure
+    only one of them starts the worker while the others wait for it.
+
+    Raises:
+        ServiceError: If the worker exits or does not become ready in time
+    """
+    if _is_running():
+        return
+    with open(os.path.join(SERVICE_DIR, ".rag_service.lock"), "a+") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        if _is_running():
+            return
+        with open(SERVICE_LOG, "ab") as log:
+            process = subprocess.Popen(
+                [
+                    sys.executable,
+                    os.path.join(SERVICE_DIR, "rag_service.py"),
+                    "--port",
+                    str(SERVICE_PORT),
+                ],
+                cwd=SERVICE_DIR,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+        deadline: float = time.monotonic() + STARTUP_TIMEOUT
+        while not _is_running():
+            if process.poll() is not None:
+                raise ServiceError(f"RAG service exited on startup, see {SERVICE_LOG}")
+            if time.monotonic() > deadline:
+                raise ServiceError(
+                    f"RAG service not ready after {STARTUP_TIMEOUT:.0f}s, "
+                    f"see {SERVICE_LOG}"
+                )
+            time.sleep(0.1)
 
 
 def call_api(
@@ -45,47 +116,137 @@ def call_api(
 
     Args:
         prompt: The user's question or prompt
-        options: Configuration options including topK
+        options: Configuration options including topK, vectorStore
+            ("chroma" or "numpy"), nprobe (IVF clusters scanned by the
+            numpy store) and stream (false to generate without streaming)
         context: Additional context for the request
 
     Returns:
-        Dict containing the model's response
+        Dict containing the model's response and, when streamed, its
+        retrieval, time-to-first-token and generation times under "metadata"
 
     Raises:
         Exception: If there's an error during processing
     """
+    if os.getenv("RAG_SERVICE") == "inprocess":
+        from rag_service import call_api as call_api_inprocess
+
+        return call_api_inprocess(prompt, options, context)
     try:
-        k: int = options.get("config", {}).get("topK", 5)
-        docs_chroma: List[Tuple[Document, float]] = (
-            db_chroma.similarity_search_with_score(
-                prompt,
-                k=k,
-            )
-        )
-        context_text: str = "\n\n".join(
-            [doc.page_content for doc, _score in docs_chroma]
+        ensure_service()
+        return _request(
+            "/call_api", {"prompt": prompt, "options": options, "context": context}
         )
+    except Exception as e:
+        logging.error(f"Error in call_api: {str(e)}")
+        raise
 
-        # Generate prompt using the template
-        prompt_template: ChatPromptTemplate = ChatPromptTemplate.from_template(
-            PROMPT_TEMPLATE
-        )
-        final_prompt: str = prompt_template.format(
-            context=context_text, question=prompt
-        )
 
-        # Fetch from OpenAI API
-        chat: ChatOpenAI = ChatOpenAI(
-            model_name=OPENAI_AI_MODEL, temperature=0, openai_api_key=OPENAI_API_KEY
+class StreamedAnswer:
+    """
+    Answer pieces streamed from the worker as they are generated.
+
+    Iterate it for the pieces; once exhausted, ``text`` holds the whole
+    answer and ``metadata`` the worker's retrieval_ms, ttft_ms and
+    generation_ms for the call.
+
+    Raises:
+        ServiceError: If the worker fails the request, also mid-stream
+    """
+
+    def __init__(self, prompt: str, options: Dict[str, Any]):
+        ensure_service()
+        data: bytes = json.dumps(
+            {"prompt": prompt, "options": options}, default=str
+        ).encode("utf-8")
+        request = urllib.request.Request(
+            SERVICE_URL + "/stream_api",
+            data=data,
+            headers={"Content-Type": "application/json"},
         )
-        message: HumanMessage = HumanMessage(content=final_prompt)
-        response: AIMessage = chat.invoke([message])
+        try:
+            self.response = urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT)
+        except urllib.error.HTTPError as e:
+            raise ServiceError(
+                json.loads(e.read() or b"{}").get("error", str(e))
+            ) from e
+        self.pieces: List[str] = []
+        self.metadata: Dict[str, Any] = {}
+
+    def __iter__(self) -> Iterator[str]:
+        with self.response:
+            for line in self.response:
+                event: Dict[str, Any] = json.loads(line)
+                if "error" in event:
+                    raise ServiceError(event["error"])
+                if "token" in event:
+                    self.pieces.append(event["token"])
+                    yield event["token"]
+                else:
+                    self.metadata = event.get("metadata", {})
+
+    @property
+    def text(self) -> str:
+        return "".join(self.pieces)
+
+
+def stream_api(prompt: str, options: Dict[str, Any]):
+    """
+    Answer a prompt using RAG, yielding the answer's text as it is generated.
+
+    Args:
+        prompt: The user's question or prompt
+        options: Configuration options, as for ``call_api``
+
+    Returns:
+        An iterable of text pieces with ``text`` and ``metadata`` attributes
+        (a ``StreamedAnswer``, or the worker's own stream in-process)
+    """
+    if os.getenv("RAG_SERVICE") == "inprocess":
+        from rag_service import stream_api as stream_api_inprocess
 
-        result: Dict[str, str] = {
-            "output": response.content,
+        return stream_api_inprocess(prompt, options)
+    return StreamedAnswer(prompt, options)
+
+
+def service_stats() -> Dict[str, Any]:
+    """Return the worker's latency, context packing and answer cache statistics."""
+    if os.getenv("RAG_SERVICE") == "inprocess":
+        from rag_service import answer_cache, call_timings, context_packer
+
+        return {
+            "timings": call_timings.snapshot(),
+            "context": context_packer.stats(),
+            "answer_cache": answer_cache.stats(),
         }
+    ensure_service()
+    return _request("/stats")
 
-        return result
-    except Exception as e:
-        logging.error(f"Error in call_api: {str(e)}")
-        raise
\ No newline at end of file
+
+def call_api_batch(
+    prompts: List[str], options: Dict[str, Any], concurrency: Optional[int] = None
+) -> List[Dict[str, str]]:
+    """
+    Answer many prompts with one retrieval pass and concurrent generation.
+
+    Args:
+        prompts: The user's questions
+        options: Configuration options, as for ``call_api``
+        concurrency: Maximum generation requests in flight; the worker's
+            default if omitted
+
+    Returns:
+        One result per prompt, in order: {"output": ...} or {"error": ...}
+    """
+    if os.getenv("RAG_SERVICE") == "inprocess":
+        from rag_service import GENERATION_CONCURRENCY
+        from rag_service import call_api_batch as call_api_batch_inprocess
+
+        return call_api_batch_inprocess(
+            prompts, options, concurrency or GENERATION_CONCURRENCY
+        )
+    ensure_service()
+    return _request(
+        "/call_api_batch",
+        {"prompts": prompts, "options": options, "concurrency": concurrency},
+    )["results"]
@@ -0,0 +1,331 @@
+"""
+Pluggable PDF sources for ingest.py.
+
+A source lists the files to ingest and fetches their bytes. Local sources
+read from disk (a directory or a glob), so ingestion can run and be
+benchmarked without network access. The URL source downloads through one
+pooled keep-alive HTTP session with retries, resumes interrupted
+downloads, and keeps a local blob cache revalidated with ETag /
+Last-Modified, so an unchanged file costs a 304 or no request at all.
+"""
+
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import quote, unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BLOB_CACHE_DIR: str = os.getenv("BLOB_CACHE_DIR", ".blob_cache")
+HTTP_TIMEOUT: float = 60.0
+HTTP_RETRIES: int = 5
+
+
+class PdfSource:
+    """Base class for a set of PDF files to ingest."""
+
+    def names(self) -> List[str]:
+        """Return the names of all files in the source, used as manifest keys."""
+        raise NotImplementedError
+
+    def location(self, name: str) -> str:
+        """Return the path or URL of ``name``, stored as chunk ``source`` metadata."""
+        raise NotImplementedError
+
+    def fetch(self, name: str) -> bytes:
+        """Return the content of ``name``."""
+        raise NotImplementedError
+
+
+class LocalDirectorySource(PdfSource):
+    """All PDFs under a local directory, named by their relative path."""
+
+    def __init__(self, directory: str, recursive: bool = True):
+        self.directory: str = os.path.abspath(directory)
+        self.recursive: bool = recursive
+
+    def names(self) -> List[str]:
+        pattern: str = "**/*.pdf" if self.recursive else "*.pdf"
+        return sorted(
+            os.path.relpath(path, self.directory)
+            for path in glob.glob(
+                os.path.join(self.directory, pattern), recursive=self.recursive
+            )
+        )
+
+    def location(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def fetch(self, name: str) -> bytes:
+        with open(self.location(name), "rb") as f:
+            return f.read()
+
+
+class GlobSource(PdfSource):
+    """Local files matching a glob pattern, named by their absolute path."""
+
+    def __init__(self, pattern: str):
+        self.pattern: str = pattern
+
+    def names(self) -> List[str]:
+        return sorted(
+            os.path.abspath(path) for path in glob.glob(self.pattern, recursive=True)
+        )
+
+    def location(self, name: str) -> str:
+        return name
+
+    def fetch(self, name: str) -> bytes:
+        with open(name, "rb") as f:
+            return f.read()
+
+
+def create_session(pool_size: int = 10) -> requests.Session:
+    """
+    Return an HTTP session with a keep-alive connection pool and retries.
+
+    Retries use exponential backoff on connection errors, 429 and 5xx.
+    """
+    retry: Retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+    )
+    adapter: HTTPAdapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session: requests.Session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class BlobCache:
+    """
+    Local copies of downloaded files with their HTTP validators.
+
+    Each URL maps to ``<key>.bin`` (content), ``<key>.json`` (ETag,
+    Last-Modified, time of last validation) and, while a download is in
+    progress, ``<key>.part`` with the validators of the response it came
+    from in ``<key>.part.json``.
+    """
+
+    def __init__(self, directory: str = BLOB_CACHE_DIR):
+        self.directory: str = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str, suffix: str) -> str:
+        key: str = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + suffix)
+
+    def meta(self, url: str) -> Optional[Dict[str, object]]:
+        """Return the stored validators for ``url`` if its content is cached."""
+        if not os.path.exists(self._path(url, ".bin")):
+            return None
+        try:
+            with open(self._path(url, ".json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read(self, url: str) -> bytes:
+        with open(self._path(url, ".bin"), "rb") as f:
+            return f.read()
+
+    def part_path(self, url: str) -> str:
+        return self._path(url, ".part")
+
+    def part_meta(self, url: str) -> Dict[str, Optional[str]]:
+        """Return the validators of the response the ``.part`` file came from."""
+        try:
+            with open(self._path(url, ".part.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def start_part(self, url: str, headers: Dict[str, str]) -> None:
+        """Record the validators of a response about to be written to ``.part``."""
+        with open(self._path(url, ".part.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")},
+                f,
+            )
+
+    def discard_part(self, url: str) -> None:
+        for suffix in (".part", ".part.json"):
+            try:
+                os.remove(self._path(url, suffix))
+            except FileNotFoundError:
+                pass
+
+    def commit(self, url: str, headers: Dict[str, str]) -> None:
+        """Promote a finished ``.part`` download and record its validators."""
+        os.replace(self.part_path(url), self._path(url, ".bin"))
+        try:
+            os.remove(self._path(url, ".part.json"))
+        except FileNotFoundError:
+            pass
+        self.touch(
+            url,
+            {
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+            },
+        )
+
+    def touch(self, url: str, meta: Dict[str, object]) -> None:
+        """Record that the cached copy of ``url`` was validated just now."""
+        meta = dict(meta, validated_at=time.time())
+        tmp_path: str = self._path(url, ".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path(url, ".json"))
+
+
+class UrlListSource(PdfSource):
+    """
+    Files downloaded over HTTP(S).
+
+    Args:
+        urls: Mapping of file name to URL
+        cache: Blob cache for downloaded content, or None to disable caching
+        session: HTTP session to use; a pooled one is created if omitted
+        max_age: Seconds after a successful validation during which the
+            cached copy is used without contacting the server
+        offline: Serve only from the cache and never contact the server
+    """
+
+    def __init__(
+        self,
+        urls: Dict[str, str],
+        cache: Optional[BlobCache] = None,
+        session: Optional[requests.Session] = None,
+        max_age: float = 0.0,
+        offline: bool = False,
+    ):
+        self.urls: Dict[str, str] = urls
+        self.cache: Optional[BlobCache] = cache
+        self.session: requests.Session = session or create_session()
+        self.max_age: float = max_age
+        self.offline: bool = offline
+        self.not_modified: int = 0
+        self.downloaded: int = 0
+        self._stats_lock: threading.Lock = threading.Lock()
+
+    @classmethod
+    def from_base_url(cls, base_url: str, names: List[str], **kwargs) -> "UrlListSource":
+        """Build a source for ``names`` relative to ``base_url``."""
+        return cls({name: base_url + quote(name) for name in names}, **kwargs)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "UrlListSource":
+        """Build a source from a text file with one URL per line."""
+        urls: Dict[str, str] = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                url: str = line.strip()
+                if url and not url.startswith("#"):
+                    urls[unquote(os.path.basename(urlparse(url).path))] = url
+        return cls(urls, **kwargs)
+
+    def names(self) -> List[str]:
+        return list(self.urls)
+
+    def location(self, name: str) -> str:
+        return self.urls[name]
+
+    def fetch(self, name: str) -> bytes:
+        url: str = self.urls[name]
+        meta: Optional[Dict[str, object]] = self.cache.meta(url) if self.cache else None
+        if meta is not None:
+            fresh: bool = time.time() - float(meta.get("validated_at", 0)) < self.max_age
+            if self.offline or fresh:
+                return self.cache.read(url)
+        elif self.offline:
+            raise FileNotFoundError(f"{url} is not in the blob cache")
+
+        headers: Dict[str, str] = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = str(meta["etag"])
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = str(meta["last_modified"])
+        if self.cache is None:
+            response: requests.Response = self.session.get(
+                url, headers=headers, timeout=HTTP_TIMEOUT
+            )
+            response.raise_for_status()
+            self._count_download()
+            return response.content
+        return self._download(url, headers, meta)
+
+    def _download(
+        self, url: str, headers: Dict[str, str], meta: Optional[Dict[str, object]]
+    ) -> bytes:
+        """
+        Download ``url`` into the cache, resuming a previous partial download.
+
+        A resume sends ``If-Range`` with the partial response's validator,
+        so a file that changed since is sent whole instead of appended to
+        stale bytes. A partial download without a validator is restarted.
+        """
+        part_path: str = self.cache.part_path(url)
+        offset: int = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset and meta is None:
+            part_meta: Dict[str, Optional[str]] = self.cache.part_meta(url)
+            etag: Optional[str] = part_meta.get("etag")
+            # Weak ETags cannot be used in If-Range
+            validator: Optional[str] = (
+                etag if etag and not etag.startswith("W/") else part_meta.get("last_modified")
+            )
+            if validator:
+                headers["Range"] = f"bytes={offset}-"
+                headers["If-Range"] = validator
+            else:
+                self.cache.discard_part(url)
+                offset = 0
+        with self.session.get(
+            url, headers=headers, timeout=HTTP_TIMEOUT, stream=True
+        ) as response:
+            if response.status_code == 304:
+                with self._stats_lock:
+                    self.not_modified += 1
+                self.cache.touch(url, meta)
+                return self.cache.read(url)
+            response.raise_for_status()
+            # A server that ignores the Range header, or whose file changed, sends the whole file
+            resume: bool = response.status_code == 206 and response.headers.get(
+                "Content-Range", ""
+            ).startswith(f"bytes {offset}-")
+            if response.status_code == 206 and not resume:
+                self.cache.discard_part(url)
+                raise requests.HTTPError(
+                    f"Unexpected Content-Range {response.headers.get('Content-Range')!r} "
+                    f"resuming {url} at byte {offset}",
+                    response=response,
+                )
+            if resume:
+                logging.info(f"Resuming download of {url} at byte {offset}")
+            else:
+                self.cache.start_part(url, response.headers)
+            with open(part_path, "ab" if resume else "wb") as f:
+                for block in response.iter_content(chunk_size=1 << 16):
+                    f.write(block)
+            self.cache.commit(url, response.headers)
+        self._count_download()
+        return self.cache.read(url)
+
+    def _count_download(self) -> None:
+        with self._stats_lock:
+            self.downloaded += 1
@@ -0,0 +1,436 @@
+"""
+Lightweight in-process vector store, an alternative backend to Chroma.
+
+Normalized embeddings are kept as a float32 matrix in a memory-mapped file
+and searched with NumPy, so opening the store costs a few small file reads
+instead of importing Chroma and loading its SQLite and HNSW files. Small
+stores are searched exactly by brute force. Stores of ``IVF_MIN_ROWS`` rows
+or more get an inverted-file (IVF) index: rows are clustered with k-means
+and stored grouped by cluster, and a query only scans the ``nprobe``
+clusters whose centroids are closest to it.
+
+Files under the store directory:
+    meta.json     {"version", "dim", "count", "nlist"}
+    vectors.f32   float32 matrix of shape (count, dim), rows grouped by cluster
+    rows.jsonl    one {"id", "text", "metadata"} line per matrix row
+    offsets.i64   byte offset of each line of rows.jsonl (count + 1 entries)
+    ivf.npz       cluster centroids and start rows, if the store is indexed
+
+Only the lines of the top-k results are read from rows.jsonl at query time.
+Writes (``upsert``/``delete``) are staged in memory and applied by ``save``,
+which rewrites the store into a fresh directory and swaps it in.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import shutil
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+STORE_VERSION: int = 1
+VECTOR_STORE_PATH: str = os.path.join("db", "vectors")
+# Stores smaller than this are searched by brute force
+IVF_MIN_ROWS: int = 20000
+DEFAULT_NPROBE: int = 16
+KMEANS_ITERATIONS: int = 10
+# k-means is trained on at most this many rows per cluster
+KMEANS_SAMPLE_PER_LIST: int = 256
+_BLOCK_ROWS: int = 65536
+
+
+def normalize(vectors: Any) -> np.ndarray:
+    """Return ``vectors`` as float32 scaled to unit length along the last axis."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms: np.ndarray = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the positions of the ``k`` highest scores, best first."""
+    if k < len(scores):
+        candidates: np.ndarray = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def assign_clusters(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Return the index of the closest centroid for every row of ``vectors``."""
+    assignments: np.ndarray = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _BLOCK_ROWS):
+        block: np.ndarray = vectors[start : start + _BLOCK_ROWS]
+        assignments[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def kmeans(
+    vectors: np.ndarray, nlist: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0
+) -> np.ndarray:
+    """
+    Cluster unit vectors with spherical k-means.
+
+    Args:
+        vectors: Normalized float32 matrix
+        nlist: Number of clusters
+        iterations: Number of assignment/update rounds
+        seed: Seed for sampling and initialization
+
+    Returns:
+        Normalized centroid matrix of shape (nlist, dim)
+    """
+    rng = np.random.default_rng(seed)
+    sample_size: int = min(len(vectors), nlist * KMEANS_SAMPLE_PER_LIST)
+    sample: np.ndarray = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids: np.ndarray = sample[rng.choice(len(sample), nlist, replace=False)]
+    for _ in range(iterations):
+        assignments: np.ndarray = assign_clusters(sample, centroids)
+        sums: np.ndarray = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts: np.ndarray = np.bincount(assignments, minlength=nlist)
+        # Re-seed empty clusters with random sample rows
+        empty: np.ndarray = np.flatnonzero(counts == 0)
+        sums[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+class NumpyVectorStore:
+    """
+    Memory-mapped NumPy vector store with exact or IVF search.
+
+    Scores returned by the search methods are cosine distances (lower is
+    closer), like the distances returned by Chroma.
+
+    Args:
+        path: Store directory; an empty store is used if it does not exist
+        embedding_function: Embeddings used to embed text queries
+        nprobe: Number of IVF clusters scanned per query
+    """
+
+    def __init__(
+        self,
+        path: str = VECTOR_STORE_PATH,
+        embedding_function: Optional[Embeddings] = None,
+        nprobe: int = DEFAULT_NPROBE,
+    ):
+        self.path: str = path
+        self.embedding_function: Optional[Embeddings] = embedding_function
+        self.nprobe: int = nprobe
+        self.dim: Optional[int] = None
+        self.count: int = 0
+        self._vectors: Optional[np.memmap] = None
+        self._offsets: Optional[np.memmap] = None
+        self._rows: Optional[np.memmap] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._starts: Optional[np.ndarray] = None
+        self._lock: threading.Lock = threading.Lock()
+        self._pending: Dict[str, Tuple[np.ndarray, str, Dict[str, Any]]] = {}
+        self._deleted: Set[str] = set()
+        self._load()
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def nlist(self) -> int:
+        """Number of IVF clusters, or 0 if the store is searched by brute force."""
+        return 0 if self._centroids is None else len(self._centroids)
+
+    def _file(self, name: str, path: Optional[str] = None) -> str:
+        return os.path.join(path or self.path, name)
+
+    def _load(self) -> None:
+        self._vectors = self._offsets = self._rows = None
+        self._centroids = self._starts = None
+        self._id_rows: Optional[Dict[str, int]] = None
+        self._columns: Dict[str, np.ndarray] = {}
+        self.dim, self.count = None, 0
+        if not os.path.exists(self._file("meta.json")):
+            return
+        with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+            meta: Dict[str, Any] = json.load(f)
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(
+                f"Unsupported vector store version {meta.get('version')} in {self.path}"
+            )
+        self.dim, self.count = meta["dim"], meta["count"]
+        if not self.count:
+            return
+        self._vectors = np.memmap(
+            self._file("vectors.f32"),
+            dtype=np.float32,
+            mode="r",
+            shape=(self.count, self.dim),
+        )
+        self._offsets = np.memmap(self._file("offsets.i64"), dtype=np.int64, mode="r")
+        # Mapped, not reopened by path: a save swaps in a new directory, and
+        # these offsets only fit the rows file they were loaded with
+        self._rows = np.memmap(self._file("rows.jsonl"), dtype=np.uint8, mode="r")
+        if meta.get("nlist"):
+            with np.load(self._file("ivf.npz")) as ivf:
+                self._centroids = ivf["centroids"]
+                self._starts = ivf["starts"]
+
+    # Search
+
+    def search(
+        self,
+        queries: Any,
+        k: int,
+        nprobe: Optional[int] = None,
+        masks: Optional[Sequence[Optional[np.ndarray]]] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Find the nearest rows for a batch of query vectors.
+
+        Args:
+            queries: Query vectors, shape (n, dim) or (dim,)
+            k: Number of results per query
+            nprobe: IVF clusters to scan; defaults to the store's ``nprobe``
+            masks: Optional boolean row mask per query (see ``where_in``);
+                only rows where it is True are returned
+
+        Returns:
+            One (rows, cosine similarities) pair per query, best first
+        """
+        queries = normalize(np.atleast_2d(queries))
+        masks = masks or [None] * len(queries)
+        if self._vectors is None:
+            empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+            return [empty for _ in queries]
+        nprobe = nprobe or self.nprobe
+        if self._centroids is None or nprobe >= self.nlist:
+            results: List[Tuple[np.ndarray, np.ndarray]] = []
+            for start in range(0, len(queries), 64):
+                scores: np.ndarray = queries[start : start + 64] @ self._vectors.T
+                for row_scores, mask in zip(scores, masks[start : start + 64]):
+                    if mask is None:
+                        rows: np.ndarray = top_k(row_scores, k)
+                    else:
+                        allowed: np.ndarray = np.flatnonzero(mask)
+                        rows = allowed[top_k(row_scores[allowed], k)]
+                    results.append((rows, row_scores[rows]))
+            return results
+        return [
+            self._search_ivf(query, k, nprobe, mask)
+            for query, mask in zip(queries, masks)
+        ]
+
+    def _search_ivf(
+        self, query: np.ndarray, k: int, nprobe: int, mask: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        lists: np.ndarray = top_k(self._centroids @ query, nprobe)
+        candidates: np.ndarray = np.concatenate(
+            [np.arange(self._starts[i], self._starts[i + 1]) for i in lists]
+        )
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        scores: np.ndarray = self._vectors[candidates] @ query
+        best: np.ndarray = top_k(scores, k)
+        return candidates[best], scores[best]
+
+    def _lines(self, block: int = 4096) -> Iterator[bytes]:
+        """Yield the JSON line of every row, in row order."""
+        for start in range(0, self.count, block):
+            end: int = min(start + block, self.count)
+            data: np.ndarray = self._rows[self._offsets[start] : self._offsets[end]]
+            yield from data.tobytes().splitlines(keepends=True)
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Yield the id, text and metadata of every row, in row order."""
+        for line in self._lines():
+            yield json.loads(line)
+
+    def _row_index(self) -> Dict[str, int]:
+        if self._id_rows is None:
+            self._id_rows = {
+                record["id"]: row for row, record in enumerate(self.records())
+            }
+        return self._id_rows
+
+    def get_by_ids(self, ids: Sequence[str]) -> List[Optional[Dict[str, Any]]]:
+        """Read rows by chunk ID; None for IDs not in the store."""
+        index: Dict[str, int] = self._row_index()
+        found: Dict[str, Dict[str, Any]] = {
+            record["id"]: record
+            for record in self.get_rows([index[i] for i in ids if i in index])
+        }
+        return [found.get(chunk_id) for chunk_id in ids]
+
+    def where_in(self, key: str, values: Set[Any]) -> np.ndarray:
+        """Return a boolean row mask of rows whose ``key`` metadata is in ``values``."""
+        if key not in self._columns:
+            self._columns[key] = np.array(
+                [record["metadata"].get(key) for record in self.records()],
+                dtype=object,
+            )
+        column: np.ndarray = self._columns[key]
+        return np.fromiter(
+            (value in values for value in column), dtype=bool, count=len(column)
+        )
+
+    def get_rows(self, rows: Sequence[int]) -> List[Dict[str, Any]]:
+        """Read the id, text and metadata of the given matrix rows."""
+        records: List[Dict[str, Any]] = []
+        for row in rows:
+            line: np.ndarray = self._rows[self._offsets[row] : self._offsets[row + 1]]
+            records.append(json.loads(line.tobytes()))
+        return records
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: Sequence[float], k: int = 4, nprobe: Optional[int] = None
+    ) -> List[Tuple[Document, float]]:
+        """Return the ``k`` documents closest to ``embedding`` with their distances."""
+        rows, scores = self.search(embedding, k, nprobe)[0]
+        return [
+            (
+                Document(page_content=record["text"], metadata=record["metadata"]),
+                1.0 - float(score),
+            )
+            for record, score in zip(self.get_rows(rows), scores)
+        ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, nprobe: Optional[int] = None
+    ) -> List[Tuple[Document, float]]:
+        """Embed ``query`` and return the ``k`` closest documents with distances."""
+        if self.embedding_function is None:
+            raise ValueError("An embedding_function is required to search by text")
+        return self.similarity_search_by_vector_with_score(
+            self.embedding_function.embed_query(query), k, nprobe
+        )
+
+    # Writes
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Any,
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> None:
+        """Stage rows to insert or replace; applied by ``save``."""
+        vectors: np.ndarray = normalize(embeddings)
+        dim: Optional[int] = self.dim or next(
+            (len(vector) for vector, _, _ in self._pending.values()), None
+        )
+        if dim is not None and vectors.shape[1] != dim:
+            raise ValueError(
+                f"Expected {dim}-dimensional vectors, got {vectors.shape[1]}"
+            )
+        with self._lock:
+            for chunk_id, vector, text, metadata in zip(
+                ids, vectors, documents, metadatas
+            ):
+                self._pending[chunk_id] = (vector, text, dict(metadata))
+                self._deleted.discard(chunk_id)
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """Stage rows to delete; applied by ``save``."""
+        with self._lock:
+            for chunk_id in ids:
+                self._pending.pop(chunk_id, None)
+                self._deleted.add(chunk_id)
+
+    def save(self, nlist: Optional[int] = None) -> None:
+        """
+        Apply staged writes, rebuilding the IVF index if the store is large enough.
+
+        Args:
+            nlist: Number of IVF clusters; defaults to sqrt(rows) for stores
+                of at least ``IVF_MIN_ROWS`` rows, and brute force below that
+        """
+        with self._lock:
+            if not self._pending and not self._deleted:
+                return
+            pending, self._pending = self._pending, {}
+            deleted, self._deleted = self._deleted, set()
+
+        # Keep existing rows that are neither replaced nor deleted
+        kept: List[int] = []
+        lines: List[bytes] = []
+        for row, line in enumerate(self._lines()):
+            chunk_id: str = json.loads(line)["id"]
+            if chunk_id not in pending and chunk_id not in deleted:
+                kept.append(row)
+                lines.append(line)
+        new_vectors: List[np.ndarray] = []
+        for chunk_id, (vector, text, metadata) in pending.items():
+            new_vectors.append(vector)
+            record: Dict[str, Any] = {
+                "id": chunk_id,
+                "text": text,
+                "metadata": metadata,
+            }
+            lines.append((json.dumps(record) + "\n").encode("utf-8"))
+        dim: int = self.dim or (len(new_vectors[0]) if new_vectors else 0)
+        parts: List[np.ndarray] = []
+        if kept:
+            parts.append(np.asarray(self._vectors[kept]))
+        if new_vectors:
+            parts.append(np.stack(new_vectors))
+        vectors: np.ndarray = (
+            np.concatenate(parts) if parts else np.empty((0, dim), dtype=np.float32)
+        )
+
+        if nlist is None and len(vectors) >= IVF_MIN_ROWS:
+            nlist = int(math.sqrt(len(vectors)))
+        centroids: Optional[np.ndarray] = None
+        starts: Optional[np.ndarray] = None
+        if nlist and len(vectors) >= nlist:
+            centroids = kmeans(vectors, nlist)
+            assignments: np.ndarray = assign_clusters(vectors, centroids)
+            order: np.ndarray = np.argsort(assignments, kind="stable")
+            vectors = vectors[order]
+            lines = [lines[i] for i in order]
+            starts = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        self._write(vectors, lines, dim, centroids, starts)
+
+    def _write(
+        self,
+        vectors: np.ndarray,
+        lines: List[bytes],
+        dim: int,
+        centroids: Optional[np.ndarray],
+        starts: Optional[np.ndarray],
+    ) -> None:
+        """Write a complete store into a new directory and swap it into place."""
+        tmp_path: str = self.path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        vectors.astype(np.float32).tofile(self._file("vectors.f32", tmp_path))
+        offsets: List[int] = [0]
+        with open(self._file("rows.jsonl", tmp_path), "wb") as f:
+            for line in lines:
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+        np.asarray(offsets, dtype=np.int64).tofile(self._file("offsets.i64", tmp_path))
+        if centroids is not None:
+            np.savez(
+                self._file("ivf.npz", tmp_path), centroids=centroids, starts=starts
+            )
+        with open(self._file("meta.json", tmp_path), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": STORE_VERSION,
+                    "dim": dim,
+                    "count": len(vectors),
+                    "nlist": 0 if centroids is None else len(centroids),
+                },
+                f,
+            )
+
+        old_path: str = self.path + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.replace(self.path, old_path)
+        os.replace(tmp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        self._load()